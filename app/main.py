@@ -1,13 +1,34 @@
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app import config
 from app.auth import verify_token
 from app.routes.hackrx_router import hackrx_router
+from src.pipeline import resources
+
+# Load the embedding model and open the index before serving the first request
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "1") != "0"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARM_UP_ON_STARTUP:
+        try:
+            resources.warm_up()
+        except Exception as e:
+            # Requests will retry the lazy initialization
+            print(f"⚠️ Warm-up failed: {e}")
+    try:
+        yield
+    finally:
+        # Shuts down the encoding worker processes along with everything else
+        resources.reset()
 
 app = FastAPI(
     title="LLM Query Engine",
     description="HackRx Document QA API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # ✅ CORS settings for Streamlit or frontend access
@@ -27,7 +48,7 @@ def read_root():
 # ✅ Health check
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    return {"status": "ok", "startup": resources.startup_report()}
 
 # ✅ Include HackRx API routes
 app.include_router(hackrx_router)
@@ -0,0 +1,103 @@
+"""
+Latency of retrieving chunks for 1, 10 and 50 questions: one
+retrieve_similar_chunks-style encode + query per question (the previous
+process_file loop) against retrieve_batch.
+
+By default the vector store is a stand-in with a fixed round trip (like a
+Pinecone query) and the model is all-MiniLM-L6-v2. --simulate-encode-ms
+replaces the model with a stand-in that sleeps a fixed per-call overhead
+plus a per-question cost. --faiss uses an in-process FAISS store of
+--vectors random vectors instead of the remote stand-in.
+
+Usage:
+    python -m benchmarks.bench_batch_retrieval --latency-ms 60
+    python -m benchmarks.bench_batch_retrieval --simulate-encode-ms 12 --faiss
+"""
+import argparse
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_splitter import WORDS
+from src.pipeline.retriever import retrieve_batch
+from src.pipeline.resources import EMBEDDING_DIMENSION
+from src.pipeline.vector_store import VectorStore
+
+class RemoteStandIn(VectorStore):
+    """Returns random matches after a simulated network round trip."""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+
+    def query(self, vector, top_k=5, filter=None):
+        time.sleep(self.latency)
+        return [{"id": f"chunk-{i}", "score": 0.5, "metadata": {"source": "bench"}} for i in range(top_k)]
+
+class SleepingModel:
+    """Sleeps call_ms per encode call plus text_ms per text; the call overhead is what batching saves."""
+
+    def __init__(self, text_ms: float, call_ms: float = 10.0):
+        self.text_ms = text_ms
+        self.call_ms = call_ms
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        time.sleep((self.call_ms + len(texts) * self.text_ms) / 1000)
+        vectors = np.random.rand(len(texts), EMBEDDING_DIMENSION).astype(np.float32)
+        return vectors[0] if single else vectors
+
+def sequential(questions, model, store, top_k=5):
+    """The previous process_file loop: encode one question, query, repeat."""
+    return [store.query(model.encode(question).tolist(), top_k=top_k) for question in questions]
+
+def build_questions(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18))) + "?" for _ in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency-ms", type=float, default=60)
+    parser.add_argument("--simulate-encode-ms", type=float, default=None)
+    parser.add_argument("--faiss", action="store_true")
+    parser.add_argument("--vectors", type=int, default=50000)
+    args = parser.parse_args()
+
+    if args.simulate_encode_ms is not None:
+        model = SleepingModel(args.simulate_encode_ms)
+    else:
+        from src.pipeline.resources import load_embedding_model
+        model = load_embedding_model()
+
+    directory = None
+    if args.faiss:
+        from src.pipeline.faiss_store import FaissVectorStore
+
+        directory = tempfile.TemporaryDirectory()
+        store = FaissVectorStore(directory.name, EMBEDDING_DIMENSION, index_type="hnsw")
+        rng = np.random.RandomState(0)
+        for start in range(0, args.vectors, 10000):
+            block = rng.randn(min(10000, args.vectors - start), EMBEDDING_DIMENSION).astype(np.float32)
+            store.upsert([{"id": f"chunk-{start + i}", "values": row, "metadata": {"source": "bench"}} for i, row in enumerate(block)])
+        print(f"📦 Local FAISS HNSW store with {args.vectors} vectors")
+    else:
+        store = RemoteStandIn(args.latency_ms)
+        print(f"📦 Remote stand-in store, {args.latency_ms:.0f} ms per query")
+
+    for count in (1, 10, 50):
+        questions = build_questions(count)
+        start = time.perf_counter()
+        sequential(questions, model, store)
+        before = time.perf_counter() - start
+        start = time.perf_counter()
+        retrieve_batch(questions, model=model, store=store)
+        after = time.perf_counter() - start
+        print(f"{count:3d} questions: sequential {before * 1000:8.1f} ms   batch {after * 1000:8.1f} ms   x{before / after:.1f}")
+
+    if directory is not None:
+        directory.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+How many chunks must be re-embedded after a small edit?
+
+Inserts one paragraph into a synthetic policy document and compares the
+chunks before and after, for fixed token windows (chunk_text) and for
+content-defined chunks (content_defined_chunk_text).
+
+Usage:
+    python -m benchmarks.bench_cdc_stability --tokens 200000 --at 0.1
+"""
+import argparse
+
+from benchmarks.bench_splitter import build_document
+from src.pipeline.splitter import chunk_text, content_defined_chunk_text
+
+INSERTED = "Notwithstanding the above, a waiting period of 30 days applies to all claims arising from Pre-Existing Diseases."
+
+def changed(before, after):
+    """Chunks of after whose text did not exist before (i.e. would be re-embedded)."""
+    old = {chunk["text"] for chunk in before}
+    return sum(chunk["text"] not in old for chunk in after)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=200_000)
+    parser.add_argument("--at", type=float, default=0.1, help="insert position as a fraction of the document")
+    args = parser.parse_args()
+
+    paragraphs = build_document(args.tokens).split("\n\n")
+    position = int(len(paragraphs) * args.at)
+    original = "\n\n".join(paragraphs)
+    edited = "\n\n".join(paragraphs[:position] + [INSERTED] + paragraphs[position:])
+    print(f"📄 ~{args.tokens} tokens, paragraph inserted at {position}/{len(paragraphs)}")
+
+    for name, chunker in (("fixed windows", chunk_text), ("content-defined", content_defined_chunk_text)):
+        before, after = chunker(original), chunker(edited)
+        print(f"{name:16}: {changed(before, after):5d} of {len(after):5d} chunks re-embedded")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Compare memory and GC cost of chunk dicts against a ChunkTable.
+
+Measures the Python heap retained by smart_chunk_text's list of dicts and by
+smart_chunk_table for the same document, plus the time of a full gc.collect()
+while each is alive.
+
+Usage:
+    python -m benchmarks.bench_chunk_table --tokens 1000000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from benchmarks.bench_splitter import build_document
+from src.pipeline.splitter import smart_chunk_table, smart_chunk_text
+
+def measure(fn, text):
+    gc.collect()
+    tracemalloc.start()
+    result = fn(text)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    gc.collect()
+    return result, retained, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    text = build_document(args.tokens)
+    print(f"📄 ~{args.tokens} tokens, {len(text)} characters")
+
+    chunks, dict_bytes, dict_gc = measure(smart_chunk_text, text)
+    print(f"list of dicts : {dict_bytes / 1e6:8.2f} MB  {dict_bytes / len(chunks):7.0f} B/chunk  gc {dict_gc * 1000:6.1f} ms")
+    count = len(chunks)
+    del chunks
+
+    table, table_bytes, table_gc = measure(smart_chunk_table, text)
+    print(f"ChunkTable    : {table_bytes / 1e6:8.2f} MB  {table_bytes / len(table):7.0f} B/chunk  gc {table_gc * 1000:6.1f} ms")
+    print(f"chunks        : {count} vs {len(table)}")
+    print(f"memory saving : x{dict_bytes / max(table_bytes, 1):.1f}")
+
+if __name__ == "__main__":
+    main()
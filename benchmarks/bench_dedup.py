@@ -0,0 +1,57 @@
+"""
+Measure what near-duplicate removal saves before embedding.
+
+Builds a synthetic policy whose pages all end with the same disclaimer,
+chunks it with smart_chunk_text, deduplicates, and embeds both the full and
+the deduplicated chunk lists with all-MiniLM-L6-v2.
+
+Usage:
+    python -m benchmarks.bench_dedup --pages 200
+"""
+import argparse
+import time
+
+from benchmarks.bench_splitter import build_document
+from src.pipeline.deduplicator import deduplicate_chunks
+from src.pipeline.splitter import smart_chunk_text
+
+DISCLAIMER = (
+    "This policy is underwritten by Example General Insurance Co. Ltd. IRDAI Registration No. 190. "
+    "Trade logo displayed above belongs to Example Group and is used under licence. For grievances "
+    "write to care@example.com or call the toll free number printed on your health card. Please read "
+    "the policy wording, including the exclusions, terms and conditions, carefully. Page {page}"
+)
+
+def build_policy(pages: int) -> str:
+    parts = []
+    for page in range(1, pages + 1):
+        parts.append(build_document(300, seed=page))
+        parts.append(DISCLAIMER.format(page=page))
+    return "\n\n".join(parts)
+
+def time_embedding(model, chunks) -> float:
+    start = time.perf_counter()
+    model.encode([chunk["text"] for chunk in chunks], batch_size=64, convert_to_numpy=True)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=100)
+    args = parser.parse_args()
+
+    chunks = smart_chunk_text(build_policy(args.pages), chunk_size=args.chunk_size, source_filename="policy.pdf")
+    kept, report = deduplicate_chunks(chunks)
+    print(f"📄 {args.pages} pages, {report['input_chunks']} chunks")
+    print(f"dedup         : {report['seconds']:.2f}s, removed {report['removed_chunks']} "
+          f"({report['removed_chunks'] / report['input_chunks']:.0%}) chunks")
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    full = time_embedding(model, chunks)
+    deduped = time_embedding(model, kept)
+    print(f"embed all     : {full:.2f}s")
+    print(f"embed deduped : {deduped:.2f}s  (saved {full - deduped:.2f}s)")
+
+if __name__ == "__main__":
+    main()
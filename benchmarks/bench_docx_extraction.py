@@ -0,0 +1,65 @@
+"""
+Benchmark the streaming DOCX parser against the python-docx object model.
+
+Builds a synthetic table-heavy DOCX (including merged cells) and times both
+implementations of _iter_docx_sections.
+
+Usage:
+    python -m benchmarks.bench_docx_extraction --paragraphs 5000 --tables 300
+"""
+import argparse
+import time
+from io import BytesIO
+
+import docx
+
+from src.pipeline.document_loader import _iter_docx_sections_fast, _iter_docx_sections_python_docx
+
+def build_docx(paragraphs: int, tables: int, rows: int, cols: int) -> bytes:
+    document = docx.Document()
+    document.sections[0].header.paragraphs[0].text = "National Parivar Mediclaim Plus Policy"
+    document.sections[0].footer.paragraphs[0].text = "UIN: NICHLIP25039V032425"
+    per_table = max(1, paragraphs // max(1, tables))
+    for i in range(paragraphs):
+        document.add_paragraph(f"Clause {i}: the Company shall indemnify Reasonable and Customary Charges.")
+        if tables and i % per_table == 0:
+            table = document.add_table(rows=rows, cols=cols)
+            for r in range(rows):
+                for c in range(cols):
+                    table.cell(r, c).text = f"r{r}c{c}"
+            # Merged cells are where python-docx repeats work
+            table.cell(0, 0).merge(table.cell(0, cols - 1))
+            table.cell(1, 0).merge(table.cell(rows - 1, 0))
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def timed(fn, data, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        sections = list(fn(data))
+        best = min(best, time.perf_counter() - start)
+    return best, sections
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--paragraphs", type=int, default=5000)
+    parser.add_argument("--tables", type=int, default=300)
+    parser.add_argument("--rows", type=int, default=10)
+    parser.add_argument("--cols", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = build_docx(args.paragraphs, args.tables, args.rows, args.cols)
+    print(f"📄 {args.paragraphs} paragraphs, {args.tables} tables of {args.rows}x{args.cols}, {len(data) / 1e6:.1f} MB")
+
+    slow, slow_sections = timed(_iter_docx_sections_python_docx, data, args.repeat)
+    fast, fast_sections = timed(_iter_docx_sections_fast, data, args.repeat)
+
+    print(f"python-docx : {slow:7.3f}s  {len(slow_sections)} blocks, {sum(map(len, slow_sections))} chars")
+    print(f"streaming   : {fast:7.3f}s  {len(fast_sections)} blocks, {sum(map(len, fast_sections))} chars")
+    print(f"speedup     : x{slow / fast:.1f}")
+
+if __name__ == "__main__":
+    main()
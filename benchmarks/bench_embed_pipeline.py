@@ -0,0 +1,106 @@
+"""
+Benchmark pipelined embed_and_store_stream against sequential encode-then-upsert.
+
+Upserts go to a local stand-in for the vector store that sleeps for a
+configurable round trip and can fail a fraction of requests, so retries
+are exercised too. Encoding uses all-MiniLM-L6-v2, or a model stand-in that
+sleeps per chunk with --simulate-encode-ms (to isolate the pipeline from
+model speed).
+
+Usage:
+    python -m benchmarks.bench_embed_pipeline --chunks 5000 --latency-ms 80
+"""
+import argparse
+import random
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.bench_splitter import WORDS
+from src.pipeline import embedder
+from src.pipeline.resources import EMBEDDING_DIMENSION, EMBEDDING_MODEL_NAME
+
+class StandInIndex:
+    """Thread-safe in-memory vector store with simulated network latency and failures."""
+
+    def __init__(self, latency_ms: float, failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency_ms / 1000
+        self.failure_rate = failure_rate
+        self.vectors = {}
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors):
+        time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            if self._rng.random() < self.failure_rate:
+                raise ConnectionError("simulated 503 from vector store")
+            for vector in vectors:
+                self.vectors[vector["id"]] = vector
+
+class SleepingModel:
+    """Returns random vectors after sleeping encode_ms per text (sleep releases the GIL, like torch)."""
+
+    def __init__(self, encode_ms: float):
+        self.encode_ms = encode_ms
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        time.sleep(len(texts) * self.encode_ms / 1000)
+        return np.random.rand(len(texts), EMBEDDING_DIMENSION).astype(np.float32)
+
+def legacy_embed_and_store(docs, index, model):
+    """The previous embed_and_store: encode everything, build every vector, upsert 100 at a time."""
+    texts = [doc["text"] for doc in docs]
+    embeddings = model.encode(texts, convert_to_numpy=True)
+    to_upsert = [
+        {"id": doc["id"], "values": embeddings[i].tolist(), "metadata": {**doc["metadata"], "text": doc["text"]}}
+        for i, doc in enumerate(docs)
+    ]
+    for i in range(0, len(to_upsert), 100):
+        index.upsert(vectors=to_upsert[i:i + 100])
+
+def build_chunks(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"bench-chunk-{i}",
+            "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(150, 300))),
+            "metadata": {"source": "bench", "chunk_index": i}
+        }
+        for i in range(count)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--failure-rate", type=float, default=0.02)
+    parser.add_argument("--simulate-encode-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    if args.simulate_encode_ms is not None:
+        model = SleepingModel(args.simulate_encode_ms)
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+    docs = build_chunks(args.chunks)
+    print(f"📦 {len(docs)} chunks, {args.latency_ms:.0f} ms per upsert, {args.failure_rate:.0%} failures (pipelined run only)")
+
+    start = time.perf_counter()
+    legacy_embed_and_store(docs, StandInIndex(args.latency_ms), model)
+    legacy = time.perf_counter() - start
+    print(f"sequential : {legacy:8.2f}s  {len(docs) / legacy:7.0f} chunks/s")
+
+    index = StandInIndex(args.latency_ms, args.failure_rate)
+    stats = embedder.embed_and_store_stream(docs, index=index, model=model, use_cache=False)
+    assert len(index.vectors) == len(docs)
+    print(f"pipelined  : {stats['wall_seconds']:8.2f}s  {len(docs) / stats['wall_seconds']:7.0f} chunks/s  "
+          f"({stats['retries']} retries)")
+    print(f"speedup    : x{legacy / stats['wall_seconds']:.1f}")
+
+if __name__ == "__main__":
+    main()
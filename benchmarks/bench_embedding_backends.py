@@ -0,0 +1,75 @@
+"""
+Benchmark the torch and int8 ONNX embedding backends on CPU.
+
+Checks that the quantized model agrees with the reference model (cosine
+similarity per sentence over a few hundred chunk-like texts), then
+measures throughput and per-call latency for every batch size / thread
+count pair.
+
+Needs sentence-transformers[onnx]. Usage:
+    python -m benchmarks.bench_embedding_backends --texts 512 --batch-sizes 1,8,32,128 --threads 1,2,4
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from benchmarks.bench_splitter import WORDS
+from src.pipeline.resources import EMBEDDING_MIN_COSINE, embedding_agreement, load_embedding_model
+
+def build_texts(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 250))) for _ in range(count)]
+
+def measure(model, texts: list, batch_size: int):
+    """Return (texts per second, median seconds per encode call)."""
+    model.encode(texts[:batch_size], batch_size=batch_size)  # Warm-up
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        call_start = time.perf_counter()
+        model.encode(texts[i:i + batch_size], batch_size=batch_size, convert_to_numpy=True)
+        latencies.append(time.perf_counter() - call_start)
+    return len(texts) / (time.perf_counter() - start), float(np.median(latencies))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-sizes", default="1,8,32,128")
+    parser.add_argument("--threads", default="1,2,4")
+    parser.add_argument("--backends", default="torch,onnx")
+    args = parser.parse_args()
+
+    texts = build_texts(args.texts)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    thread_counts = [int(threads) for threads in args.threads.split(",")]
+    backends = args.backends.split(",")
+
+    if "onnx" in backends:
+        agreement = embedding_agreement(load_embedding_model("onnx"), load_embedding_model("torch"), texts[:256])
+        status = "ok" if agreement["min_cosine"] >= EMBEDDING_MIN_COSINE else "BELOW THRESHOLD"
+        print(f"🎯 onnx vs torch cosine: min {agreement['min_cosine']:.4f}, mean {agreement['mean_cosine']:.4f} "
+              f"({status}, threshold {EMBEDDING_MIN_COSINE})")
+
+    print(f"{'backend':8} {'threads':>7} {'batch':>5} {'texts/s':>9} {'p50 call':>10}")
+    results = {}
+    for backend in backends:
+        for threads in thread_counts:
+            # A fresh model per thread count: ONNX Runtime fixes its thread pool when the session is created
+            model = load_embedding_model(backend, threads=threads)
+            for batch_size in batch_sizes:
+                rate, latency = measure(model, texts, batch_size)
+                results[backend, threads, batch_size] = rate
+                print(f"{backend:8} {threads:7d} {batch_size:5d} {rate:9.1f} {latency * 1000:8.1f}ms")
+
+    if "torch" in backends and "onnx" in backends:
+        for threads in thread_counts:
+            speedups = ", ".join(
+                f"batch {size} x{results['onnx', threads, size] / results['torch', threads, size]:.2f}"
+                for size in batch_sizes
+            )
+            print(f"⚡ onnx speedup with {threads} threads: {speedups}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark length-bucketed, multi-process encoding against plain model.encode.
+
+The texts mimic an ingest: mostly full chunks plus many short headers,
+footers and table rows, in document order. Runs:
+
+    baseline   model.encode(texts) in original order, batch_size 32
+    bucketed   EncodingScheduler in this process
+    N procs    EncodingScheduler over an EncodingPool of N workers
+
+With --simulate the model is a stand-in that burns CPU in proportion to
+the padded batch (batch size x longest text), like a transformer does,
+so the benchmark runs without sentence-transformers.
+
+Usage:
+    python -m benchmarks.bench_encoding_scheduler --texts 4000 --processes 1,2,4
+    python -m benchmarks.bench_encoding_scheduler --simulate --processes 1,2,4
+"""
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+from benchmarks.bench_splitter import WORDS
+from src.pipeline import encoding_scheduler
+from src.pipeline.encoding_scheduler import EncodingPool, EncodingScheduler
+from src.pipeline.resources import EMBEDDING_BACKEND, EMBEDDING_DIMENSION, load_embedding_model
+
+class PaddingCostModel:
+    """Spins for a fixed cost per padded token of each batch; returns deterministic vectors."""
+
+    max_seq_length = 256
+
+    def __init__(self, microseconds_per_token: float = 2.0):
+        self.seconds_per_token = microseconds_per_token / 1e6
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, **kwargs):
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
+            padded = len(batch) * min(self.max_seq_length, max(len(text) // 4 + 2 for text in batch))
+            deadline = time.perf_counter() + padded * self.seconds_per_token
+            while time.perf_counter() < deadline:
+                pass
+        rng = np.random.RandomState(len(texts))
+        return rng.rand(len(texts), EMBEDDING_DIMENSION).astype(np.float32)
+
+def _init_simulated_worker():
+    encoding_scheduler._worker_model = PaddingCostModel()
+
+def build_texts(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        words = rng.randint(250, 320) if rng.random() < 0.6 else rng.randint(3, 40)
+        texts.append(" ".join(rng.choice(WORDS) for _ in range(words)))
+    return texts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=4000)
+    parser.add_argument("--processes", default="1,2,4")
+    parser.add_argument("--simulate", action="store_true")
+    args = parser.parse_args()
+
+    texts = build_texts(args.texts)
+    model = PaddingCostModel() if args.simulate else load_embedding_model()
+    print(f"📦 {len(texts)} texts on {os.cpu_count()} cores ({'simulated' if args.simulate else EMBEDDING_BACKEND} model)")
+
+    start = time.perf_counter()
+    reference = model.encode(texts, batch_size=32, convert_to_numpy=True)
+    baseline = time.perf_counter() - start
+    print(f"baseline   : {baseline:8.2f}s  {len(texts) / baseline:7.0f} texts/s")
+
+    start = time.perf_counter()
+    bucketed = EncodingScheduler(model).encode(texts)
+    elapsed = time.perf_counter() - start
+    print(f"bucketed   : {elapsed:8.2f}s  {len(texts) / elapsed:7.0f} texts/s  x{baseline / elapsed:.2f}")
+    if not args.simulate:
+        cosine = np.sum(bucketed * reference, axis=1) / (np.linalg.norm(bucketed, axis=1) * np.linalg.norm(reference, axis=1))
+        print(f"             min cosine vs baseline {cosine.min():.6f}")
+
+    for processes in (int(count) for count in args.processes.split(",")):
+        if args.simulate:
+            pool = EncodingPool(processes, initializer=_init_simulated_worker, initargs=())
+        else:
+            pool = EncodingPool(processes)
+        try:
+            EncodingScheduler(model, pool=pool).encode(texts[:processes * 64])  # Load the model in every worker
+            start = time.perf_counter()
+            EncodingScheduler(model, pool=pool).encode(texts)
+            elapsed = time.perf_counter() - start
+        finally:
+            pool.close()
+        print(f"{processes:2d} procs   : {elapsed:8.2f}s  {len(texts) / elapsed:7.0f} texts/s  x{baseline / elapsed:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Benchmark format and encoding detection cost against upload size.
+
+Compares a full-buffer chardet.detect (the old load_and_clean fallback)
+with the sampled detect_encoding, plus the magic-byte detect_format.
+
+Usage:
+    python -m benchmarks.bench_format_detection --sizes-kb 64 1024 8192
+"""
+import argparse
+import time
+
+import chardet
+
+from src.pipeline.format_detector import detect_encoding, detect_format
+
+LINE = "Prämie für die Krankenversicherung: Leistungsübersicht und Ausschlüsse.\n"
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[64, 256, 1024, 4096])
+    parser.add_argument("--encoding", default="latin-1", help="encoding of the synthetic upload")
+    args = parser.parse_args()
+
+    print(f"{'size':>9} {'chardet.detect':>15} {'detect_encoding':>16} {'detect_format':>14}  result")
+    for size_kb in args.sizes_kb:
+        line = LINE.encode(args.encoding)
+        data = line * (size_kb * 1024 // len(line) + 1)
+
+        full_time, full_result = timed(chardet.detect, data)
+        sampled_time, sampled_result = timed(detect_encoding, data)
+        format_time, file_format = timed(detect_format, data, "upload.txt")
+
+        print(
+            f"{size_kb:>6} KB {full_time * 1000:>12.1f} ms {sampled_time * 1000:>13.1f} ms "
+            f"{format_time * 1000:>11.3f} ms  {full_result['encoding']} / {sampled_result} / {file_format}"
+        )
+
+if __name__ == "__main__":
+    main()
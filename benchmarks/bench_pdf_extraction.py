@@ -0,0 +1,61 @@
+"""
+Benchmark page-parallel PDF extraction.
+
+Builds a synthetic text-heavy PDF with PyMuPDF and times
+extract_text_from_pdf for a range of worker counts.
+
+Usage:
+    python -m benchmarks.bench_pdf_extraction --pages 600 --workers 1 2 4 8
+"""
+import argparse
+import os
+import time
+
+import fitz
+
+from src.pipeline.document_loader import extract_text_from_pdf
+
+PARAGRAPH = (
+    "The Company shall indemnify the Insured Person for Reasonable and Customary "
+    "Charges incurred for Medically Necessary Treatment during the Policy Period. "
+)
+
+def build_pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        text = f"Section {page_num + 1}\n" + PARAGRAPH * 20
+        page.insert_textbox(fitz.Rect(40, 40, 560, 800), text, fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=600)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pdf_bytes = build_pdf(args.pages)
+    print(f"📄 {args.pages} pages, {len(pdf_bytes) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+
+    baseline = None
+    reference = None
+    for workers in args.workers:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            text = extract_text_from_pdf(pdf_bytes, workers=workers)
+            timings.append(time.perf_counter() - start)
+
+        if reference is None:
+            reference = text
+        assert text == reference, "parallel output differs from serial output"
+
+        best = min(timings)
+        baseline = baseline or best
+        print(f"workers={workers:<3} {best:7.3f}s  {args.pages / best:8.1f} pages/s  speedup x{baseline / best:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Query latency as the shared index grows: questions about one document
+searched over the whole index (the previous process_file behaviour)
+against the same questions scoped to the document's doc_id.
+
+Documents are --chunks-per-doc random vectors around a per-document
+centre that shares a common "topic" direction with every other document,
+like many customers uploading similar policies. The index grows to each
+of --sizes vectors; at each size --questions questions (noisy copies of
+the document centre) are retrieved for one document, and "foreign" is the
+share of global results that came from other documents.
+
+Usage:
+    python -m benchmarks.bench_scoped_retrieval
+    python -m benchmarks.bench_scoped_retrieval --sizes 10000 100000 300000 --index-type flat
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from src.pipeline.faiss_store import FaissVectorStore
+from src.pipeline.resources import EMBEDDING_DIMENSION
+
+def normalize(rows):
+    return rows / np.linalg.norm(rows, axis=-1, keepdims=True)
+
+def make_document(rng, topic, count):
+    """A document centre close to the shared topic, and its chunk vectors."""
+    centre = normalize(topic + 0.6 * normalize(rng.randn(EMBEDDING_DIMENSION)))
+    chunks = normalize(centre + 0.08 * rng.randn(count, EMBEDDING_DIMENSION))
+    return centre, chunks.astype(np.float32)
+
+def timed_queries(store, queries, top_k, filter):
+    start = time.perf_counter()
+    results = store.query_many(queries, top_k=top_k, filter=filter)
+    return (time.perf_counter() - start) * 1000 / len(queries), results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 200000])
+    parser.add_argument("--chunks-per-doc", type=int, default=400)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--index-type", default="hnsw", choices=["flat", "ivf", "hnsw"])
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    topic = normalize(rng.randn(EMBEDDING_DIMENSION))
+    directory = tempfile.TemporaryDirectory()
+    store = FaissVectorStore(directory.name, EMBEDDING_DIMENSION, index_type=args.index_type)
+    print(f"📦 FAISS {args.index_type} store, {args.chunks_per_doc} chunks per document, {args.questions} questions, top_k={args.top_k}")
+
+    total, documents = 0, 0
+    for size in sorted(args.sizes):
+        while total < size:
+            centre, chunks = make_document(rng, topic, args.chunks_per_doc)
+            doc_id = f"doc{documents:05d}"
+            store.upsert([
+                {"id": f"{doc_id}-chunk-{i}", "values": row, "metadata": {"source": "policy.pdf", "doc_id": doc_id}}
+                for i, row in enumerate(chunks)
+            ])
+            total += len(chunks)
+            documents += 1
+        store.flush()
+
+        # Ask about the most recently ingested document, as process_file does
+        queries = normalize(centre + 0.15 * rng.randn(args.questions, EMBEDDING_DIMENSION)).astype(np.float32)
+        timed_queries(store, queries[:2], args.top_k, None)  # Warm up
+        global_ms, results = timed_queries(store, queries, args.top_k, None)
+        scoped_ms, _ = timed_queries(store, queries, args.top_k, {"doc_id": {"$eq": doc_id}})
+        matches = [match for result in results for match in result]
+        foreign = sum(match["metadata"]["doc_id"] != doc_id for match in matches) / max(len(matches), 1)
+        print(f"{total:8d} vectors ({documents:4d} docs): global {global_ms:7.3f} ms/query "
+              f"(foreign {foreign:6.1%})   scoped {scoped_ms:7.3f} ms/query")
+
+    directory.cleanup()
+
+if __name__ == "__main__":
+    main()
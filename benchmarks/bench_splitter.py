@@ -0,0 +1,55 @@
+"""
+Benchmark smart_chunk_text against the previous quadratic implementation.
+
+The legacy version (tests/legacy_splitter.py) re-encoded the whole
+growing chunk for every paragraph; it is kept only as a reference point.
+Both must produce identical chunks.
+
+Usage:
+    python -m benchmarks.bench_splitter --tokens 1000000
+"""
+import argparse
+import random
+import time
+
+from src.pipeline.splitter import ENCODER_NAME, get_encoder, smart_chunk_text
+from tests.legacy_splitter import WORDS, legacy_smart_chunk_text
+
+def build_document(target_tokens: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    encoding = get_encoder(ENCODER_NAME)
+    paragraphs = []
+    tokens = 0
+    while tokens < target_tokens:
+        # Mostly short clauses, occasionally a paragraph longer than a chunk
+        length = rng.choice([8, 20, 40, 80, 600]) if rng.random() < 0.05 else rng.randint(5, 60)
+        paragraph = " ".join(rng.choice(WORDS) for _ in range(length)) + rng.choice([".", ":", ";", ""])
+        paragraphs.append(paragraph)
+        tokens += len(encoding.encode(paragraph)) + 1
+    return "\n\n".join(paragraphs)
+
+def timed(fn, text):
+    start = time.perf_counter()
+    result = fn(text)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=1_000_000)
+    parser.add_argument("--skip-legacy", action="store_true", help="only time the current implementation")
+    args = parser.parse_args()
+
+    text = build_document(args.tokens)
+    print(f"📄 ~{args.tokens} tokens, {len(text)} characters")
+
+    new_time, new_chunks = timed(smart_chunk_text, text)
+    print(f"smart_chunk_text        : {new_time:8.2f}s  {len(new_chunks)} chunks")
+
+    if not args.skip_legacy:
+        old_time, old_chunks = timed(legacy_smart_chunk_text, text)
+        print(f"legacy smart_chunk_text : {old_time:8.2f}s  {len(old_chunks)} chunks")
+        print(f"identical output        : {old_chunks == new_chunks}")
+        print(f"speedup                 : x{old_time / new_time:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Recall versus memory of quantized FAISS storage, against exact float32 search.
+
+Chunks a policy corpus (the given documents, or the synthetic policy from
+bench_splitter), embeds it with all-MiniLM-L6-v2 and searches it with
+other chunks used as queries. For each index type / quantization it reports
+recall@k against exact search, with re-scoring (FAISS_RESCORE_FACTOR
+candidates per result) and without (factor 1, i.e. the codes alone),
+plus the in-memory code size and query latency.
+
+--synthetic replaces the model with clustered random unit vectors, so it
+runs without sentence-transformers.
+
+Usage:
+    python -m benchmarks.bench_vector_quantization --documents policy1.pdf policy2.pdf
+    python -m benchmarks.bench_vector_quantization --synthetic --vectors 50000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_splitter import build_document
+from src.pipeline import faiss_store
+from src.pipeline.faiss_store import FaissVectorStore
+from src.pipeline.resources import EMBEDDING_DIMENSION
+
+CONFIGS = [
+    ("flat", "none"), ("flat", "fp16"), ("flat", "int8"), ("flat", "binary"),
+    ("hnsw", "none"), ("hnsw", "int8"), ("ivf", "int8")
+]
+
+def corpus_embeddings(documents: list, pages: int) -> np.ndarray:
+    from src.pipeline.document_loader import load_and_clean
+    from src.pipeline.embedding_cache import embedding_cache
+    from src.pipeline.resources import EMBEDDING_MODEL_NAME, load_embedding_model
+    from src.pipeline.splitter import smart_chunk_text
+
+    if documents:
+        texts = []
+        for path in documents:
+            with open(path, "rb") as f:
+                texts.append(load_and_clean(f.read(), os.path.basename(path)))
+    else:
+        texts = [build_document(300, seed=page) for page in range(pages)]
+    chunks = [chunk["text"] for text in texts for chunk in smart_chunk_text(text, chunk_size=200, chunk_overlap=20)]
+    print(f"🔢 Embedding {len(chunks)} chunks...")
+    return embedding_cache.encode(load_embedding_model(), EMBEDDING_MODEL_NAME, chunks)
+
+def synthetic_embeddings(count: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors around 200 topic centres, roughly as clustered as chunk embeddings."""
+    rng = np.random.RandomState(seed)
+    centres = rng.randn(200, EMBEDDING_DIMENSION)
+    vectors = centres[rng.randint(0, 200, count)] + 0.8 * rng.randn(count, EMBEDDING_DIMENSION)
+    vectors = vectors.astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def recall(store, queries: np.ndarray, truth: list, top_k: int) -> tuple:
+    hits, start = 0, time.perf_counter()
+    for query, expected in zip(queries, truth):
+        found = {match["id"] for match in store.query(query, top_k=top_k)}
+        hits += len(found & expected)
+    return hits / (len(queries) * top_k), (time.perf_counter() - start) / len(queries)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", nargs="*", default=[])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = synthetic_embeddings(args.vectors) if args.synthetic else corpus_embeddings(args.documents, args.pages)
+    rng = np.random.RandomState(1)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)] + 0.05 * rng.randn(args.queries, EMBEDDING_DIMENSION).astype(np.float32)
+    rows = [{"id": f"chunk-{i}", "values": vector, "metadata": {"source": "bench"}} for i, vector in enumerate(vectors)]
+
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    exact = np.argsort(-(queries @ normalized.T), axis=1)[:, :args.top_k]
+    truth = [{f"chunk-{i}" for i in row} for row in exact]
+    faiss_store.FAISS_IVF_NLIST = max(16, int(np.sqrt(len(vectors))))
+
+    print(f"📦 {len(vectors)} vectors x {EMBEDDING_DIMENSION} dims, {args.queries} queries, recall@{args.top_k} vs exact float32")
+    print(f"{'index':6} {'codes':7} {'bytes/vec':>9} {'codes MB':>9} {'recall':>7} {'+rescore':>9} {'ms/query':>9}")
+    for index_type, quantization in CONFIGS:
+        with tempfile.TemporaryDirectory() as directory:
+            store = FaissVectorStore(directory, EMBEDDING_DIMENSION, index_type=index_type, quantization=quantization)
+            for i in range(0, len(rows), 5000):
+                store.upsert(rows[i:i + 5000])
+            stats = store.stats()
+
+            faiss_store.FAISS_RESCORE_FACTOR = 1
+            codes_only, _ = recall(store, queries, truth, args.top_k)
+            faiss_store.FAISS_RESCORE_FACTOR = 8
+            rescored, latency = recall(store, queries, truth, args.top_k)
+
+        size = stats["code_bytes_per_vector"]
+        rescore = f"{rescored:9.3f}" if quantization != "none" else f"{'-':>9}"
+        print(f"{index_type:6} {quantization:7} {size:9d} {size * len(vectors) / 2**20:9.1f} {codes_only:7.3f} {rescore} {latency * 1000:9.2f}")
+
+if __name__ == "__main__":
+    main()
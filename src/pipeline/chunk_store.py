@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import tempfile
+import threading
+
+from src.pipeline.vector_store import VECTOR_STORE
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CHUNK_STORE_PATH = os.environ.get(
+    "CHUNK_STORE_PATH",
+    os.path.join(tempfile.gettempdir(), "hackrx-chunks.sqlite3")
+)
+# Keep chunk text here instead of in vector metadata. On by default only for
+# FAISS, whose snapshots are local files like this one; a hosted Pinecone index
+# outlives the local file (restarts, other replicas), so its vectors keep the text
+CHUNK_STORE_ENABLED = os.environ.get("CHUNK_STORE_ENABLED", "1" if VECTOR_STORE == "faiss" else "0") != "0"
+# SQLite limits the number of bound parameters per statement
+LOOKUP_BATCH = 500
+
+class ChunkStore:
+    """
+    SQLite table of chunk texts keyed by chunk (= vector) ID.
+
+    Vectors only carry compact metadata; retrieval reads the texts of its
+    top-k matches here in one query. WAL mode and one connection per
+    thread, as in EmbeddingCache, so several workers can share the file.
+    """
+
+    def __init__(self, path: str = CHUNK_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id TEXT PRIMARY KEY,
+                    source TEXT,
+                    text TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def put_many(self, chunks):
+        """Store {"id", "text", "metadata"} chunks, replacing existing texts."""
+        rows = [(chunk["id"], chunk["metadata"].get("source"), chunk["text"]) for chunk in chunks]
+        if not rows:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO chunks (id, source, text) VALUES (?, ?, ?)", rows)
+
+    def get_many(self, ids: list) -> dict:
+        """Return {id: text} for the ids that are stored."""
+        conn = self._connect()
+        found = {}
+        unique_ids = list(dict.fromkeys(ids))
+        for start in range(0, len(unique_ids), LOOKUP_BATCH):
+            batch = unique_ids[start:start + LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            found.update(conn.execute(f"SELECT id, text FROM chunks WHERE id IN ({placeholders})", batch).fetchall())
+        return found
+
+    def delete_ids(self, ids: list):
+        conn = self._connect()
+        with conn:
+            for start in range(0, len(ids), LOOKUP_BATCH):
+                batch = ids[start:start + LOOKUP_BATCH]
+                conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+
+    def delete_source(self, source: str) -> int:
+        conn = self._connect()
+        with conn:
+            return conn.execute("DELETE FROM chunks WHERE source = ?", (source,)).rowcount
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM chunks")
+
+    def stats(self) -> dict:
+        count, total = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(text)), 0) FROM chunks").fetchone()
+        return {"chunks": count, "text_chars": total}
+
+chunk_store = ChunkStore()
@@ -0,0 +1,178 @@
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "1") != "0"
+# Estimated Jaccard similarity of word shingles at which two chunks count as duplicates
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", "0.8"))
+DEDUP_NUM_PERM = 128
+# 32 bands of 4 rows put the LSH S-curve threshold at ~0.42: a pair at the
+# 0.8 default DEDUP_THRESHOLD shares a bucket with probability 1-(1-0.8^4)^32,
+# i.e. all but ~5e-8 of the time (16 bands of 8 rows would only reach ~0.95)
+DEDUP_BANDS = 32
+SHINGLE_WORDS = 3
+# Duplicate ids recorded on a kept chunk (its "occurrences" count covers all of them)
+DUPLICATE_IDS_KEPT = 100
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD = re.compile(r"\w+")
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> np.ndarray:
+    """CRC32 hashes of the lower-cased word size-grams of text."""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        grams = [" ".join(words)]
+    else:
+        grams = (" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+    return np.fromiter({zlib.crc32(gram.encode("utf-8")) for gram in grams}, dtype=np.uint64)
+
+class MinHashLSH:
+    """
+    MinHash signatures indexed by LSH banding.
+
+    Each signature is split into bands; two texts become candidates when any
+    band matches exactly, and candidates are confirmed by comparing the full
+    signatures. This finds near-duplicates without comparing every pair.
+    """
+
+    def __init__(self, num_perm: int = DEDUP_NUM_PERM, bands: int = DEDUP_BANDS, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingles(text)[:, None]
+        # Universal hashing (a * x + b) mod p; uint64 overflow wraps, as in datasketch
+        permuted = ((hashes * self._a + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def insert(self, key, signature: np.ndarray):
+        self._signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def best_match(self, signature: np.ndarray):
+        """Return (key, estimated Jaccard) of the most similar inserted signature, or (None, 0.0)."""
+        candidates = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(band_key, ()))
+
+        best_key, best_similarity = None, 0.0
+        for key in candidates:
+            similarity = float(np.mean(self._signatures[key] == signature))
+            if similarity > best_similarity:
+                best_key, best_similarity = key, similarity
+        return best_key, best_similarity
+
+class ChunkDeduplicator:
+    """
+    Incremental near-duplicate filter for a stream of chunks.
+
+    The first chunk of each group of near-identical chunks (repeated
+    headers, footers, disclaimers) passes; later ones are dropped and
+    recorded against it in occurrences, for provenance.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = DEDUP_NUM_PERM, bands: int = DEDUP_BANDS):
+        self.threshold = threshold
+        self.lsh = MinHashLSH(num_perm=num_perm, bands=bands)
+        self.seen = 0
+        self.kept = 0
+        self.seconds = 0.0
+        self.occurrences = {}
+
+    def add(self, chunk: dict) -> bool:
+        """Return True if chunk is new and should be embedded."""
+        start = time.perf_counter()
+        self.seen += 1
+        signature = self.lsh.signature(chunk["text"])
+        match, similarity = self.lsh.best_match(signature)
+        if match is not None and similarity >= self.threshold:
+            self.occurrences.setdefault(match, []).append({
+                "id": chunk["id"],
+                "chunk_index": chunk["metadata"].get("chunk_index"),
+                "similarity": round(similarity, 3)
+            })
+            unique = False
+        else:
+            self.lsh.insert(chunk["id"], signature)
+            self.kept += 1
+            unique = True
+        self.seconds += time.perf_counter() - start
+        return unique
+
+    def provenance(self) -> dict:
+        """{kept id: provenance_metadata(...)} for every chunk that had duplicates dropped."""
+        return {kept_id: provenance_metadata(duplicates) for kept_id, duplicates in self.occurrences.items()}
+
+    def filter(self, chunks):
+        """Yield only the chunks that add() accepts."""
+        for chunk in chunks:
+            if self.add(chunk):
+                yield chunk
+
+    def report(self) -> dict:
+        """
+        Input/kept/removed counts, time spent and "occurrences":
+        {kept id: [{"id", "chunk_index", "similarity"}, ...]} for every
+        chunk that was dropped.
+        """
+        return {
+            "input_chunks": self.seen,
+            "kept_chunks": self.kept,
+            "removed_chunks": self.seen - self.kept,
+            "seconds": self.seconds,
+            "occurrences": self.occurrences
+        }
+
+def provenance_metadata(duplicates: list) -> dict:
+    """
+    Metadata fields for a kept chunk: "occurrences" (itself plus its dropped
+    duplicates) and "duplicates", the ids of up to DUPLICATE_IDS_KEPT of them.
+    """
+    return {
+        "occurrences": len(duplicates) + 1,
+        "duplicates": [duplicate["id"] for duplicate in duplicates[:DUPLICATE_IDS_KEPT]]
+    }
+
+def deduplicate_chunks(chunks: list, threshold: float = DEDUP_THRESHOLD, num_perm: int = DEDUP_NUM_PERM, bands: int = DEDUP_BANDS):
+    """
+    Drop near-duplicate chunks before embedding.
+
+    Like ChunkDeduplicator, but since the whole list is known up front the
+    kept chunk's metadata also gets the provenance_metadata of its
+    duplicates, so retrieval can tell boilerplate from content and trace
+    every place it occurred.
+
+    Returns:
+        (kept chunks, ChunkDeduplicator.report())
+    """
+    deduplicator = ChunkDeduplicator(threshold=threshold, num_perm=num_perm, bands=bands)
+    kept = list(deduplicator.filter(chunks))
+
+    provenance = deduplicator.provenance()
+    for chunk in kept:
+        if chunk["id"] in provenance:
+            chunk["metadata"].update(provenance[chunk["id"]])
+
+    report = deduplicator.report()
+    logger.info(f"Deduplicated {report['input_chunks']} chunks to {report['kept_chunks']} in {report['seconds']:.2f}s")
+    return kept, report
@@ -1,61 +1,115 @@
-import docx
-from docx.document import Document
-from docx.oxml.table import CT_Tbl
-from docx.oxml.text.paragraph import CT_P
-from docx.table import _Cell, Table
-from docx.text.paragraph import Paragraph
 import email
-from bs4 import BeautifulSoup
-import chardet
 from typing import Union
 from io import BytesIO
-import requests
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
 import tempfile
 import os
-import logging
+from src.utils.logger import get_logger
+from src.pipeline.extraction_cache import extraction_cache, EXTRACTION_CACHE_ENABLED
+from src.pipeline.format_detector import detect_format, detect_encoding
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+logger = get_logger(__name__)
 
-# Try different PDF libraries with better error handling
-PYMUPDF_AVAILABLE = False
-PYPDF2_AVAILABLE = False
-PDFPLUMBER_AVAILABLE = False
+# Extraction backends are imported on first use rather than at import time,
+# so importing this module (and app.main) stays cheap. Each probe runs once
+# per process and returns the module, or None if it is not installed.
 
-try:
-    import fitz  # PyMuPDF
+@lru_cache(maxsize=None)
+def _get_fitz():
+    try:
+        import fitz  # PyMuPDF
+    except ImportError as e:
+        logger.warning(f"⚠️ PyMuPDF not available: {e}")
+        return None
+    
     # Test if fitz.open is available
-    if hasattr(fitz, 'open'):
-        PYMUPDF_AVAILABLE = True
-        logger.info(f"✅ PyMuPDF available (version: {getattr(fitz, '__version__', 'Unknown')})")
-    else:
+    if not hasattr(fitz, 'open'):
         logger.warning("⚠️ PyMuPDF imported but 'open' method not available")
-except ImportError as e:
-    logger.warning(f"⚠️ PyMuPDF not available: {e}")
+        return None
+    
+    logger.info(f"✅ PyMuPDF available (version: {getattr(fitz, '__version__', 'Unknown')})")
+    return fitz
 
-try:
-    import PyPDF2
-    PYPDF2_AVAILABLE = True
+@lru_cache(maxsize=None)
+def _get_pypdf2():
+    try:
+        import PyPDF2
+    except ImportError as e:
+        logger.warning(f"⚠️ PyPDF2 not available: {e}")
+        return None
+    
     logger.info(f"✅ PyPDF2 available (version: {getattr(PyPDF2, '__version__', 'Unknown')})")
-except ImportError as e:
-    logger.warning(f"⚠️ PyPDF2 not available: {e}")
+    return PyPDF2
 
-try:
-    import pdfplumber
-    PDFPLUMBER_AVAILABLE = True
+@lru_cache(maxsize=None)
+def _get_pdfplumber():
+    try:
+        import pdfplumber
+    except ImportError as e:
+        logger.warning(f"⚠️ pdfplumber not available: {e}")
+        return None
+    
     logger.info(f"✅ pdfplumber available")
-except ImportError as e:
-    logger.warning(f"⚠️ pdfplumber not available: {e}")
+    return pdfplumber
 
-try:
-    import pytesseract
-    from PIL import Image
-    OCR_AVAILABLE = True
+@lru_cache(maxsize=None)
+def _get_ocr():
+    """Return (pytesseract, PIL.Image), or None if OCR is unavailable."""
+    try:
+        import pytesseract
+        from PIL import Image
+    except ImportError as e:
+        logger.warning(f"⚠️ OCR libraries not available: {e}")
+        return None
+    
     logger.info("✅ OCR libraries available")
-except ImportError as e:
-    OCR_AVAILABLE = False
-    logger.warning(f"⚠️ OCR libraries not available: {e}")
+    return pytesseract, Image
+
+_BACKEND_PROBES = {
+    "PYMUPDF_AVAILABLE": _get_fitz,
+    "PYPDF2_AVAILABLE": _get_pypdf2,
+    "PDFPLUMBER_AVAILABLE": _get_pdfplumber,
+    "OCR_AVAILABLE": _get_ocr,
+}
+
+def __getattr__(name):
+    # Keep the old *_AVAILABLE module flags working; they now probe lazily
+    if name in _BACKEND_PROBES:
+        return _BACKEND_PROBES[name]() is not None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Parallel PDF extraction settings (0 workers = use all CPUs)
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", "0"))
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "64"))
+
+# OCR settings (0 workers = use all CPUs)
+OCR_DPI = int(os.environ.get("OCR_DPI", "200"))
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", "0"))
+OCR_MAX_DIMENSION = int(os.environ.get("OCR_MAX_DIMENSION", "2500"))
+OCR_MIN_TEXT_CHARS = int(os.environ.get("OCR_MIN_TEXT_CHARS", "20"))
+
+# Parse DOCX XML directly instead of through the python-docx object model
+DOCX_FAST_PATH = os.environ.get("DOCX_FAST_PATH", "1") != "0"
+
+# Email attachment extraction limits
+EMAIL_ATTACHMENT_WORKERS = int(os.environ.get("EMAIL_ATTACHMENT_WORKERS", "4"))
+EMAIL_ATTACHMENT_BUDGET_MB = int(os.environ.get("EMAIL_ATTACHMENT_BUDGET_MB", "50"))
+EMAIL_MAX_DEPTH = int(os.environ.get("EMAIL_MAX_DEPTH", "3"))
+
+# Separator assumed between records yielded by iter_pages
+PAGE_SEPARATOR = "\n\n"
+
+# Bump whenever extraction output changes so stale cache entries are ignored
+EXTRACTOR_VERSION = "5"
+
+def _cache_key(file_bytes: bytes, filename: str):
+    """Extraction cache key for an upload, or None when caching does not apply."""
+    if not EXTRACTION_CACHE_ENABLED or filename.startswith("http") or not file_bytes:
+        return None
+    return extraction_cache.make_key(file_bytes, filename, EXTRACTOR_VERSION)
 
 def load_and_clean(file_bytes: bytes, filename: str) -> str:
     """
@@ -70,64 +124,208 @@ def load_and_clean(file_bytes: bytes, filename: str) -> str:
     """
     logger.info(f"Processing file: {filename}")
     
+    cache_key = _cache_key(file_bytes, filename)
+    if cache_key:
+        cached = extraction_cache.get_text(cache_key)
+        if cached is not None:
+            logger.info(f"Extraction cache hit for {filename}")
+            return cached
+    
     try:
-        if filename.startswith("http"):  # web URL case
+        file_format = "url" if filename.startswith("http") else detect_format(file_bytes, filename)
+        
+        if file_format == "url":  # web URL case
             text = extract_text_from_url(filename)
-        elif filename.lower().endswith(".pdf"):
+        elif file_format == "pdf":
             text = extract_text_from_pdf(file_bytes)
-        elif filename.lower().endswith(".docx"):
+        elif file_format == "docx":
             text = extract_text_from_docx(file_bytes)
-        elif filename.lower().endswith((".eml", ".msg")):
+        elif file_format == "email":
             text = extract_text_from_email(file_bytes)
-        elif filename.lower().endswith((".png", ".jpg", ".jpeg", ".tiff", ".bmp")):
+        elif file_format == "image":
             text = extract_text_from_image(file_bytes)
         else:
-            # Try to detect if it's a text file
-            try:
-                encoding = chardet.detect(file_bytes)["encoding"] or "utf-8"
-                text = file_bytes.decode(encoding, errors="ignore")
-            except:
-                raise ValueError(f"Unsupported file format: {filename}")
+            text = _decode_text(file_bytes, filename)
         
         if not text or not text.strip():
             raise ValueError(f"No text could be extracted from {filename}")
         
-        return text.strip()
+        text = text.strip()
+        if cache_key:
+            extraction_cache.put_text(cache_key, text)
+        return text
         
     except Exception as e:
         logger.error(f"Error processing file {filename}: {str(e)}")
         raise ValueError(f"Error processing file {filename}: {str(e)}")
 
-def extract_text_from_pdf(file_bytes: bytes) -> str:
+def iter_pages(file_bytes: bytes, filename: str):
+    """
+    Stream a document as page/section records instead of one big string.
+    
+    PDFs yield one record per page, DOCX files one per paragraph/table block
+    (headers and footers last), emails one for the headers and one per body
+    part, and URLs follow the PDF or HTML rules depending on content type.
+    Pages are extracted lazily, so only the current page is held in memory.
+    Records of uploaded files are also spooled to the extraction cache, so
+    re-uploads replay them without parsing the document again.
+    
+    Args:
+        file_bytes: The file content as bytes (ignored for URLs)
+        filename: The filename or URL
+        
+    Yields:
+        Dicts with keys 'index', 'page' (1-based page number, or None for
+        non-paginated sections), 'text', 'start_char' and 'end_char'.
+        Offsets index into PAGE_SEPARATOR.join(record texts), i.e. the
+        document as if it had been extracted in one piece.
+    """
+    logger.info(f"Streaming file: {filename}")
+    
+    cache_key = _cache_key(file_bytes, filename)
+    if cache_key:
+        cached = extraction_cache.iter_pages(cache_key)
+        if cached is not None:
+            logger.info(f"Extraction cache hit for {filename}")
+            yield from cached
+            return
+    
+    file_format = "url" if filename.startswith("http") else detect_format(file_bytes, filename)
+    if file_format == "url":  # web URL case
+        sections = _iter_url_sections(filename)
+    elif file_format == "pdf":
+        sections = _iter_pdf_pages(file_bytes)
+    elif file_format == "docx":
+        sections = ((None, text) for text in _iter_docx_sections(file_bytes))
+    elif file_format == "email":
+        sections = ((None, text) for text in _iter_email_sections(file_bytes))
+    elif file_format == "image":
+        sections = [(None, extract_text_from_image(file_bytes))]
+    else:
+        sections = [(None, _decode_text(file_bytes, filename))]
+    
+    records = _iter_page_records(sections)
+    if cache_key:
+        records = extraction_cache.write_pages(cache_key, records)
+    yield from records
+
+def _decode_text(file_bytes: bytes, filename: str) -> str:
+    """Decode a file that is not in a known format as text."""
+    try:
+        encoding = detect_encoding(file_bytes)
+        return file_bytes.decode(encoding, errors="ignore")
+    except:
+        raise ValueError(f"Unsupported file format: {filename}")
+
+def _iter_page_records(sections):
+    """Turn (page, text) pairs into iter_pages records with running offsets."""
+    index = 0
+    offset = 0
+    for page, text in sections:
+        text = text.strip() if text else ""
+        if not text:
+            continue
+        yield {
+            "index": index,
+            "page": page,
+            "text": text,
+            "start_char": offset,
+            "end_char": offset + len(text)
+        }
+        index += 1
+        offset += len(text) + len(PAGE_SEPARATOR)
+
+def _iter_pdf_pages(file_bytes: bytes):
+    """
+    Yield (page, text) per PDF page, falling back between libraries like
+    extract_text_from_pdf: PyMuPDF, then PyPDF2, then pdfplumber.
+    
+    A library that fails or finds no text at all hands over to the next
+    one, which starts again from the first page; if it fails after some
+    text was already yielded, the next one continues from the failed page.
+    """
+    readers = [
+        (name, reader) for name, library, reader in (
+            ("PyMuPDF", _get_fitz(), _iter_fitz_pages),
+            ("PyPDF2", _get_pypdf2(), _iter_pypdf2_pages),
+            ("pdfplumber", _get_pdfplumber(), _iter_pdfplumber_pages)
+        ) if library
+    ]
+    if not readers:
+        raise ValueError("No PDF processing library available. Please install PyMuPDF, PyPDF2, or pdfplumber using:\npip install PyMuPDF PyPDF2 pdfplumber")
+    
+    start = 0
+    found_text = False
+    for name, reader in readers:
+        try:
+            for page_num, page_text in reader(file_bytes, start):
+                start = page_num + 1
+                found_text = found_text or bool(page_text and page_text.strip())
+                yield page_num + 1, page_text or ""
+            if found_text:
+                return
+            logger.warning(f"{name}: No text extracted")
+        except Exception as e:
+            logger.error(f"{name} failed: {e}")
+        if not found_text:
+            start = 0
+    
+    if found_text:
+        raise ValueError(f"All PDF processing methods failed after page {start}.")
+    raise ValueError("All PDF processing methods failed. This might be a scanned PDF or image-based PDF that requires OCR processing.")
+
+def _iter_pypdf2_pages(file_bytes: bytes, start: int = 0):
+    """Yield (page_num, page_text) from page start on with PyPDF2."""
+    reader = _get_pypdf2().PdfReader(BytesIO(file_bytes))
+    for page_num in range(start, len(reader.pages)):
+        yield page_num, reader.pages[page_num].extract_text() or ""
+
+def _iter_pdfplumber_pages(file_bytes: bytes, start: int = 0):
+    """Yield (page_num, page_text) from page start on with pdfplumber."""
+    with _get_pdfplumber().open(BytesIO(file_bytes)) as pdf:
+        for page_num in range(start, len(pdf.pages)):
+            yield page_num, pdf.pages[page_num].extract_text() or ""
+
+def extract_text_from_pdf(file_bytes: bytes, workers: int = None) -> str:
     """
     Extract text from PDF using available PDF libraries with improved error handling.
+    
+    Args:
+        file_bytes: The PDF content as bytes
+        workers: Number of worker processes for PyMuPDF page extraction.
+            Defaults to PDF_EXTRACT_WORKERS (or the CPU count when unset).
+            Documents shorter than PDF_PARALLEL_MIN_PAGES are always
+            extracted in-process.
     """
-    if not any([PYMUPDF_AVAILABLE, PYPDF2_AVAILABLE, PDFPLUMBER_AVAILABLE]):
+    text = ""
+    fitz, PyPDF2, pdfplumber = _get_fitz(), _get_pypdf2(), _get_pdfplumber()
+    if not any([fitz, PyPDF2, pdfplumber]):
         raise ValueError("No PDF processing library available. Please install PyMuPDF, PyPDF2, or pdfplumber using:\npip install PyMuPDF PyPDF2 pdfplumber")
     
     # Method 1: PyMuPDF (fastest and most reliable)
-    if PYMUPDF_AVAILABLE:
+    if fitz:
         try:
             logger.info("Trying PyMuPDF...")
             doc = fitz.open(stream=file_bytes, filetype="pdf")
-            text = ""
             page_count = doc.page_count
+            doc.close()
             logger.info(f"PDF has {page_count} pages")
             
-            for page_num in range(page_count):
-                page = doc[page_num]
-                page_text = page.get_text()
-                if page_text and page_text.strip():
-                    text += page_text + "\n"
-                    logger.debug(f"Page {page_num + 1}: {len(page_text)} characters")
-                else:
-                    logger.debug(f"Page {page_num + 1}: No text found")
+            if workers is None:
+                workers = PDF_EXTRACT_WORKERS or os.cpu_count() or 1
+            workers = min(workers, page_count)
             
-            doc.close()
+            if workers > 1 and page_count >= PDF_PARALLEL_MIN_PAGES:
+                page_texts = _extract_pages_parallel(file_bytes, page_count, workers)
+                logger.info(f"Extracted {page_count} pages with {workers} worker processes")
+            else:
+                page_texts = _extract_page_range(file_bytes, 0, page_count)
             
-            if text.strip():
+            text = _join_page_texts(page_texts)
+            
+            if text:
                 logger.info(f"✅ PyMuPDF extracted {len(text)} characters from {page_count} pages")
-                return text.strip()
+                return text
             else:
                 logger.warning("PyMuPDF: No text extracted (possibly scanned/image PDF)")
                 
@@ -135,7 +333,7 @@ def extract_text_from_pdf(file_bytes: bytes) -> str:
             logger.error(f"PyMuPDF failed: {e}")
     
     # Method 2: PyPDF2
-    if PYPDF2_AVAILABLE:
+    if PyPDF2:
         try:
             logger.info("Trying PyPDF2...")
             reader = PyPDF2.PdfReader(BytesIO(file_bytes))
@@ -161,7 +359,7 @@ def extract_text_from_pdf(file_bytes: bytes) -> str:
             logger.error(f"PyPDF2 failed: {e}")
     
     # Method 3: pdfplumber
-    if PDFPLUMBER_AVAILABLE:
+    if pdfplumber:
         try:
             logger.info("Trying pdfplumber...")
             with pdfplumber.open(BytesIO(file_bytes)) as pdf:
@@ -193,41 +391,147 @@ def extract_text_from_pdf(file_bytes: bytes) -> str:
     
     raise ValueError(error_msg)
 
-def extract_text_from_pdf_with_ocr(file_bytes: bytes) -> str:
+def _join_page_texts(page_texts: list) -> str:
+    """Join per-page texts in page order, skipping pages without text."""
+    return "".join(page_text + "\n" for page_text in page_texts if page_text and page_text.strip()).strip()
+
+def _extract_page_range(file_bytes: bytes, start: int, stop: int) -> list:
+    """
+    Extract text for pages [start, stop) with PyMuPDF.
+    
+    Runs both in-process and inside pool workers, so it must stay a
+    module-level function.
+    """
+    return [page_text for _, page_text in _iter_fitz_pages(file_bytes, start, stop)]
+
+def _iter_fitz_pages(file_bytes: bytes, start: int = 0, stop: int = None):
+    """
+    Yield (page_num, page_text) for pages [start, stop) with PyMuPDF.
+    
+    Pages that PyMuPDF fails on are retried individually with PyPDF2 and then
+    pdfplumber.
+    """
+    doc = _get_fitz().open(stream=file_bytes, filetype="pdf")
+    try:
+        if stop is None:
+            stop = doc.page_count
+        for page_num in range(start, stop):
+            try:
+                page_text = doc[page_num].get_text()
+            except Exception as e:
+                logger.warning(f"PyMuPDF failed on page {page_num + 1}: {e}")
+                page_text = _extract_page_fallback(file_bytes, page_num)
+            
+            if page_text and page_text.strip():
+                logger.debug(f"Page {page_num + 1}: {len(page_text)} characters")
+            else:
+                logger.debug(f"Page {page_num + 1}: No text found")
+            yield page_num, page_text or ""
+    finally:
+        doc.close()
+
+def _extract_page_fallback(file_bytes: bytes, page_num: int) -> str:
+    """Extract a single page with PyPDF2, then pdfplumber."""
+    PyPDF2, pdfplumber = _get_pypdf2(), _get_pdfplumber()
+    if PyPDF2:
+        try:
+            return PyPDF2.PdfReader(BytesIO(file_bytes)).pages[page_num].extract_text() or ""
+        except Exception as e:
+            logger.warning(f"PyPDF2 failed on page {page_num + 1}: {e}")
+    
+    if pdfplumber:
+        try:
+            with pdfplumber.open(BytesIO(file_bytes)) as pdf:
+                return pdf.pages[page_num].extract_text() or ""
+        except Exception as e:
+            logger.warning(f"pdfplumber failed on page {page_num + 1}: {e}")
+    
+    return ""
+
+def _extract_pages_parallel(file_bytes: bytes, page_count: int, workers: int) -> list:
+    """
+    Split the page range into one contiguous slice per worker, extract the
+    slices in a process pool and reassemble the pages in order.
+    """
+    step = -(-page_count // workers)  # ceil division
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    
+    # Workers need picklable bytes, e.g. rather than a memory-mapped download
+    file_bytes = bytes(file_bytes)
+    page_texts = []
+    with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+        futures = [pool.submit(_extract_page_range, file_bytes, start, stop) for start, stop in ranges]
+        # Futures are consumed in submission order, so pages stay in order
+        for future in futures:
+            page_texts.extend(future.result())
+    
+    return page_texts
+
+def extract_text_from_pdf_with_ocr(
+    file_bytes: bytes,
+    hybrid: bool = True,
+    dpi: int = None,
+    workers: int = None
+) -> str:
     """
     Extract text from PDF using OCR (for scanned/image PDFs).
     This is a fallback method when regular text extraction fails.
+    
+    Args:
+        file_bytes: The PDF content as bytes
+        hybrid: Only OCR pages without a usable text layer and keep the
+            embedded text for the rest. Set to False to OCR every page.
+        dpi: Rasterization resolution, defaults to OCR_DPI
+        workers: Number of tesseract worker processes, defaults to
+            OCR_WORKERS (or the CPU count when unset)
     """
-    if not OCR_AVAILABLE:
+    if not _get_ocr():
         raise ValueError("OCR libraries not available. Install with: pip install pytesseract pillow")
     
-    if not PYMUPDF_AVAILABLE:
+    fitz = _get_fitz()
+    if not fitz:
         raise ValueError("PyMuPDF required for OCR extraction")
     
+    dpi = dpi or OCR_DPI
+    if workers is None:
+        workers = OCR_WORKERS or os.cpu_count() or 1
+    
     try:
         logger.info("Attempting OCR extraction...")
         doc = fitz.open(stream=file_bytes, filetype="pdf")
-        text = ""
+        page_count = doc.page_count
+        page_texts = [""] * page_count
+        ocr_pages = []
         
-        for page_num in range(doc.page_count):
-            page = doc[page_num]
-            # Convert page to image
-            pix = page.get_pixmap()
-            img_data = pix.tobytes("png")
-            
-            # OCR the image
-            image = Image.open(BytesIO(img_data))
-            page_text = pytesseract.image_to_string(image)
-            
-            if page_text.strip():
-                text += page_text + "\n"
-                logger.debug(f"OCR Page {page_num + 1}: {len(page_text)} characters")
+        # Reading the text layer is cheap compared to rasterizing + OCR
+        for page_num in range(page_count):
+            page_text = doc[page_num].get_text() if hybrid else ""
+            if len(page_text.strip()) >= OCR_MIN_TEXT_CHARS:
+                page_texts[page_num] = page_text
+            else:
+                ocr_pages.append(page_num)
         
         doc.close()
+        logger.info(f"OCR needed for {len(ocr_pages)}/{page_count} pages at {dpi} DPI")
         
-        if text.strip():
+        workers = min(workers, len(ocr_pages))
+        if workers > 1:
+            # Interleave pages so scanned runs are spread across workers
+            batches = [ocr_pages[i::workers] for i in range(workers)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_ocr_pages, file_bytes, batch, dpi) for batch in batches]
+                for future in futures:
+                    for page_num, page_text in future.result():
+                        page_texts[page_num] = page_text
+        elif ocr_pages:
+            for page_num, page_text in _ocr_pages(file_bytes, ocr_pages, dpi):
+                page_texts[page_num] = page_text
+        
+        text = _join_page_texts(page_texts)
+        
+        if text:
             logger.info(f"✅ OCR extracted {len(text)} characters")
-            return text.strip()
+            return text
         else:
             raise ValueError("OCR could not extract any text")
             
@@ -235,55 +539,38 @@ def extract_text_from_pdf_with_ocr(file_bytes: bytes) -> str:
         logger.error(f"OCR extraction failed: {e}")
         raise ValueError(f"OCR extraction failed: {e}")
 
+def _ocr_pages(file_bytes: bytes, page_nums: list, dpi: int) -> list:
+    """
+    Rasterize and OCR the given pages, returning (page_num, text) pairs.
+    
+    Pages are rendered straight to grayscale and downscaled to at most
+    OCR_MAX_DIMENSION pixels on the long side before tesseract sees them.
+    Runs inside pool workers, so it must stay a module-level function.
+    """
+    fitz = _get_fitz()
+    pytesseract, Image = _get_ocr()
+    doc = fitz.open(stream=file_bytes, filetype="pdf")
+    results = []
+    try:
+        for page_num in page_nums:
+            pix = doc[page_num].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+            image = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+            if max(image.size) > OCR_MAX_DIMENSION:
+                image.thumbnail((OCR_MAX_DIMENSION, OCR_MAX_DIMENSION))
+            
+            page_text = pytesseract.image_to_string(image)
+            if page_text.strip():
+                logger.debug(f"OCR Page {page_num + 1}: {len(page_text)} characters")
+            results.append((page_num, page_text))
+    finally:
+        doc.close()
+    
+    return results
+
 def extract_text_from_docx(file_bytes: bytes) -> str:
     """Enhanced DOCX text extraction that handles tables, headers, footers."""
     try:
-        doc = docx.Document(BytesIO(file_bytes))
-        full_text = []
-        
-        # Method 1: Extract from paragraphs and tables in document order
-        def iter_block_items(parent):
-            if isinstance(parent, Document):
-                parent_elm = parent.element.body
-            elif isinstance(parent, _Cell):
-                parent_elm = parent._tc
-            else:
-                raise ValueError("something's not right")
-
-            for child in parent_elm.iterchildren():
-                if isinstance(child, CT_P):
-                    yield Paragraph(child, parent)
-                elif isinstance(child, CT_Tbl):
-                    yield Table(child, parent)
-
-        # Extract text in document order
-        for block in iter_block_items(doc):
-            if isinstance(block, Paragraph):
-                para_text = block.text.strip()
-                if para_text:
-                    full_text.append(para_text)
-            elif isinstance(block, Table):
-                table_text = extract_table_text(block)
-                if table_text:
-                    full_text.append(table_text)
-        
-        # Extract from headers and footers
-        for section in doc.sections:
-            # Headers
-            header = section.header
-            if header:
-                for para in header.paragraphs:
-                    if para.text.strip():
-                        full_text.append(f"[HEADER] {para.text.strip()}")
-            
-            # Footers
-            footer = section.footer
-            if footer:
-                for para in footer.paragraphs:
-                    if para.text.strip():
-                        full_text.append(f"[FOOTER] {para.text.strip()}")
-        
-        result = '\n\n'.join(full_text)
+        result = '\n\n'.join(_iter_docx_sections(file_bytes))
         
         if not result.strip():
             raise ValueError("No text could be extracted from the DOCX file")
@@ -293,6 +580,207 @@ def extract_text_from_docx(file_bytes: bytes) -> str:
     except Exception as e:
         raise ValueError(f"Error extracting text from DOCX: {str(e)}")
 
+def _iter_docx_sections(file_bytes: bytes):
+    """
+    Yield non-empty paragraph/table texts in document order, then headers and footers.
+    
+    If the fast parser fails, python-docx takes over; both produce the same
+    blocks, so the sections already yielded are skipped.
+    """
+    if not DOCX_FAST_PATH:
+        yield from _iter_docx_sections_python_docx(file_bytes)
+        return
+    
+    yielded = 0
+    try:
+        for section in _iter_docx_sections_fast(file_bytes):
+            yield section
+            yielded += 1
+    except Exception as e:
+        logger.warning(f"Fast DOCX parser failed ({e}), falling back to python-docx")
+        yield from islice(_iter_docx_sections_python_docx(file_bytes), yielded, None)
+
+# WordprocessingML names used by the fast DOCX parser
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_RUN_TEXT = {_W + "tab": "\t", _W + "ptab": "\t", _W + "cr": "\n", _W + "noBreakHyphen": "-"}
+
+def _iter_docx_sections_fast(file_bytes: bytes):
+    """
+    Stream-parse word/document.xml straight from the zip with iterparse.
+    
+    Produces the same blocks as the python-docx path without building its
+    object model: each top-level paragraph/table is turned into text when
+    its end tag is seen and then dropped from the tree, so memory stays
+    bounded by the largest single block. Table cells are read once per
+    <w:tc>, so horizontally and vertically merged cells are no longer
+    repeated. Headers and footers are read from their own parts afterwards.
+    """
+    import posixpath
+    import zipfile
+    from xml.etree.ElementTree import fromstring, iterparse
+    
+    with zipfile.ZipFile(BytesIO(file_bytes)) as archive:
+        section_refs = []
+        stack = []
+        with archive.open("word/document.xml") as document_xml:
+            for event, elem in iterparse(document_xml, events=("start", "end")):
+                if event == "start":
+                    stack.append(elem)
+                    continue
+                
+                stack.pop()
+                # Only handle direct children of <w:body> (stack: document, body)
+                if len(stack) != 2 or stack[1].tag != _W + "body":
+                    continue
+                
+                if elem.tag == _W + "p":
+                    para_text = _docx_paragraph_text(elem).strip()
+                    if para_text:
+                        yield para_text
+                    sect_pr = elem.find(f"{_W}pPr/{_W}sectPr")
+                    if sect_pr is not None:
+                        section_refs.append(_docx_section_refs(sect_pr))
+                elif elem.tag == _W + "tbl":
+                    table_text = _docx_table_text(elem)
+                    if table_text:
+                        yield table_text
+                elif elem.tag == _W + "sectPr":
+                    section_refs.append(_docx_section_refs(elem))
+                
+                stack[1].remove(elem)
+        
+        # Extract from headers and footers
+        rels = {}
+        try:
+            rels_root = fromstring(archive.read("word/_rels/document.xml.rels"))
+            for rel in rels_root.iter(_REL + "Relationship"):
+                target = rel.get("Target", "")
+                if target.startswith("/"):
+                    target = target[1:]
+                else:
+                    target = posixpath.normpath(posixpath.join("word", target))
+                rels[rel.get("Id")] = target
+        except KeyError:
+            pass
+        
+        # Sections without their own header/footer inherit the previous one
+        header_id = footer_id = None
+        for refs in section_refs:
+            header_id = refs.get("header") or header_id
+            footer_id = refs.get("footer") or footer_id
+            for label, rel_id in (("HEADER", header_id), ("FOOTER", footer_id)):
+                part = rels.get(rel_id)
+                if not part:
+                    continue
+                try:
+                    part_root = fromstring(archive.read(part))
+                except KeyError:
+                    continue  # Dangling relationship
+                for para in part_root.iterfind(_W + "p"):
+                    para_text = _docx_paragraph_text(para).strip()
+                    if para_text:
+                        yield f"[{label}] {para_text}"
+
+def _docx_section_refs(sect_pr) -> dict:
+    """Map 'header'/'footer' to the relationship id of a section's default part."""
+    refs = {}
+    for kind in ("header", "footer"):
+        for ref in sect_pr.iterfind(f"{_W}{kind}Reference"):
+            if ref.get(_W + "type", "default") == "default":
+                refs[kind] = ref.get(_R + "id")
+    return refs
+
+def _docx_paragraph_text(paragraph) -> str:
+    """Text of a <w:p>, using the same run/hyperlink rules as python-docx."""
+    parts = []
+    for child in paragraph:
+        if child.tag == _W + "r":
+            runs = (child,)
+        elif child.tag == _W + "hyperlink":
+            runs = child.iterfind(_W + "r")
+        else:
+            continue
+        
+        for run in runs:
+            for item in run:
+                if item.tag == _W + "t":
+                    parts.append(item.text or "")
+                elif item.tag == _W + "br":
+                    # Only line breaks produce text; page/column breaks do not
+                    if item.get(_W + "type", "textWrapping") == "textWrapping":
+                        parts.append("\n")
+                elif item.tag in _RUN_TEXT:
+                    parts.append(_RUN_TEXT[item.tag])
+    return "".join(parts)
+
+def _docx_table_text(table) -> str:
+    """Text of a <w:tbl>: non-empty cells joined with ' | ', one line per row."""
+    table_data = []
+    for row in table.iterfind(_W + "tr"):
+        row_data = []
+        for cell in row.iterfind(_W + "tc"):
+            cell_text = "\n".join(_docx_paragraph_text(p) for p in cell.iterfind(_W + "p")).strip()
+            if cell_text:
+                row_data.append(cell_text)
+        if row_data:
+            table_data.append(' | '.join(row_data))
+    return '\n'.join(table_data)
+
+def _iter_docx_sections_python_docx(file_bytes: bytes):
+    """python-docx implementation of _iter_docx_sections."""
+    import docx
+    from docx.document import Document
+    from docx.oxml.table import CT_Tbl
+    from docx.oxml.text.paragraph import CT_P
+    from docx.table import _Cell, Table
+    from docx.text.paragraph import Paragraph
+    
+    doc = docx.Document(BytesIO(file_bytes))
+    
+    # Method 1: Extract from paragraphs and tables in document order
+    def iter_block_items(parent):
+        if isinstance(parent, Document):
+            parent_elm = parent.element.body
+        elif isinstance(parent, _Cell):
+            parent_elm = parent._tc
+        else:
+            raise ValueError("something's not right")
+
+        for child in parent_elm.iterchildren():
+            if isinstance(child, CT_P):
+                yield Paragraph(child, parent)
+            elif isinstance(child, CT_Tbl):
+                yield Table(child, parent)
+
+    # Extract text in document order
+    for block in iter_block_items(doc):
+        if isinstance(block, Paragraph):
+            para_text = block.text.strip()
+            if para_text:
+                yield para_text
+        elif isinstance(block, Table):
+            table_text = extract_table_text(block)
+            if table_text:
+                yield table_text
+    
+    # Extract from headers and footers
+    for section in doc.sections:
+        # Headers
+        header = section.header
+        if header:
+            for para in header.paragraphs:
+                if para.text.strip():
+                    yield f"[HEADER] {para.text.strip()}"
+        
+        # Footers
+        footer = section.footer
+        if footer:
+            for para in footer.paragraphs:
+                if para.text.strip():
+                    yield f"[FOOTER] {para.text.strip()}"
+
 def extract_table_text(table) -> str:
     """Extract text from a DOCX table."""
     table_data = []
@@ -316,60 +804,7 @@ def extract_table_text(table) -> str:
 def extract_text_from_email(file_bytes: bytes) -> str:
     """Extract text from email files (.eml, .msg)."""
     try:
-        encoding_info = chardet.detect(file_bytes)
-        encoding = encoding_info.get("encoding", "utf-8")
-        
-        msg = email.message_from_bytes(file_bytes)
-        body_parts = []
-        
-        # Extract subject
-        subject = msg.get("Subject", "")
-        if subject:
-            body_parts.append(f"Subject: {subject}")
-        
-        # Extract sender and recipient info
-        sender = msg.get("From", "")
-        if sender:
-            body_parts.append(f"From: {sender}")
-        
-        recipient = msg.get("To", "")
-        if recipient:
-            body_parts.append(f"To: {recipient}")
-        
-        body_parts.append("")  # Empty line separator
-        
-        # Extract body
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                if content_type == "text/plain":
-                    payload = part.get_payload(decode=True)
-                    if payload:
-                        text = payload.decode(encoding, errors="ignore").strip()
-                        if text:
-                            body_parts.append(text)
-                elif content_type == "text/html":
-                    payload = part.get_payload(decode=True)
-                    if payload:
-                        html = payload.decode(encoding, errors="ignore")
-                        soup = BeautifulSoup(html, "html.parser")
-                        text = soup.get_text(separator="\n").strip()
-                        if text:
-                            body_parts.append(text)
-        else:
-            payload = msg.get_payload(decode=True)
-            if payload:
-                content_type = msg.get_content_type()
-                if content_type == "text/html":
-                    soup = BeautifulSoup(payload.decode(encoding, errors="ignore"), "html.parser")
-                    text = soup.get_text(separator="\n").strip()
-                else:
-                    text = payload.decode(encoding, errors="ignore").strip()
-                
-                if text:
-                    body_parts.append(text)
-        
-        result = '\n'.join(body_parts)
+        result = '\n'.join(_iter_email_sections(file_bytes))
         if not result.strip():
             raise ValueError("No content could be extracted from email")
         
@@ -378,10 +813,173 @@ def extract_text_from_email(file_bytes: bytes) -> str:
     except Exception as e:
         raise ValueError(f"Error extracting text from email: {str(e)}")
 
+def _iter_email_sections(file_bytes: bytes, depth: int = 0):
+    """
+    Yield the header block, an empty separator, each text/html body part,
+    then one '[ATTACHMENT: name]'-tagged section per extracted attachment.
+    
+    Attachments are extracted concurrently in a thread pool while the body
+    is being decoded. Attached emails are recursed into up to
+    EMAIL_MAX_DEPTH levels, and attachments beyond EMAIL_ATTACHMENT_BUDGET_MB
+    (counted per message) are skipped.
+    """
+    msg = email.message_from_bytes(file_bytes)
+    header_lines = []
+    
+    # Extract subject
+    subject = msg.get("Subject", "")
+    if subject:
+        header_lines.append(f"Subject: {subject}")
+    
+    # Extract sender and recipient info
+    sender = msg.get("From", "")
+    if sender:
+        header_lines.append(f"From: {sender}")
+    
+    recipient = msg.get("To", "")
+    if recipient:
+        header_lines.append(f"To: {recipient}")
+    
+    if header_lines:
+        yield '\n'.join(header_lines)
+    yield ""  # Empty line separator
+    
+    bodies = []
+    attachments = []
+    if msg.is_multipart():
+        _collect_email_parts(msg, bodies, attachments)
+    else:
+        bodies.append(msg)
+    
+    attachments = _within_attachment_budget(attachments)
+    if depth >= EMAIL_MAX_DEPTH:
+        if attachments:
+            logger.warning(f"Email nesting depth {depth} reached, skipping {len(attachments)} attachments")
+        attachments = []
+    
+    pool = ThreadPoolExecutor(max_workers=EMAIL_ATTACHMENT_WORKERS) if attachments else None
+    try:
+        futures = [
+            (name, pool.submit(_extract_attachment_text, payload, file_format, depth))
+            for name, payload, file_format in attachments
+        ]
+        
+        # Extract body
+        for part in bodies:
+            text = _email_part_text(part)
+            if text:
+                yield text
+        
+        for name, future in futures:
+            try:
+                text = future.result()
+            except Exception as e:
+                logger.warning(f"Skipping attachment {name}: {e}")
+                continue
+            if text and text.strip():
+                yield f"[ATTACHMENT: {name}]\n{text.strip()}"
+    finally:
+        if pool:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+def _collect_email_parts(part, bodies: list, attachments: list):
+    """
+    Split a MIME tree into inline text/html body parts and (filename, bytes,
+    format) attachments. Attachments without a supported format (see
+    _attachment_format) and inline images referenced by Content-ID, such
+    as signature logos, are skipped.
+    """
+    content_type = part.get_content_type()
+    filename = part.get_filename()
+    
+    if content_type == "message/rfc822":
+        # Attached email: keep it whole so it is extracted (and tagged) recursively
+        inner = part.get_payload()
+        inner = inner[0] if isinstance(inner, list) else inner
+        name = filename or f"{inner.get('Subject', 'message')}.eml"
+        attachments.append((name, inner.as_bytes(), "email"))
+    elif part.is_multipart():
+        for sub_part in part.get_payload():
+            _collect_email_parts(sub_part, bodies, attachments)
+    elif part.get_content_disposition() == "attachment" or (filename and content_type not in ("text/plain", "text/html")):
+        name = filename or "attachment"
+        if content_type.startswith("image/") and part.get("Content-ID") and part.get_content_disposition() != "attachment":
+            logger.info(f"Skipping inline image {name}")
+            return
+        payload = part.get_payload(decode=True)
+        if not payload:
+            return
+        file_format = _attachment_format(payload, content_type)
+        if file_format is None:
+            logger.info(f"Skipping attachment {name}: unsupported type {content_type}")
+            return
+        attachments.append((name, payload, file_format))
+    elif content_type in ("text/plain", "text/html"):
+        bodies.append(part)
+
+def _attachment_format(payload: bytes, content_type: str):
+    """
+    Extractor for an attachment, judged by its bytes rather than its name:
+    'email', 'pdf', 'docx' or 'image', 'text' for text/* parts, or None for
+    anything else (archives, spreadsheets, signatures, OLE .msg files,
+    application/octet-stream blobs) so it is not decoded as text.
+    """
+    file_format = detect_format(payload)
+    if file_format != "text":
+        return file_format
+    return "text" if content_type.startswith("text/") else None
+
+def _within_attachment_budget(attachments: list) -> list:
+    """Keep attachments in order until EMAIL_ATTACHMENT_BUDGET_MB is used up."""
+    budget = EMAIL_ATTACHMENT_BUDGET_MB * 1024 * 1024
+    kept = []
+    for name, payload, file_format in attachments:
+        if len(payload) > budget:
+            logger.warning(f"Skipping attachment {name}: {len(payload)} bytes exceeds remaining budget")
+            continue
+        budget -= len(payload)
+        kept.append((name, payload, file_format))
+    return kept
+
+def _email_part_text(part) -> str:
+    """Decode a body part with its declared charset and strip HTML if needed."""
+    payload = part.get_payload(decode=True)
+    if not payload:
+        return ""
+    
+    encoding = part.get_content_charset() or detect_encoding(payload)
+    try:
+        text = payload.decode(encoding, errors="ignore")
+    except LookupError:
+        # Unknown charset label in the MIME header
+        text = payload.decode(detect_encoding(payload), errors="ignore")
+    
+    if part.get_content_type() == "text/html":
+        from bs4 import BeautifulSoup
+        
+        text = BeautifulSoup(text, "html.parser").get_text(separator="\n")
+    
+    return text.strip()
+
+def _extract_attachment_text(payload: bytes, file_format: str, depth: int) -> str:
+    """Extract one email attachment with the extractor for its _attachment_format."""
+    if file_format == "email":
+        return '\n'.join(_iter_email_sections(payload, depth + 1))
+    if file_format == "pdf":
+        # Attachments already run in parallel; keep PDF extraction in this thread
+        return extract_text_from_pdf(payload, workers=1)
+    if file_format == "docx":
+        return extract_text_from_docx(payload)
+    if file_format == "image":
+        return extract_text_from_image(payload)
+    return payload.decode(detect_encoding(payload), errors="ignore")
+
 def extract_text_from_image(file_bytes: bytes) -> str:
     """Extract text from image using OCR."""
-    if not OCR_AVAILABLE:
+    ocr = _get_ocr()
+    if not ocr:
         raise ValueError("OCR libraries (pytesseract, PIL) not available. Please install them.")
+    pytesseract, Image = ocr
     
     try:
         image = Image.open(BytesIO(file_bytes))
@@ -400,40 +998,13 @@ def extract_text_from_image(file_bytes: bytes) -> str:
 def extract_text_from_url(url: str) -> str:
     """Extract text from web URL."""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        # Handle blob URLs or special URLs
-        if 'blob.core.windows.net' in url or 'extension://' in url:
-            # Extract the actual PDF URL
-            if '?file=' in url:
-                import urllib.parse
-                actual_url = urllib.parse.unquote(url.split('?file=')[1])
-                if actual_url.startswith('https://'):
-                    url = actual_url
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        # Check if it's a PDF
-        content_type = response.headers.get('content-type', '').lower()
-        if 'pdf' in content_type:
-            return extract_text_from_pdf(response.content)
-        
-        # Otherwise treat as HTML
-        soup = BeautifulSoup(response.content, "html.parser")
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        text = soup.get_text(separator="\n")
-        
-        # Clean up whitespace
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
+        with _open_url(url) as result:
+            # Check if it's a PDF
+            if 'pdf' in result.content_type.lower():
+                return extract_text_from_pdf(result.buffer())
+            
+            # Otherwise treat as HTML
+            text = _html_to_text(result.body)
         
         if not text.strip():
             raise ValueError("No content could be extracted from URL")
@@ -443,15 +1014,64 @@ def extract_text_from_url(url: str) -> str:
     except Exception as e:
         raise ValueError(f"Error extracting text from URL: {e}")
 
+@contextmanager
+def _open_url(url: str):
+    """
+    Resolve viewer/blob wrapper URLs and download the document.
+    
+    Yields the http_fetcher.FetchResult, closed on exit. Extractors read
+    its body file or its buffer() (memory-mapped once the download spilled
+    to disk), so a large document is never copied into memory whole.
+    """
+    # Handle blob URLs or special URLs
+    if 'blob.core.windows.net' in url or 'extension://' in url:
+        # Extract the actual PDF URL
+        if '?file=' in url:
+            import urllib.parse
+            actual_url = urllib.parse.unquote(url.split('?file=')[1])
+            if actual_url.startswith('https://'):
+                url = actual_url
+    
+    from src.utils.http_fetcher import fetch
+    
+    with fetch(url) as result:
+        yield result
+
+def _html_to_text(html) -> str:
+    """Strip scripts/styles from an HTML page and collapse whitespace."""
+    from bs4 import BeautifulSoup
+    
+    soup = BeautifulSoup(html, "html.parser")
+    
+    # Remove script and style elements
+    for script in soup(["script", "style"]):
+        script.decompose()
+    
+    text = soup.get_text(separator="\n")
+    
+    # Clean up whitespace
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+def _iter_url_sections(url: str):
+    """Yield (page, text) for a URL: one per PDF page, or the whole HTML page."""
+    with _open_url(url) as result:
+        if 'pdf' in result.content_type.lower():
+            yield from _iter_pdf_pages(result.buffer())
+        else:
+            yield None, _html_to_text(result.body)
+
 def check_dependencies():
     """Check which dependencies are available."""
+    fitz, PyPDF2, pdfplumber, ocr = _get_fitz(), _get_pypdf2(), _get_pdfplumber(), _get_ocr()
     print("Checking dependencies:")
-    print(f"PyMuPDF (fitz): {'✓' if PYMUPDF_AVAILABLE else '✗'}")
-    print(f"PyPDF2: {'✓' if PYPDF2_AVAILABLE else '✗'}")
-    print(f"pdfplumber: {'✓' if PDFPLUMBER_AVAILABLE else '✗'}")
-    print(f"OCR (pytesseract + PIL): {'✓' if OCR_AVAILABLE else '✗'}")
+    print(f"PyMuPDF (fitz): {'✓' if fitz else '✗'}")
+    print(f"PyPDF2: {'✓' if PyPDF2 else '✗'}")
+    print(f"pdfplumber: {'✓' if pdfplumber else '✗'}")
+    print(f"OCR (pytesseract + PIL): {'✓' if ocr else '✗'}")
     
-    if not any([PYMUPDF_AVAILABLE, PYPDF2_AVAILABLE, PDFPLUMBER_AVAILABLE]):
+    if not any([fitz, PyPDF2, pdfplumber]):
         print("\n❌ No PDF processing library found. Install one of:")
         print("pip install PyMuPDF  # Recommended")
         print("pip install PyPDF2")
@@ -1,60 +1,43 @@
 import os
-from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
-from tqdm import tqdm
-
-# Load environment variables
-load_dotenv()
-pinecone_api_key = os.environ.get("PINECONE_API_KEY")
-pinecone_env = os.environ.get("PINECONE_ENV")
-
-if not pinecone_api_key or not pinecone_env:
-    raise ValueError("PINECONE_API_KEY or PINECONE_ENV not set in .env")
-
-# Pinecone setup
-pc = Pinecone(api_key=pinecone_api_key)
-index_name = "hackrx"
-
-# Check if index exists and get its dimensions
-existing_indexes = pc.list_indexes().names()
-if index_name not in existing_indexes:
-    print(f"Creating new index '{index_name}' with 384 dimensions...")
-    pc.create_index(
-        name=index_name,
-        dimension=384,  # Fixed: Changed from 1024 to 384 for all-MiniLM-L6-v2
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")
-    )
-    print("✅ Index created successfully!")
-else:
-    # Check existing index dimensions
-    index_info = pc.describe_index(index_name)
-    existing_dimension = index_info.dimension
-    print(f"📊 Existing index '{index_name}' has {existing_dimension} dimensions")
-    
-    if existing_dimension != 384:
-        print(f"⚠️  DIMENSION MISMATCH!")
-        print(f"   Index dimension: {existing_dimension}")
-        print(f"   Model dimension: 384 (all-MiniLM-L6-v2)")
-        print(f"   You need to either:")
-        print(f"   1. Delete the existing index and recreate with 384 dimensions")
-        print(f"   2. Use a different embedding model that produces {existing_dimension} dimensions")
-        raise ValueError(f"Dimension mismatch: index={existing_dimension}, model=384")
-
-index = pc.Index(index_name)
-
-# Embedding model - produces 384-dimensional embeddings
-model = SentenceTransformer("all-MiniLM-L6-v2")
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from src.pipeline.resources import get_client, get_encoding_pool, get_index, get_model, get_vector_store, embedding_model_key, reset, EMBEDDING_DIMENSION, INDEX_NAME
+from src.pipeline.chunk_store import chunk_store, CHUNK_STORE_ENABLED
+from src.pipeline.embedding_cache import embedding_cache, EMBEDDING_CACHE_ENABLED
+from src.pipeline.query_cache import query_cache
+from src.pipeline.encoding_scheduler import EncodingScheduler, ENCODE_BUCKETING, ENCODE_PROCESSES
+from src.pipeline.vector_store import VECTOR_STORE
+
+# The model and index are created on first use by src.pipeline.resources and
+# shared with the retriever; these names are kept for existing callers
+index_name = INDEX_NAME
+_SHARED_RESOURCES = {"pc": get_client, "index": get_index, "model": get_model}
+
+# Chunks encoded per model call (a multiple of the upsert size), and vectors per upsert request
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "300"))
+UPSERT_BATCH_SIZE = 100
+UPSERT_WORKERS = int(os.environ.get("UPSERT_WORKERS", "4"))
+# Upsert batches allowed in flight before encoding waits
+UPSERT_MAX_PENDING = int(os.environ.get("UPSERT_MAX_PENDING", str(UPSERT_WORKERS * 2)))
+UPSERT_RETRIES = int(os.environ.get("UPSERT_RETRIES", "4"))
+UPSERT_BACKOFF_SECONDS = 0.5
+
+def __getattr__(name):
+    if name in _SHARED_RESOURCES:
+        return _SHARED_RESOURCES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_model_dimension():
-    """Get the actual dimension of the embedding model"""
-    test_embedding = model.encode(["test"])
-    return test_embedding.shape[1]
+    """Get the actual dimension of the embedding model (checked once when it is loaded)"""
+    return get_model().get_sentence_embedding_dimension()
 
-def embed_and_store(docs: list[dict]):
+def embed_and_store(docs, skip_existing: bool = False) -> dict:
     """
-    docs: List of dicts with keys: 'id', 'text', 'metadata'
+    docs: List (or any iterable, e.g. a ChunkTable) of dicts with keys: 'id', 'text', 'metadata'
     Example:
         [
             {
@@ -64,65 +47,284 @@ def embed_and_store(docs: list[dict]):
             },
             ...
         ]
+
+    skip_existing: only embed docs whose id is not already in the index.
+        Meant for content-hash IDs (see content_defined_chunk_text), where an
+        existing id means the same text has already been embedded. Ids are
+        looked up UPSERT_BATCH_SIZE at a time as docs are consumed.
+
+    Returns the embed_and_store_stream stage counters (None if nothing was embedded).
     """
-    if not docs:
+    if isinstance(docs, list) and not docs:
         print("⚠️ No documents to embed.")
         return
 
-    print(f"🔢 Embedding {len(docs)} chunks...")
-    
-    # Verify model dimension
-    model_dim = get_model_dimension()
-    print(f"📏 Model produces {model_dim}-dimensional embeddings")
-    
-    texts = [doc["text"] for doc in docs]
-    ids = [doc["id"] for doc in docs]
-    metadata = [doc["metadata"] for doc in docs]
-
-    # Get embeddings
-    embeddings = model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
-    print(f"✅ Generated embeddings with shape: {embeddings.shape}")
-
-    # Prepare data for upsert
-    to_upsert = [
-        {
-            "id": ids[i],
-            "values": embeddings[i].tolist(),
-            "metadata": {**metadata[i], "text": texts[i]}  # Store text in metadata for retrieval
-        }
-        for i in range(len(docs))
-    ]
+    counts = {"existing": 0}
+    if skip_existing:
+        docs = _skip_existing(docs, counts)
+
+    print("🔢 Embedding chunks...")
+    stats = embed_and_store_stream(docs)
+    if skip_existing:
+        print(f"♻️  {counts['existing']} chunks unchanged, {stats['chunks']} embedded")
+    if not stats["chunks"]:
+        return
+    print("✅ Embeddings stored successfully!")
+    return stats
+
+def _skip_existing(docs, counts: dict):
+    """Yield the docs whose id is not stored yet, counting the others in counts["existing"]."""
+    for batch in _batched(docs, UPSERT_BATCH_SIZE):
+        if CHUNK_STORE_ENABLED:
+            chunk_store.put_many(batch)  # Unchanged chunks keep their text even if this store is new
+        existing = get_existing_ids([doc["id"] for doc in batch])
+        counts["existing"] += len(existing)
+        for doc in batch:
+            if doc["id"] not in existing:
+                yield doc
+
+def embed_and_store_stream(docs, index=None, model=None, use_cache: bool = EMBEDDING_CACHE_ENABLED, bucketed: bool = ENCODE_BUCKETING, texts=None) -> dict:
+    """
+    Pipelined embedding: encode batch N+1 while batch N is being upserted.
+
+    docs may be any iterable (e.g. stream_smart_chunks output or a
+    ChunkTable, whose dicts are then built one batch at a time). Chunks are
+    encoded EMBED_BATCH_SIZE at a time on the calling thread and upserted in
+    batches of UPSERT_BATCH_SIZE by a pool of UPSERT_WORKERS threads. At most
+    UPSERT_MAX_PENDING batches are in flight; beyond that encoding waits, so
+    memory stays bounded. Failed upserts are retried with exponential
+    backoff before the error is raised.
+
+    index and model default to the shared vector store (see
+    resources.get_vector_store) and SentenceTransformer; anything with
+    upsert(vectors=[...]) and encode(texts, convert_to_numpy=True) methods
+    works. The index's flush(), if it has one, is called once everything is
+    upserted. use_cache=False bypasses the embedding cache.
+
+    bucketed=True encodes each group through an EncodingScheduler (length
+    sorted, token-budgeted batches), spread over the shared pool of
+    ENCODE_PROCESSES workers when that is above 1 and the default model is
+    used. Raising EMBED_BATCH_SIZE gives the scheduler more texts to sort.
+
+    texts is where chunk texts go: a ChunkStore (written before the vectors
+    are upserted, so a match always has its text) or None to put the text
+    in the vector metadata. It defaults to the shared chunk_store with the
+    shared vector store (unless CHUNK_STORE_ENABLED is off) and to None
+    with any other index.
+
+    Returns per-stage counters: chunks, batches, retries, cached (embeddings
+    served from the cache), encode_seconds, upsert_seconds (summed over
+    workers) and wall_seconds.
+    """
+    if index is None:
+        index = get_vector_store()
+        if texts is None and CHUNK_STORE_ENABLED:
+            texts = chunk_store
+    encoding_pool = None
+    if model is None:
+        model = get_model()
+        if bucketed and ENCODE_PROCESSES > 1:
+            encoding_pool = get_encoding_pool()
+    if bucketed:
+        model = EncodingScheduler(model, pool=encoding_pool)
+    # Local stores take float32 rows as they are; remote ones need JSON-friendly lists
+    accepts_arrays = getattr(index, "accepts_arrays", False)
+    stats = {"chunks": 0, "batches": 0, "retries": 0, "cached": 0,
+             "encode_seconds": 0.0, "upsert_seconds": 0.0, "wall_seconds": 0.0}
+    lock = threading.Lock()
+    pending = deque()
+    scopes = set()
+    start = time.perf_counter()
 
-    # Upsert to Pinecone in batches
-    print("📤 Uploading to Pinecone...")
-    batch_size = 100
-    for i in range(0, len(to_upsert), batch_size):
-        batch = to_upsert[i:i + batch_size]
+    with ThreadPoolExecutor(max_workers=UPSERT_WORKERS, thread_name_prefix="upsert") as pool:
         try:
-            index.upsert(vectors=batch)
-            print(f"✅ Uploaded batch {i//batch_size + 1}/{(len(to_upsert)-1)//batch_size + 1}")
-        except Exception as e:
-            print(f"❌ Error uploading batch: {e}")
+            for group in _batched(docs, EMBED_BATCH_SIZE):
+                scopes.update((doc["metadata"].get("source"), doc["metadata"].get("doc_id")) for doc in group)
+                encode_start = time.perf_counter()
+                embeddings = _encode_texts(model, [doc["text"] for doc in group], stats, use_cache)
+                stats["encode_seconds"] += time.perf_counter() - encode_start
+                if texts is not None:
+                    texts.put_many(group)
+
+                for i in range(0, len(group), UPSERT_BATCH_SIZE):
+                    vectors = [
+                        {
+                            "id": doc["id"],
+                            "values": embeddings[i + j] if accepts_arrays else embeddings[i + j].tolist(),
+                            "metadata": doc["metadata"] if texts is not None else {**doc["metadata"], "text": doc["text"]}
+                        }
+                        for j, doc in enumerate(group[i:i + UPSERT_BATCH_SIZE])
+                    ]
+                    # Backpressure: wait for the oldest upsert before queueing more
+                    while len(pending) >= UPSERT_MAX_PENDING:
+                        pending.popleft().result()
+                    pending.append(pool.submit(_upsert_with_retry, index, vectors, stats, lock))
+                stats["chunks"] += len(group)
+
+            while pending:
+                pending.popleft().result()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            _invalidate_queries(scopes)  # Some batches may already be stored
             raise
-    
-    print("✅ Embeddings stored successfully!")
+
+    flush = getattr(index, "flush", None)
+    if flush is not None:
+        flush()
+    _invalidate_queries(scopes)
+    stats["wall_seconds"] = time.perf_counter() - start
+    _print_throughput(stats)
+    return stats
+
+def _invalidate_queries(scopes: set):
+    """Drop cached retrieval results that may include these (source, doc_id) scopes."""
+    if (None, None) in scopes:
+        query_cache.invalidate()
+        return
+    for source, doc_id in scopes:
+        query_cache.invalidate(source, doc_id=doc_id)
+
+def _batched(items, size: int):
+    """Yield lists of up to size items from any iterable."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _encode_texts(model, texts: list, stats: dict, use_cache: bool):
+    """Encode texts, only sending those not in the embedding cache to the model."""
+    if not use_cache:
+        return model.encode(texts, convert_to_numpy=True)
+    hits_before = embedding_cache.hits
+    embeddings = embedding_cache.encode(model, embedding_model_key(), texts)
+    stats["cached"] += embedding_cache.hits - hits_before
+    return embeddings
+
+def _upsert_with_retry(index, vectors: list, stats: dict, lock):
+    """Upsert one batch, retrying with exponential backoff and jitter."""
+    for attempt in range(UPSERT_RETRIES + 1):
+        start = time.perf_counter()
+        try:
+            index.upsert(vectors=vectors)
+            break
+        except Exception as e:
+            if attempt == UPSERT_RETRIES:
+                print(f"❌ Error uploading batch: {e}")
+                raise
+            delay = UPSERT_BACKOFF_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"⚠️ Upsert failed ({e}), retry {attempt + 1}/{UPSERT_RETRIES} in {delay:.1f}s")
+            with lock:
+                stats["retries"] += 1
+            time.sleep(delay)
+        finally:
+            with lock:
+                stats["upsert_seconds"] += time.perf_counter() - start
+
+    with lock:
+        stats["batches"] += 1
+
+def _print_throughput(stats: dict):
+    chunks = stats["chunks"]
+    if not chunks:
+        return
+    encode_rate = chunks / stats["encode_seconds"] if stats["encode_seconds"] else float("inf")
+    upsert_rate = chunks / stats["upsert_seconds"] if stats["upsert_seconds"] else float("inf")
+    print(f"📊 {chunks} chunks in {stats['wall_seconds']:.2f}s ({chunks / stats['wall_seconds']:.0f}/s): "
+          f"encode {encode_rate:.0f}/s ({stats['cached']} cached), "
+          f"upsert {upsert_rate:.0f}/s per worker, {stats['batches']} batches, {stats['retries']} retries")
+
+def get_existing_ids(ids: list[str], batch_size: int = 100) -> set:
+    """Return the subset of ids already stored in the vector store."""
+    store = get_vector_store()
+    existing = set()
+    for i in range(0, len(ids), batch_size):
+        existing.update(store.fetch_metadata(ids[i:i + batch_size]))
+    return existing
+
+def attach_duplicates(provenance: dict) -> int:
+    """
+    Write dedup provenance ({kept id: {"occurrences", "duplicates"}}, see
+    ChunkDeduplicator.provenance) into the metadata of the stored vectors.
+
+    Streaming ingestion only learns about a duplicate after the chunk it
+    repeats was upserted, so this runs once the document is embedded.
+    Vectors whose metadata already holds the same provenance are left
+    alone, so re-ingesting a document changes nothing. Returns the number
+    of vectors updated.
+    """
+    if not provenance:
+        return 0
+    store = get_vector_store()
+    stored = store.fetch_metadata(list(provenance))
+    changed = [
+        vector_id for vector_id, metadata in stored.items()
+        if any(metadata.get(field) != value for field, value in provenance[vector_id].items())
+    ]
+    for vector_id in changed:
+        store.update_metadata(vector_id, provenance[vector_id])
+    if changed:
+        store.flush()
+        _invalidate_queries({(stored[vector_id].get("source"), stored[vector_id].get("doc_id")) for vector_id in changed})
+    return len(changed)
+
+def delete_stale_chunks(source_filename: str, keep_ids: list[str]) -> int:
+    """
+    Delete vectors of source_filename whose id is not in keep_ids.
+
+    Used after re-ingesting an edited document with content-hash IDs, so
+    chunks that no longer exist stop showing up in retrieval. Candidates are
+    listed by the "{source_filename}-" id prefix and only deleted if their
+    metadata confirms the source, since another file name may share the
+    prefix. Returns the number of vectors deleted.
+    """
+    store = get_vector_store()
+    keep = set(keep_ids)
+    candidates = [vector_id for vector_id in store.list_ids(prefix=f"{source_filename}-") if vector_id not in keep]
+
+    stale = [
+        vector_id for vector_id, metadata in store.fetch_metadata(candidates).items()
+        if metadata.get("source") == source_filename
+    ]
+    if stale:
+        store.delete(ids=stale)
+        store.flush()
+        if CHUNK_STORE_ENABLED:
+            chunk_store.delete_ids(stale)
+        query_cache.invalidate(source_filename)
+        print(f"🗑️  Deleted {len(stale)} stale chunks of '{source_filename}'")
+    return len(stale)
 
 def delete_and_recreate_index():
     """Delete the existing index and recreate with correct dimensions"""
     try:
+        if VECTOR_STORE == "faiss":
+            store = get_vector_store()
+            store.delete(delete_all=True)
+            store.flush()
+            if CHUNK_STORE_ENABLED:
+                chunk_store.clear()
+            query_cache.invalidate()
+            print("✅ Local FAISS index cleared")
+            return True
+
         print(f"🗑️  Deleting existing index '{index_name}'...")
-        pc.delete_index(index_name)
+        get_client().delete_index(index_name)
+        reset("index")
+        reset("vector_store")
+        if CHUNK_STORE_ENABLED:
+            chunk_store.clear()
+        query_cache.invalidate()
         print("✅ Index deleted")
         
-        print("🏗️  Creating new index with 384 dimensions...")
-        pc.create_index(
-            name=index_name,
-            dimension=384,
-            metric="cosine",
-            spec=ServerlessSpec(cloud="aws", region="us-east-1")
-        )
+        print(f"🏗️  Creating new index with {EMBEDDING_DIMENSION} dimensions...")
+        get_index()  # Creates the index again since it no longer exists
         print("✅ New index created successfully!")
         return True
     except Exception as e:
         print(f"❌ Error recreating index: {e}")
-        return False
\ No newline at end of file
+        return False
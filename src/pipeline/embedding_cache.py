@@ -0,0 +1,165 @@
+import hashlib
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+EMBEDDING_CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "hackrx-embedding-cache.sqlite3")
+)
+EMBEDDING_CACHE_MAX_MB = int(os.environ.get("EMBEDDING_CACHE_MAX_MB", "512"))
+EMBEDDING_CACHE_ENABLED = os.environ.get("EMBEDDING_CACHE_ENABLED", "1") != "0"
+# float16 halves the cache size; vectors come back as float32 either way
+EMBEDDING_CACHE_DTYPE = os.environ.get("EMBEDDING_CACHE_DTYPE", "float32")
+# Check the size bound after this many inserted vectors
+EVICT_EVERY = 1000
+# SQLite limits the number of bound parameters per statement
+LOOKUP_BATCH = 500
+
+def normalize_text(text: str) -> str:
+    """Unicode NFC with whitespace runs collapsed, so trivially different copies share an entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+class EmbeddingCache:
+    """
+    SQLite store of embeddings keyed by (model name, hash of normalized text).
+
+    The database runs in WAL mode with a busy timeout, so several uvicorn
+    workers can read and write the same file concurrently; each thread uses
+    its own connection. Every hit refreshes last_used, and once the stored
+    vectors exceed max_bytes the least recently used ones are deleted.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_MB * 1024 * 1024, dtype: str = EMBEDDING_CACHE_DTYPE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._inserted = 0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    dtype TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{model_name}:{digest}"
+
+    def get_many(self, keys: list) -> dict:
+        """Return {key: float32 vector} for the keys that are cached."""
+        conn = self._connect()
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for start in range(0, len(unique_keys), LOOKUP_BATCH):
+            batch = unique_keys[start:start + LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({placeholders})", batch).fetchall()
+            for key, dtype, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=dtype).astype(np.float32)
+
+        if found:
+            now = time.time()
+            with conn:
+                conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+
+        with self._lock:
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items):
+        """Store (key, vector) pairs, replacing existing entries."""
+        now = time.time()
+        rows = [(key, self.dtype.name, np.asarray(vector, dtype=self.dtype).tobytes(), now) for key, vector in items]
+        if not rows:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO embeddings (key, dtype, vector, last_used) VALUES (?, ?, ?, ?)", rows)
+
+        with self._lock:
+            self._inserted += len(rows)
+            due = self._inserted >= EVICT_EVERY
+            if due:
+                self._inserted = 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used vectors until the cache fits in max_bytes."""
+        conn = self._connect()
+        with conn:
+            total, count = conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0), COUNT(*) FROM embeddings").fetchone()
+            if total <= self.max_bytes or not count:
+                return
+            excess = math.ceil((total - self.max_bytes) / (total / count))
+            conn.execute("DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,))
+        logger.info(f"Evicted {excess} embeddings from {self.path}")
+
+    def encode(self, model, model_name: str, texts: list, **encode_kwargs) -> np.ndarray:
+        """
+        Embed texts, sending only cache misses to model.encode.
+
+        Identical (after normalization) texts in one call are encoded once.
+        Returns a float32 array in the order of texts.
+        """
+        keys = [self.make_key(model_name, text) for text in texts]
+        found = self.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = model.encode(list(missing.values()), convert_to_numpy=True, **encode_kwargs)
+            computed = dict(zip(missing, vectors))
+            self.put_many(computed.items())
+            found.update((key, np.asarray(vector, dtype=np.float32)) for key, vector in computed.items())
+
+        return np.vstack([found[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus current size on disk."""
+        total, count = self._connect().execute("SELECT COALESCE(SUM(LENGTH(vector)), 0), COUNT(*) FROM embeddings").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": count,
+            "bytes": total,
+            "max_bytes": self.max_bytes
+        }
+
+embedding_cache = EmbeddingCache()
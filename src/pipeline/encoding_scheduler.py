@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Sort texts by token length and size batches by padded tokens instead of count
+ENCODE_BUCKETING = os.environ.get("ENCODE_BUCKETING", "1") != "0"
+# Padded tokens per model call: 64 short headers or 32 full 256-token chunks
+ENCODE_TOKEN_BUDGET = int(os.environ.get("ENCODE_TOKEN_BUDGET", "8192"))
+ENCODE_MAX_BATCH_SIZE = int(os.environ.get("ENCODE_MAX_BATCH_SIZE", "256"))
+# Worker processes for encoding, each with its own model; 0 or 1 encodes in this process
+ENCODE_PROCESSES = int(os.environ.get("ENCODE_PROCESSES", "0"))
+DEFAULT_MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2 truncates here
+
+def token_lengths(model, texts: list) -> list:
+    """
+    Token count of each text as the model will see it (capped at its max_seq_length).
+
+    Uses the model's tokenizer when it has one, otherwise estimates ~4
+    characters per token.
+    """
+    max_length = getattr(model, "max_seq_length", None) or DEFAULT_MAX_SEQ_LENGTH
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is not None:
+        encoded = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=max_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+    return [min(max_length, len(text) // 4 + 2) for text in texts]
+
+def plan_batches(lengths: list, token_budget: int = ENCODE_TOKEN_BUDGET, max_batch_size: int = ENCODE_MAX_BATCH_SIZE) -> list:
+    """
+    Group text positions into batches of similar length.
+
+    Positions are sorted by length and a batch grows until its padded size
+    (count x longest) would exceed token_budget, so batches of short texts
+    are large and batches of long texts small. Returns lists of positions.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches, batch = [], []
+    for position in order:
+        padded = (len(batch) + 1) * max(lengths[position], 1)
+        if batch and (padded > token_budget or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch = []
+        batch.append(position)
+    if batch:
+        batches.append(batch)
+    return batches
+
+_worker_model = None
+
+def _init_worker(backend: str, threads: int):
+    global _worker_model
+    from src.pipeline.resources import load_embedding_model
+
+    _worker_model = load_embedding_model(backend, threads=threads)
+
+def _encode_in_worker(texts: list, encode_kwargs: dict):
+    return _worker_model.encode(texts, batch_size=len(texts), convert_to_numpy=True, **encode_kwargs)
+
+class EncodingPool:
+    """
+    Worker processes that each load the embedding model once.
+
+    Spawned rather than forked, since torch and ONNX Runtime thread pools do
+    not survive fork. CPU cores are split evenly between workers.
+    """
+
+    def __init__(self, processes: int = ENCODE_PROCESSES, backend: str = None, initializer=_init_worker, initargs=None):
+        from src.pipeline.resources import EMBEDDING_BACKEND
+
+        self.processes = processes
+        threads = max(1, (os.cpu_count() or 1) // processes)
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=initializer,
+            initargs=initargs if initargs is not None else (backend or EMBEDDING_BACKEND, threads)
+        )
+        logger.info(f"Started {processes} encoding processes with {threads} threads each")
+
+    def submit(self, texts: list, encode_kwargs: dict):
+        return self._executor.submit(_encode_in_worker, texts, encode_kwargs)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+class EncodingScheduler:
+    """
+    Drop-in for model.encode that batches by length.
+
+    Texts are sorted into length buckets (plan_batches) so short chunks are
+    not padded to the length of long ones, each batch is encoded with a
+    batch size fitted to its length, and the embeddings are returned in the
+    original order. With a pool, batches are spread over its processes.
+    """
+
+    def __init__(self, model, pool: EncodingPool = None, token_budget: int = ENCODE_TOKEN_BUDGET, max_batch_size: int = ENCODE_MAX_BATCH_SIZE):
+        self.model = model
+        self.pool = pool
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+
+    def encode(self, texts, convert_to_numpy=True, **encode_kwargs) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        encode_kwargs.pop("batch_size", None)
+        batches = plan_batches(token_lengths(self.model, texts), self.token_budget, self.max_batch_size)
+
+        if self.pool is not None:
+            futures = [self.pool.submit([texts[i] for i in batch], encode_kwargs) for batch in batches]
+            results = (future.result() for future in futures)
+        else:
+            results = (
+                self.model.encode([texts[i] for i in batch], batch_size=len(batch), convert_to_numpy=True, **encode_kwargs)
+                for batch in batches
+            )
+
+        embeddings = None
+        for batch, vectors in zip(batches, results):
+            vectors = np.asarray(vectors, dtype=np.float32)
+            if embeddings is None:
+                embeddings = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            embeddings[batch] = vectors
+        return embeddings
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+EXTRACTION_CACHE_DIR = os.environ.get(
+    "EXTRACTION_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "hackrx-extraction-cache")
+)
+EXTRACTION_CACHE_MAX_MB = int(os.environ.get("EXTRACTION_CACHE_MAX_MB", "512"))
+EXTRACTION_CACHE_ENABLED = os.environ.get("EXTRACTION_CACHE_ENABLED", "1") != "0"
+# Writes between full directory scans; other workers' entries are only counted then
+EVICT_SCAN_INTERVAL = 64
+
+class ExtractionCache:
+    """
+    Content-addressed on-disk cache for extracted document text.
+
+    Entries are keyed by SHA-256 of the file bytes, the file extension and
+    the extractor version, so a re-upload of the same document under any
+    name skips parsing and OCR. Each entry is a single file written to a
+    temp file and os.replace()d into place, which keeps concurrent uvicorn
+    workers from ever reading a partial entry. Reads bump the file mtime and
+    eviction drops the least recently used entries once the directory grows
+    past max_bytes. The directory size is tracked incrementally per process
+    and only rescanned when that estimate exceeds max_bytes or every
+    EVICT_SCAN_INTERVAL writes, so a write does not walk the whole cache.
+
+    Two kinds of entries exist per key: '.txt' holds the load_and_clean
+    string and '.jsonl' holds iter_pages records, one JSON object per line.
+    """
+
+    def __init__(self, directory: str = EXTRACTION_CACHE_DIR, max_bytes: int = EXTRACTION_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._bytes = None  # Estimated directory size, None until the first scan
+        self._writes_since_scan = 0
+
+    @staticmethod
+    def make_key(file_bytes: bytes, filename: str, version: str) -> str:
+        """Build a cache key from the file content, extension and extractor version."""
+        extension = os.path.splitext(filename.lower())[1]
+        digest = hashlib.sha256(file_bytes).hexdigest()
+        return f"{digest}-{extension.lstrip('.') or 'bin'}-v{version}"
+
+    def _path(self, key: str, suffix: str) -> str:
+        # Shard by digest prefix to keep directories small
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _touch(self, path: str):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def get_text(self, key: str):
+        """Return the cached text for key, or None on a miss."""
+        path = self._path(key, ".txt")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            self._count(hit=False)
+            return None
+
+        self._touch(path)
+        self._count(hit=True)
+        return text
+
+    def put_text(self, key: str, text: str):
+        """Store text for key atomically."""
+        try:
+            path = self._path(key, ".txt")
+            self._write_atomic(path, lambda f: f.write(text))
+            self._record_write(path)
+        except OSError as e:
+            logger.warning(f"Could not write extraction cache entry {key}: {e}")
+
+    def iter_pages(self, key: str):
+        """Return an iterator over cached page records for key, or None on a miss."""
+        path = self._path(key, ".jsonl")
+        try:
+            f = open(path, "r", encoding="utf-8")
+        except OSError:
+            self._count(hit=False)
+            return None
+
+        self._touch(path)
+        self._count(hit=True)
+
+        def records():
+            with f:
+                for line in f:
+                    yield json.loads(line)
+
+        return records()
+
+    def write_pages(self, key: str, records):
+        """
+        Pass page records through while spooling them to the cache.
+
+        The entry is only committed once the iterator is exhausted, so a
+        partially consumed or failed extraction never becomes visible.
+        """
+        path = self._path(key, ".jsonl")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        except OSError as e:
+            logger.warning(f"Could not open extraction cache entry {key}: {e}")
+            yield from records
+            return
+
+        committed = False
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    yield record
+            os.replace(tmp_path, path)
+            committed = True
+        finally:
+            if not committed:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+        self._record_write(path)
+
+    def _write_atomic(self, path: str, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _entries(self):
+        """List (mtime, size, path) for every committed entry."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # Evicted by another worker
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _record_write(self, path: str):
+        """Count a committed entry and evict once the cache may be over budget."""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        with self._lock:
+            self._writes_since_scan += 1
+            if self._bytes is not None:
+                self._bytes += size  # Overcounts replaced entries, which only rescans sooner
+            due = self._bytes is None or self._bytes > self.max_bytes or self._writes_since_scan >= EVICT_SCAN_INTERVAL
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                logger.debug(f"Evicted extraction cache entry {os.path.basename(path)}")
+                if total <= self.max_bytes:
+                    break
+
+        with self._lock:
+            self._bytes = total
+            self._writes_since_scan = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus current on-disk usage."""
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes
+        }
+
+extraction_cache = ExtractionCache()
@@ -0,0 +1,615 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from src.pipeline.vector_store import VectorStore, QUERY_WORKERS
+from src.utils.logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: snapshots are not locked between processes
+    fcntl = None
+
+logger = get_logger(__name__)
+
+FAISS_DIR = os.environ.get("FAISS_DIR", os.path.join(tempfile.gettempdir(), "hackrx-faiss"))
+FAISS_INDEX_TYPE = os.environ.get("FAISS_INDEX_TYPE", "flat")  # flat | ivf | hnsw
+FAISS_IVF_NLIST = int(os.environ.get("FAISS_IVF_NLIST", "256"))
+FAISS_IVF_NPROBE = int(os.environ.get("FAISS_IVF_NPROBE", "16"))
+FAISS_HNSW_M = int(os.environ.get("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_CONSTRUCTION = 80
+FAISS_HNSW_EF_SEARCH = int(os.environ.get("FAISS_HNSW_EF_SEARCH", "64"))
+# Filtered queries over at most this many vectors are scored exactly
+FAISS_EXACT_FILTER_MAX = int(os.environ.get("FAISS_EXACT_FILTER_MAX", "20000"))
+# Rebuild the index once this fraction of its rows are deleted or replaced
+FAISS_COMPACT_RATIO = 0.25
+# Metadata fields with an inverted index for filtered search
+FILTER_FIELDS = ("source", "doc_id")
+# Codes kept in the index: none (float32), fp16, int8 or binary (1 bit per dimension, flat only).
+# Quantized indexes keep float32 vectors in a memory-mapped side file to re-score candidates.
+FAISS_QUANTIZATION = os.environ.get("FAISS_QUANTIZATION", "none")
+# Candidates fetched from a quantized index per result, before re-scoring
+FAISS_RESCORE_FACTOR = int(os.environ.get("FAISS_RESCORE_FACTOR", "8"))
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+QUANTIZATIONS = ("none", "fp16", "int8", "binary")
+RECONSTRUCT_BATCH = 10000
+
+class FullVectors:
+    """
+    Float32 vectors by position: a read-only (memory-mapped) snapshot array
+    plus the rows appended since it was written.
+    """
+
+    def __init__(self, dimension: int, base: np.ndarray = None):
+        self.dimension = dimension
+        self.base = base if base is not None else np.empty((0, dimension), dtype=np.float32)
+        self._blocks = []
+        self._extra = np.empty((0, dimension), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.base) + len(self._extra) + sum(len(block) for block in self._blocks)
+
+    def append(self, matrix: np.ndarray):
+        self._blocks.append(np.asarray(matrix, dtype=np.float32))
+
+    def _appended(self) -> np.ndarray:
+        if self._blocks:
+            self._extra = np.vstack([self._extra] + self._blocks)
+            self._blocks = []
+        return self._extra
+
+    def take(self, positions) -> np.ndarray:
+        positions = np.asarray(positions, dtype=np.int64)
+        extra = self._appended()
+        in_base = positions < len(self.base)
+        if in_base.all():
+            return np.asarray(self.base[positions])
+        rows = np.empty((len(positions), self.dimension), dtype=np.float32)
+        rows[in_base] = self.base[positions[in_base]]
+        rows[~in_base] = extra[positions[~in_base] - len(self.base)]
+        return rows
+
+    def save(self, path: str):
+        """Write all rows as a .npy file, streaming so nothing is copied in memory."""
+        extra = self._appended()
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(len(self.base) + len(extra), self.dimension))
+        for start in range(0, len(self.base), RECONSTRUCT_BATCH):
+            out[start:start + RECONSTRUCT_BATCH] = self.base[start:start + RECONSTRUCT_BATCH]
+        out[len(self.base):] = extra
+        out.flush()
+        del out
+
+    def nbytes(self) -> int:
+        return len(self) * self.dimension * 4
+
+class FaissVectorStore(VectorStore):
+    """
+    In-process vector store on a FAISS index, persisted as snapshots.
+
+    Vectors are L2-normalized so inner product equals cosine similarity, as
+    with the Pinecone index. FAISS rows are addressed by position; string ids
+    and metadata live in a side store (lists plus an inverted index on
+    FILTER_FIELDS) that is snapshotted next to the index. Deleted or
+    replaced rows become tombstones that searches skip, and the index is
+    rebuilt from its own vectors once tombstones exceed FAISS_COMPACT_RATIO.
+
+    index_type is "flat" (exact), "ivf" (IVFFlat; stays flat until there
+    are enough vectors to train FAISS_IVF_NLIST centroids) or "hnsw".
+
+    quantization stores the index codes as fp16 (2x smaller), int8 scalar
+    quantized (4x) or, for flat, sign bits searched by Hamming distance
+    (32x). Searches then fetch top_k * FAISS_RESCORE_FACTOR candidates from
+    the codes and re-score them exactly against float32 vectors kept in a
+    memory-mapped side file (FullVectors), which the OS pages in on demand.
+
+    flush() writes a new snapshot generation (index-N.faiss, metadata-N.jsonl,
+    then CURRENT) under an exclusive file lock. If another process saved a
+    newer generation in the meantime, it is reloaded and this process's
+    pending writes are replayed on top before saving, so concurrent workers
+    do not lose each other's documents. Queries pick up newer snapshots, and
+    snapshots are opened with mmap where FAISS supports it, so a restarted
+    worker serves queries straight away without re-embedding anything.
+    """
+
+    # Float32 vectors can be passed as numpy rows instead of lists
+    accepts_arrays = True
+
+    def __init__(self, directory: str = FAISS_DIR, dimension: int = 384, index_type: str = FAISS_INDEX_TYPE, quantization: str = FAISS_QUANTIZATION):
+        import faiss
+
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type {index_type!r}, expected one of {INDEX_TYPES}")
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown FAISS quantization {quantization!r}, expected one of {QUANTIZATIONS}")
+        if quantization == "binary" and index_type != "flat":
+            raise ValueError("Binary quantization is only supported with the flat index type")
+        self._faiss = faiss
+        self.directory = directory
+        self.dimension = dimension
+        self.index_type = index_type
+        self.quantization = quantization
+        self._lock = threading.RLock()
+        self._generation = 0
+        self._pending = []  # Writes since the last snapshot, replayed if another process saved first
+        self._mmapped = False
+        self._reset()
+        self._load_latest()
+
+    # ----- side store -------------------------------------------------------
+
+    def _reset(self):
+        self._quantization = self.quantization  # Of the current index; differs after loading an older snapshot
+        self._index = self._new_index("flat" if self.index_type == "ivf" else self.index_type)
+        self._full = FullVectors(self.dimension) if self._quantization != "none" else None
+        self._keys = []       # Position -> id, None for tombstones
+        self._metadata = []   # Position -> metadata, None for tombstones
+        self._positions = {}  # id -> position
+        self._by_field = {field: {} for field in FILTER_FIELDS}
+        self._deleted = 0
+
+    def _active_type(self) -> str:
+        if isinstance(self._index, self._faiss.IndexHNSW):
+            return "hnsw"
+        if isinstance(self._index, self._faiss.IndexIVF):
+            return "ivf"
+        return "flat"
+
+    def _new_index(self, index_type: str, training_vectors=None):
+        """Empty index of index_type with self._quantization codes; int8 codes are trained on the first rows added."""
+        faiss = self._faiss
+        metric = faiss.METRIC_INNER_PRODUCT
+        quantization = self._quantization
+        scalar_type = {
+            "fp16": faiss.ScalarQuantizer.QT_fp16,
+            "int8": faiss.ScalarQuantizer.QT_8bit
+        }.get(quantization)
+
+        if quantization == "binary":
+            index = faiss.IndexBinaryFlat(self.dimension)
+        elif index_type == "hnsw":
+            if scalar_type is None:
+                index = faiss.IndexHNSWFlat(self.dimension, FAISS_HNSW_M, metric)
+            else:
+                index = faiss.IndexHNSWSQ(self.dimension, scalar_type, FAISS_HNSW_M, metric)
+            index.hnsw.efConstruction = FAISS_HNSW_EF_CONSTRUCTION
+            index.hnsw.efSearch = FAISS_HNSW_EF_SEARCH
+        elif index_type == "ivf":
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            if scalar_type is None:
+                index = faiss.IndexIVFFlat(quantizer, self.dimension, FAISS_IVF_NLIST, metric)
+            else:
+                index = faiss.IndexIVFScalarQuantizer(quantizer, self.dimension, FAISS_IVF_NLIST, scalar_type, metric)
+            index.own_fields = True
+            quantizer.this.disown()  # Owned (and freed) by the IVF index now
+            index.nprobe = FAISS_IVF_NPROBE
+        elif scalar_type is None:
+            index = faiss.IndexFlatIP(self.dimension)
+        else:
+            index = faiss.IndexScalarQuantizer(self.dimension, scalar_type, metric)
+
+        if training_vectors is not None and len(training_vectors) and not index.is_trained:
+            self._train(index, training_vectors)
+        if index_type == "ivf":
+            index.make_direct_map()  # Needed to reconstruct vectors when compacting
+        return index
+
+    def _train(self, index, vectors: np.ndarray):
+        """
+        Train on vectors. For int8 codes the per-dimension range is widened
+        to +/- the largest component seen, so training on a small first
+        batch does not collapse dimensions that happen to vary little in it.
+        """
+        if self._quantization == "int8":
+            bound = float(np.abs(vectors).max())
+            vectors = np.vstack([vectors, np.full((2, self.dimension), bound, dtype=np.float32) * [[1], [-1]]]).astype(np.float32)
+        index.train(vectors)
+
+    def _codes(self, matrix: np.ndarray) -> np.ndarray:
+        if self._quantization == "binary":
+            return np.packbits(matrix > 0, axis=1)
+        return matrix
+
+    def _add_rows(self, ids: list, metadatas: list, matrix: np.ndarray):
+        if not self._index.is_trained:
+            self._train(self._index, matrix)
+        self._index.add(self._codes(matrix))
+        if self._full is not None:
+            self._full.append(matrix)
+        start = len(self._keys)
+        for offset, (vector_id, metadata) in enumerate(zip(ids, metadatas)):
+            if vector_id in self._positions:
+                self._tombstone(self._positions[vector_id])
+            position = start + offset
+            self._keys.append(vector_id)
+            self._metadata.append(metadata)
+            self._positions[vector_id] = position
+            for field in FILTER_FIELDS:
+                if field in metadata:
+                    self._by_field[field].setdefault(metadata[field], set()).add(position)
+
+    def _tombstone(self, position: int):
+        vector_id, metadata = self._keys[position], self._metadata[position]
+        if vector_id is None:
+            return
+        self._keys[position] = None
+        self._metadata[position] = None
+        if self._positions.get(vector_id) == position:
+            del self._positions[vector_id]
+        for field in FILTER_FIELDS:
+            positions = self._by_field[field].get(metadata.get(field))
+            if positions is not None:
+                positions.discard(position)
+                if not positions:
+                    del self._by_field[field][metadata.get(field)]
+        self._deleted += 1
+
+    def _set_metadata(self, vector_id: str, fields: dict):
+        position = self._positions.get(vector_id)
+        if position is None:
+            return
+        metadata = self._metadata[position]
+        for field in FILTER_FIELDS:
+            if field in fields and fields[field] != metadata.get(field):
+                positions = self._by_field[field].get(metadata.get(field))
+                if positions is not None:
+                    positions.discard(position)
+                    if not positions:
+                        del self._by_field[field][metadata.get(field)]
+                self._by_field[field].setdefault(fields[field], set()).add(position)
+        self._metadata[position] = {**metadata, **fields}
+
+    def _reconstruct(self, positions) -> np.ndarray:
+        """Full-precision vectors at positions."""
+        positions = np.asarray(positions, dtype=np.int64)
+        if not len(positions):
+            return np.empty((0, self.dimension), dtype=np.float32)
+        if self._full is not None:
+            return self._full.take(positions)
+        return np.vstack([
+            self._index.reconstruct_batch(positions[i:i + RECONSTRUCT_BATCH])
+            for i in range(0, len(positions), RECONSTRUCT_BATCH)
+        ])
+
+    def _rebuild(self):
+        """Re-create the index from live rows: drops tombstones and trains IVF once possible."""
+        live = [position for position, key in enumerate(self._keys) if key is not None]
+        vectors = self._reconstruct(live)
+        index_type = self.index_type
+        if index_type == "ivf" and len(live) < self._ivf_training_size():
+            index_type = "flat"
+
+        keys = [self._keys[position] for position in live]
+        metadatas = [self._metadata[position] for position in live]
+        self._reset()
+        self._index = self._new_index(index_type, vectors)
+        if len(live):
+            self._add_rows(keys, metadatas, vectors)
+        logger.info(f"Rebuilt FAISS {index_type} index with {len(live)} vectors")
+
+    def _ivf_training_size(self) -> int:
+        return FAISS_IVF_NLIST * 39  # FAISS warns below 39 points per centroid
+
+    def _maybe_rebuild(self):
+        needs_training = self.index_type == "ivf" and self._active_type() == "flat" and len(self._positions) >= self._ivf_training_size()
+        too_many_tombstones = self._deleted > FAISS_COMPACT_RATIO * max(len(self._keys), 1)
+        quantization_changed = self._quantization != self.quantization
+        if needs_training or too_many_tombstones or quantization_changed:
+            self._rebuild()
+
+    def _ensure_writable(self):
+        """
+        A memory-mapped snapshot is read-only; load the latest one fully
+        before the first write. Nothing is pending while mmapped, so this
+        is just a refresh.
+        """
+        if self._mmapped:
+            with self._file_lock(fcntl.LOCK_SH if fcntl else None):
+                self._load(self._current_generation(), mmap=False)
+
+    # ----- VectorStore ------------------------------------------------------
+
+    def upsert(self, vectors: list):
+        if not vectors:
+            return
+        ids = [vector["id"] for vector in vectors]
+        metadatas = [dict(vector.get("metadata") or {}) for vector in vectors]
+        matrix = np.ascontiguousarray([vector["values"] for vector in vectors], dtype=np.float32)
+        self._faiss.normalize_L2(matrix)
+
+        with self._lock:
+            self._ensure_writable()
+            self._add_rows(ids, metadatas, matrix)
+            self._pending.append(("upsert", ids, metadatas, matrix))
+            self._maybe_rebuild()
+
+    def delete(self, ids: list = None, filter: dict = None, delete_all: bool = False):
+        with self._lock:
+            self._ensure_writable()
+            if delete_all:
+                self._reset()
+                self._pending.append(("delete_all",))
+                return
+            if filter:
+                positions = self._filter_positions(filter)
+            else:
+                positions = [self._positions[vector_id] for vector_id in ids or () if vector_id in self._positions]
+            deleted_ids = [self._keys[position] for position in positions]
+            for position in list(positions):
+                self._tombstone(position)
+            self._pending.append(("delete", deleted_ids))
+            self._maybe_rebuild()
+
+    def update_metadata(self, vector_id: str, fields: dict):
+        with self._lock:
+            self._ensure_writable()
+            self._set_metadata(vector_id, fields)
+            self._pending.append(("update", vector_id, dict(fields)))
+
+    def query(self, vector, top_k: int = 5, filter: dict = None) -> list:
+        return self.query_many([vector], top_k=top_k, filter=filter)[0]
+
+    def query_many(self, vectors, top_k: int = 5, filter: dict = None, workers: int = QUERY_WORKERS) -> list:
+        """All vectors in one FAISS search call, which parallelizes over them itself (workers is unused)."""
+        queries = np.ascontiguousarray(list(vectors), dtype=np.float32).reshape(-1, self.dimension)
+        if not len(queries):
+            return []
+        self._faiss.normalize_L2(queries)
+        self._refresh()
+
+        with self._lock:
+            allowed = self._filter_positions(filter) if filter else None
+            if allowed is not None and len(allowed) <= FAISS_EXACT_FILTER_MAX:
+                results = self._exact_search(queries, allowed, top_k)
+            elif self._full is not None:
+                candidates, _ = self._index_search(queries, allowed, top_k * FAISS_RESCORE_FACTOR)
+                results = [
+                    self._exact_search(query[None, :], [position for position in row if position >= 0], top_k)[0]
+                    for query, row in zip(queries, candidates)
+                ]
+            else:
+                results = list(zip(*self._index_search(queries, allowed, top_k)))
+
+            return [
+                [
+                    {"id": self._keys[position], "score": float(score), "metadata": dict(self._metadata[position])}
+                    for position, score in zip(positions, scores)
+                    if position >= 0 and self._keys[position] is not None
+                ]
+                for positions, scores in results
+            ]
+
+    def _exact_search(self, queries: np.ndarray, allowed, top_k: int) -> list:
+        """
+        Score positions exactly: small filtered subsets (graph/cluster search
+        would miss most of them) and candidates from quantized codes.
+        Returns (positions, scores) per query.
+        """
+        if not allowed:
+            return [([], [])] * len(queries)
+        positions = np.fromiter(allowed, dtype=np.int64, count=len(allowed))
+        scores = queries @ self._reconstruct(positions).T
+        results = []
+        for row in scores:
+            top = np.argsort(-row)[:top_k]
+            results.append((positions[top].tolist(), row[top].tolist()))
+        return results
+
+    def _index_search(self, queries: np.ndarray, allowed, top_k: int):
+        """Search the index; returns (positions, scores), one list per query."""
+        faiss = self._faiss
+        if not self._index.ntotal:
+            return [[]] * len(queries), [[]] * len(queries)
+        if allowed is not None:
+            selector = faiss.IDSelectorBatch(np.fromiter(allowed, dtype=np.int64, count=len(allowed)))
+        elif self._deleted:
+            tombstones = np.array([position for position, key in enumerate(self._keys) if key is None], dtype=np.int64)
+            excluded = faiss.IDSelectorBatch(tombstones)
+            selector = faiss.IDSelectorNot(excluded)
+        else:
+            selector = None
+
+        active = self._active_type()
+        if active == "hnsw":
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=max(FAISS_HNSW_EF_SEARCH, top_k))
+        elif active == "ivf":
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=FAISS_IVF_NPROBE)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        scores, positions = self._index.search(self._codes(queries), top_k, params=params)
+        return positions.tolist(), scores.tolist()
+
+    def _filter_positions(self, filter: dict) -> set:
+        """Positions matching a Pinecone-style equality filter, e.g. {"source": {"$eq": name}}."""
+        result = None
+        for field, condition in filter.items():
+            if isinstance(condition, dict):
+                if set(condition) != {"$eq"}:
+                    raise ValueError(f"Unsupported filter on {field!r}: only $eq is supported")
+                value = condition["$eq"]
+            else:
+                value = condition
+
+            if field in self._by_field:
+                matches = set(self._by_field[field].get(value, ()))
+            else:
+                matches = {
+                    position for position, metadata in enumerate(self._metadata)
+                    if metadata is not None and metadata.get(field) == value
+                }
+            result = matches if result is None else result & matches
+        return result if result is not None else set()
+
+    def fetch_metadata(self, ids: list) -> dict:
+        with self._lock:
+            return {
+                vector_id: dict(self._metadata[self._positions[vector_id]])
+                for vector_id in ids if vector_id in self._positions
+            }
+
+    def list_ids(self, prefix: str = ""):
+        with self._lock:
+            ids = [vector_id for vector_id in self._positions if vector_id.startswith(prefix)]
+        yield from ids
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "total_vectors": len(self._positions),
+                "dimension": self.dimension,
+                "index_fullness": 0.0,
+                "index_type": self._active_type(),
+                "quantization": self._quantization,
+                "code_bytes_per_vector": self._code_size(),
+                "full_vectors_bytes": self._full.nbytes() if self._full is not None else 0,
+                "tombstones": self._deleted,
+                "generation": self._generation
+            }
+
+    def _code_size(self) -> int:
+        return {"none": 4 * self.dimension, "fp16": 2 * self.dimension, "int8": self.dimension, "binary": self.dimension // 8}[self._quantization]
+
+    # ----- snapshots --------------------------------------------------------
+
+    def _paths(self, generation: int):
+        return (
+            os.path.join(self.directory, f"index-{generation}.faiss"),
+            os.path.join(self.directory, f"metadata-{generation}.jsonl"),
+            os.path.join(self.directory, f"vectors-{generation}.npy")
+        )
+
+    def _current_generation(self) -> int:
+        try:
+            with open(os.path.join(self.directory, "CURRENT"), "r") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    @contextmanager
+    def _file_lock(self, mode):
+        """Hold the snapshot directory lock (fcntl.LOCK_SH or LOCK_EX) between processes."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "LOCK"), "a+") as lock_file:
+            if mode is not None:
+                fcntl.flock(lock_file, mode)
+            yield
+
+    def _load_latest(self):
+        with self._file_lock(fcntl.LOCK_SH if fcntl else None):
+            generation = self._current_generation()
+            if generation:
+                self._load(generation)
+
+    def _load(self, generation: int, mmap: bool = True):
+        """Replace in-memory state with snapshot generation (index memory-mapped when possible)."""
+        faiss = self._faiss
+        index_path, metadata_path, vectors_path = self._paths(generation)
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            rows = [json.loads(line) for line in f]
+        quantization = header.get("quantization", "none")
+        read_index = faiss.read_index_binary if quantization == "binary" else faiss.read_index
+
+        index, mmapped = None, False
+        if mmap:
+            try:
+                index = read_index(index_path, getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP))
+                mmapped = True
+            except RuntimeError:
+                pass  # Index type without mmap support
+        if index is None:
+            index = read_index(index_path)
+
+        self._reset()
+        self._index = index
+        self._mmapped = mmapped
+        self._quantization = quantization
+        self._full = FullVectors(self.dimension, np.load(vectors_path, mmap_mode="r")) if quantization != "none" else None
+        if self._active_type() == "ivf":
+            index.nprobe = FAISS_IVF_NPROBE
+        for position, (vector_id, metadata) in enumerate(rows):
+            self._keys.append(vector_id)
+            self._metadata.append(metadata)
+            if vector_id is None:
+                self._deleted += 1
+                continue
+            self._positions[vector_id] = position
+            for field in FILTER_FIELDS:
+                if field in metadata:
+                    self._by_field[field].setdefault(metadata[field], set()).add(position)
+        self._generation = generation
+        logger.info(f"Loaded FAISS snapshot {generation} ({header['index_type']}/{quantization}, {len(self._positions)} vectors, mmap={mmapped})")
+
+    def _refresh(self):
+        """Pick up a snapshot saved by another worker, unless we have unsaved writes."""
+        if self._pending or self._current_generation() <= self._generation:
+            return
+        with self._lock, self._file_lock(fcntl.LOCK_SH if fcntl else None):
+            generation = self._current_generation()
+            if not self._pending and generation > self._generation:
+                self._load(generation)
+
+    def _replay(self, pending: list):
+        for operation in pending:
+            if operation[0] == "upsert":
+                _, ids, metadatas, matrix = operation
+                self._add_rows(ids, metadatas, matrix)
+            elif operation[0] == "delete":
+                for vector_id in operation[1]:
+                    if vector_id in self._positions:
+                        self._tombstone(self._positions[vector_id])
+            elif operation[0] == "update":
+                self._set_metadata(operation[1], operation[2])
+            elif operation[0] == "delete_all":
+                self._reset()
+        self._maybe_rebuild()
+
+    def flush(self):
+        """Write pending changes as a new snapshot generation."""
+        with self._lock:
+            if not self._pending:
+                return
+            with self._file_lock(fcntl.LOCK_EX if fcntl else None):
+                latest = self._current_generation()
+                if latest > self._generation:
+                    # Another worker saved first: rebase our writes on its snapshot
+                    self._load(latest, mmap=False)
+                    self._replay(self._pending)
+                self._save(latest + 1)
+            self._pending = []
+
+    def _save(self, generation: int):
+        index_path, metadata_path, vectors_path = self._paths(generation)
+        write_index = self._faiss.write_index_binary if self._quantization == "binary" else self._faiss.write_index
+        write_index(self._index, index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+        if self._full is not None:
+            self._full.save(vectors_path + ".tmp.npy")
+            os.replace(vectors_path + ".tmp.npy", vectors_path)
+
+        with open(metadata_path + ".tmp", "w", encoding="utf-8") as f:
+            header = {"generation": generation, "index_type": self._active_type(), "quantization": self._quantization,
+                      "dimension": self.dimension, "rows": len(self._keys)}
+            f.write(json.dumps(header) + "\n")
+            for vector_id, metadata in zip(self._keys, self._metadata):
+                f.write(json.dumps([vector_id, metadata], ensure_ascii=False) + "\n")
+        os.replace(metadata_path + ".tmp", metadata_path)
+
+        current = os.path.join(self.directory, "CURRENT")
+        with open(current + ".tmp", "w") as f:
+            f.write(str(generation))
+        os.replace(current + ".tmp", current)
+
+        self._generation = generation
+        # Keep the previous generation for readers that have not refreshed yet;
+        # mmapped files stay readable after removal on POSIX anyway
+        for path in self._paths(generation - 2):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        logger.info(f"Saved FAISS snapshot {generation} ({len(self._positions)} vectors)")
@@ -0,0 +1,149 @@
+import codecs
+import os
+import re
+import zipfile
+from io import BytesIO
+
+# How much of an upload encoding detection may look at
+ENCODING_SAMPLE_BYTES = 64 * 1024
+ENCODING_BLOCK_BYTES = 4 * 1024
+
+# How far into the file '%PDF-' may appear (some generators prepend junk)
+PDF_MAGIC_WINDOW = 1024
+PDF_MAGIC = re.compile(rb"%PDF-\d\.\d")
+
+EXTENSION_FORMATS = {
+    ".pdf": "pdf",
+    ".docx": "docx",
+    ".eml": "email",
+    ".msg": "email",
+    ".png": "image",
+    ".jpg": "image",
+    ".jpeg": "image",
+    ".tiff": "image",
+    ".tif": "image",
+    ".bmp": "image",
+}
+
+IMAGE_SIGNATURES = (
+    b"\x89PNG\r\n\x1a\n",
+    b"\xff\xd8\xff",  # JPEG
+    b"II*\x00",       # TIFF, little endian
+    b"MM\x00*",       # TIFF, big endian
+)
+
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+EMAIL_HEADERS = {
+    "from", "to", "cc", "subject", "date", "received", "return-path",
+    "message-id", "mime-version", "content-type", "reply-to", "delivered-to",
+}
+HEADER_LINE = re.compile(rb"^([A-Za-z][A-Za-z0-9-]*):[ \t]")
+
+def detect_format(file_bytes: bytes, filename: str = "") -> str:
+    """
+    Work out which extractor should handle an upload.
+
+    Magic bytes win over the filename, so a mislabelled upload still goes
+    to the right extractor; the extension is only used when the content
+    has no recognisable signature. A PDF header behind leading junk is only
+    trusted for .pdf or extensionless names, so a text file or email that
+    merely mentions "%PDF-1.4" is not sent to the PDF extractor.
+
+    Returns:
+        One of 'pdf', 'docx', 'email', 'image' or 'text'.
+    """
+    head = file_bytes[:PDF_MAGIC_WINDOW]
+
+    pdf_magic = PDF_MAGIC.search(head)
+    if pdf_magic and (pdf_magic.start() == 0 or os.path.splitext(filename.lower())[1] in ("", ".pdf")):
+        return "pdf"
+    if head.startswith(b"PK\x03\x04") and _is_docx(file_bytes):
+        return "docx"
+    if head.startswith(IMAGE_SIGNATURES):
+        return "image"
+    if _looks_like_rfc822(head, truncated=len(file_bytes) > len(head)):
+        return "email"
+
+    for extension, file_format in EXTENSION_FORMATS.items():
+        if filename.lower().endswith(extension):
+            return file_format
+
+    return "text"
+
+def _is_docx(file_bytes: bytes) -> bool:
+    """Check for word/document.xml by reading only the zip central directory."""
+    try:
+        with zipfile.ZipFile(BytesIO(file_bytes)) as archive:
+            return "word/document.xml" in archive.namelist()
+    except zipfile.BadZipFile:
+        return False
+
+def _looks_like_rfc822(head: bytes, truncated: bool = False) -> bool:
+    """
+    True if the first header block has at least two well-known email headers.
+
+    Long Received/DKIM blocks can push the header block past the sample,
+    so this answers as soon as two are seen, and when the sample was cut
+    off (truncated) its last, possibly partial, line is ignored.
+    """
+    lines = head.splitlines()
+    if truncated and lines:
+        lines.pop()
+    known = 0
+    for line in lines:
+        if not line.strip():
+            break  # End of header block
+        if line[:1] in (b" ", b"\t"):
+            continue  # Folded continuation line
+        match = HEADER_LINE.match(line)
+        if not match:
+            return False
+        if match.group(1).decode("ascii").lower() in EMAIL_HEADERS:
+            known += 1
+            if known >= 2:
+                return True
+    return False
+
+def detect_encoding(data: bytes, sample_size: int = ENCODING_SAMPLE_BYTES) -> str:
+    """
+    Guess the text encoding of data from a bounded sample.
+
+    BOMs and valid UTF-8 (which covers plain ASCII) are recognised without
+    running chardet at all. Otherwise chardet is fed the sample in small
+    blocks and stops as soon as it is confident, so the cost no longer
+    grows with the size of the upload.
+    """
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return encoding
+
+    sample = data[:sample_size]
+    try:
+        # final=False tolerates a multi-byte character cut off by the sample
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=len(sample) == len(data))
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    import chardet  # Only needed off the UTF-8 fast path
+
+    detector = chardet.UniversalDetector()
+    for start in range(0, len(sample), ENCODING_BLOCK_BYTES):
+        detector.feed(sample[start:start + ENCODING_BLOCK_BYTES])
+        if detector.done:
+            break
+    detector.close()
+
+    encoding = detector.result.get("encoding") or "utf-8"
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        encoding = "utf-8"
+    return encoding
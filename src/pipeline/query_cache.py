@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.pipeline.embedding_cache import normalize_text
+
+QUERY_CACHE_ENABLED = os.environ.get("QUERY_CACHE_ENABLED", "1") != "0"
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+QUERY_RESULT_CACHE_SIZE = int(os.environ.get("QUERY_RESULT_CACHE_SIZE", "1024"))
+QUERY_RESULT_TTL_SECONDS = float(os.environ.get("QUERY_RESULT_TTL_SECONDS", "600"))
+# Metadata fields with their own generation counters
+SCOPE_FIELDS = ("source", "doc_id")
+# Scopes with a generation counter before they are all reset (with the cached results)
+QUERY_SCOPE_GENERATIONS_MAX = int(os.environ.get("QUERY_SCOPE_GENERATIONS_MAX", "4096"))
+
+class QueryCache:
+    """
+    Two-level in-process cache for retrieval.
+
+    Level 1 maps (model, normalized question) to its embedding, so stock
+    questions are embedded once. Level 2 maps (embedding hash, filter,
+    top_k, generation) to retrieved chunks, with a TTL; both levels are LRU
+    bounded.
+
+    The generation in a result key is a counter per scope (for queries
+    filtered on one source or one doc_id) or a global one (for any other
+    query). invalidate(source, doc_id) bumps those scopes' counters and the
+    global one, so cached results that could include them stop matching and
+    age out. Counters are kept for at most max_scopes scopes; past that
+    they are all dropped and the epoch is bumped (as by invalidate() with no
+    arguments), so a restarted counter never matches an old key.
+
+    The cache is per process: writes made by another worker are only
+    picked up when entries expire, hence the TTL.
+    """
+
+    def __init__(self, embedding_size: int = QUERY_EMBEDDING_CACHE_SIZE, result_size: int = QUERY_RESULT_CACHE_SIZE, ttl: float = QUERY_RESULT_TTL_SECONDS, max_scopes: int = QUERY_SCOPE_GENERATIONS_MAX):
+        self.embedding_size = embedding_size
+        self.result_size = result_size
+        self.ttl = ttl
+        self.max_scopes = max_scopes
+        self._embeddings = OrderedDict()
+        self._results = OrderedDict()
+        self._epoch = 0          # Bumped when everything is invalidated
+        self._global_generation = 0
+        self._scope_generations = {}  # (field, value) -> counter
+        self._lock = threading.Lock()
+        self.counters = {"embedding_hits": 0, "embedding_misses": 0, "result_hits": 0, "result_misses": 0}
+
+    # ----- level 1: question -> embedding ---------------------------------
+
+    def encode(self, model, model_name: str, questions: list) -> np.ndarray:
+        """Embeddings of questions, encoding only the uncached ones (in one call)."""
+        keys = [(model_name, normalize_text(question)) for question in questions]
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._embeddings:
+                    self._embeddings.move_to_end(key)
+                    found[key] = self._embeddings[key]
+            self.counters["embedding_hits"] += sum(1 for key in keys if key in found)
+            self.counters["embedding_misses"] += sum(1 for key in keys if key not in found)
+
+        missing = {}
+        for key, question in zip(keys, questions):
+            if key not in found and key not in missing:
+                missing[key] = question
+        if missing:
+            texts = list(missing.values())
+            vectors = np.asarray(model.encode(texts, batch_size=len(texts), convert_to_numpy=True), dtype=np.float32)
+            with self._lock:
+                for key, vector in zip(missing, vectors):
+                    found[key] = vector
+                    self._embeddings[key] = vector
+                    self._embeddings.move_to_end(key)
+                while len(self._embeddings) > self.embedding_size:
+                    self._embeddings.popitem(last=False)
+
+        return np.vstack([found[key] for key in keys])
+
+    # ----- level 2: (embedding, filter, top_k, generation) -> results -----
+
+    def _generation(self, filter: dict):
+        if filter and len(filter) == 1:
+            (field, value), = filter.items()
+            if isinstance(value, dict):
+                value = value.get("$eq")
+            if field in SCOPE_FIELDS and isinstance(value, str):
+                return self._epoch, field, self._scope_generations.get((field, value), 0)
+        return self._epoch, "global", self._global_generation
+
+    def result_key(self, embedding, filter: dict, top_k: int):
+        digest = hashlib.sha1(np.ascontiguousarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+        with self._lock:
+            generation = self._generation(filter)
+        return digest, json.dumps(filter, sort_keys=True), top_k, generation
+
+    def get_results(self, key):
+        """Cached results for key (a copy of each chunk dict), or None."""
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._results[key]
+                entry = None
+            if entry is None:
+                self.counters["result_misses"] += 1
+                return None
+            self._results.move_to_end(key)
+            self.counters["result_hits"] += 1
+            return [dict(chunk) for chunk in entry[1]]
+
+    def put_results(self, key, results: list):
+        with self._lock:
+            if key[3] != self._generation(json.loads(key[1])):
+                return  # Invalidated while the query was running
+            self._results[key] = (time.monotonic() + self.ttl, [dict(chunk) for chunk in results])
+            self._results.move_to_end(key)
+            while len(self._results) > self.result_size:
+                self._results.popitem(last=False)
+
+    # ----- invalidation ----------------------------------------------------
+
+    def invalidate(self, source: str = None, doc_id: str = None):
+        """Drop results that may include source or doc_id (or every result, if both are None)."""
+        with self._lock:
+            if source is None and doc_id is None:
+                self._epoch += 1
+                self._results.clear()
+                return
+            for scope in (("source", source), ("doc_id", doc_id)):
+                if scope[1] is not None:
+                    self._scope_generations[scope] = self._scope_generations.get(scope, 0) + 1
+            self._global_generation += 1
+            if len(self._scope_generations) > self.max_scopes:
+                self._scope_generations.clear()
+                self._epoch += 1
+                self._results.clear()
+
+    def clear(self):
+        with self._lock:
+            self._embeddings.clear()
+            self._results.clear()
+            self._epoch += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counters, "embeddings": len(self._embeddings), "results": len(self._results)}
+
+query_cache = QueryCache()
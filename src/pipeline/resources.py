@@ -0,0 +1,242 @@
+"""
+Process-wide registry for the embedding model and the vector store.
+
+Nothing is loaded or contacted at import time. The first call to
+get_model(), get_index() or get_vector_store() creates the resource once per process (thread
+safe) and every later call, from the embedder and the retriever alike,
+gets the same object. warm_up() creates everything up front, e.g. at app
+startup, and startup_report() shows how long each resource took.
+"""
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from src.pipeline.vector_store import PineconeVectorStore, VECTOR_STORE
+from src.utils.logger import get_logger
+
+load_dotenv()
+logger = get_logger(__name__)
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_DIMENSION = 384  # all-MiniLM-L6-v2
+INDEX_NAME = "hackrx"
+
+# "torch" runs the reference model; "onnx" runs an int8 dynamically quantized
+# ONNX export of the same model through ONNX Runtime (needs sentence-transformers[onnx])
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+# ONNX file inside the model repo; picked for this CPU when unset
+EMBEDDING_ONNX_FILE = os.environ.get("EMBEDDING_ONNX_FILE")
+# Intra-op threads for inference, 0 = runtime default
+EMBEDDING_THREADS = int(os.environ.get("EMBEDDING_THREADS", "0"))
+# Compare the quantized model with the reference model when it is loaded
+EMBEDDING_VERIFY_BACKEND = os.environ.get("EMBEDDING_VERIFY_BACKEND", "0") == "1"
+# Lowest acceptable cosine similarity between quantized and reference embeddings
+EMBEDDING_MIN_COSINE = float(os.environ.get("EMBEDDING_MIN_COSINE", "0.98"))
+
+AGREEMENT_SENTENCES = [
+    "What is the grace period for premium payment under this policy?",
+    "The Company shall indemnify the Insured Person for Reasonable and Customary Charges.",
+    "Pre-existing diseases are covered after a waiting period of thirty-six months.",
+    "Does the policy cover maternity expenses, and what are the conditions?",
+    "Room rent is capped at 1% of the Sum Insured per day for Plan A.",
+    "Cataract surgery has a waiting period of two years.",
+    "A hospital means an institution with at least 10 inpatient beds.",
+    "The No Claim Discount is 5% on the base premium at renewal.",
+]
+
+_resources = {}
+_timings = {}
+_lock = threading.RLock()
+
+def _get_or_create(name: str, factory):
+    """Return resource name, creating it with factory() on first use."""
+    resource = _resources.get(name)
+    if resource is not None:
+        return resource
+    with _lock:
+        if name not in _resources:
+            start = time.perf_counter()
+            _resources[name] = factory()
+            _timings[name] = time.perf_counter() - start
+            logger.info(f"Initialized {name} in {_timings[name]:.2f}s")
+        return _resources[name]
+
+def reset(name: str = None):
+    """
+    Drop one resource (or all) so the next call creates it again.
+
+    A dropped encoding pool is closed, so its worker processes (each with a
+    copy of the model) do not outlive it.
+    """
+    with _lock:
+        if name is None:
+            dropped = dict(_resources)
+            _resources.clear()
+        else:
+            dropped = {name: _resources.pop(name, None)}
+    pool = dropped.get("encoding_pool")
+    if pool is not None:
+        pool.close()
+
+def _default_onnx_file(machine: str = None, cpu_flags: str = None) -> str:
+    """The int8 export shipped with all-MiniLM-L6-v2 that suits this CPU."""
+    import platform
+
+    machine = (machine or platform.machine()).lower()
+    if machine in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    if cpu_flags is None:
+        try:
+            with open("/proc/cpuinfo", "r") as f:
+                cpu_flags = f.read()
+        except OSError:
+            cpu_flags = ""
+    flags = set(cpu_flags.split())
+    if "avx512_vnni" in flags:
+        return "onnx/model_qint8_avx512_vnni.onnx"
+    if "avx512f" in flags:
+        return "onnx/model_qint8_avx512.onnx"
+    return "onnx/model_quint8_avx2.onnx"
+
+def load_embedding_model(backend: str = EMBEDDING_BACKEND, threads: int = EMBEDDING_THREADS):
+    """
+    Load EMBEDDING_MODEL_NAME with the given backend ("torch" or "onnx").
+
+    Both return a SentenceTransformer, so encode() and the 384-dim output
+    are the same for callers.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        model = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu")
+    elif backend == "onnx":
+        model_kwargs = {"file_name": EMBEDDING_ONNX_FILE or _default_onnx_file(), "provider": "CPUExecutionProvider"}
+        if threads:
+            import onnxruntime
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = threads
+            model_kwargs["session_options"] = session_options
+        model = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+    else:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}, expected 'torch' or 'onnx'")
+
+    dimension = model.get_sentence_embedding_dimension()
+    if dimension != EMBEDDING_DIMENSION:
+        raise ValueError(f"Dimension mismatch: {EMBEDDING_MODEL_NAME} produces {dimension}, expected {EMBEDDING_DIMENSION}")
+    return model
+
+def embedding_agreement(model, reference, texts: list = AGREEMENT_SENTENCES) -> dict:
+    """Min and mean cosine similarity between model's and reference's embeddings of texts."""
+    import numpy as np
+
+    ours = np.asarray(model.encode(texts, convert_to_numpy=True), dtype=np.float32)
+    theirs = np.asarray(reference.encode(texts, convert_to_numpy=True), dtype=np.float32)
+    cosines = np.sum(ours * theirs, axis=1) / (np.linalg.norm(ours, axis=1) * np.linalg.norm(theirs, axis=1))
+    return {"min_cosine": float(cosines.min()), "mean_cosine": float(cosines.mean())}
+
+def embedding_model_key() -> str:
+    """Name of the active model for cache keys: quantized embeddings differ slightly from the reference."""
+    if EMBEDDING_BACKEND == "torch":
+        return EMBEDDING_MODEL_NAME
+    return f"{EMBEDDING_MODEL_NAME}:{EMBEDDING_BACKEND}:{EMBEDDING_ONNX_FILE or _default_onnx_file()}"
+
+def _create_model():
+    model = load_embedding_model()
+    if EMBEDDING_BACKEND != "torch" and EMBEDDING_VERIFY_BACKEND:
+        agreement = embedding_agreement(model, load_embedding_model("torch"))
+        logger.info(f"{EMBEDDING_BACKEND} backend agreement with reference: {agreement}")
+        if agreement["min_cosine"] < EMBEDDING_MIN_COSINE:
+            raise ValueError(f"{EMBEDDING_BACKEND} embeddings diverge from {EMBEDDING_MODEL_NAME}: "
+                             f"min cosine {agreement['min_cosine']:.4f} < {EMBEDDING_MIN_COSINE}")
+    return model
+
+def _create_client():
+    from pinecone import Pinecone
+
+    api_key = os.environ.get("PINECONE_API_KEY")
+    if not api_key or not os.environ.get("PINECONE_ENV"):
+        raise ValueError("PINECONE_API_KEY or PINECONE_ENV not set in .env")
+    return Pinecone(api_key=api_key)
+
+def _create_index():
+    """Open the index, creating it with EMBEDDING_DIMENSION if it does not exist yet."""
+    from pinecone import ServerlessSpec
+
+    pc = get_client()
+    if INDEX_NAME not in pc.list_indexes().names():
+        print(f"Creating new index '{INDEX_NAME}' with {EMBEDDING_DIMENSION} dimensions...")
+        pc.create_index(
+            name=INDEX_NAME,
+            dimension=EMBEDDING_DIMENSION,
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region="us-east-1")
+        )
+        print("✅ Index created successfully!")
+    else:
+        existing_dimension = pc.describe_index(INDEX_NAME).dimension
+        print(f"📊 Existing index '{INDEX_NAME}' has {existing_dimension} dimensions")
+        if existing_dimension != EMBEDDING_DIMENSION:
+            print("⚠️  DIMENSION MISMATCH!")
+            print(f"   Index dimension: {existing_dimension}")
+            print(f"   Model dimension: {EMBEDDING_DIMENSION} ({EMBEDDING_MODEL_NAME})")
+            print(f"   Either delete and recreate the index, or use a model with {existing_dimension} dimensions")
+            raise ValueError(f"Dimension mismatch: index={existing_dimension}, model={EMBEDDING_DIMENSION}")
+
+    return pc.Index(INDEX_NAME)
+
+def _create_vector_store():
+    if VECTOR_STORE == "faiss":
+        from src.pipeline.faiss_store import FaissVectorStore
+
+        return FaissVectorStore(dimension=EMBEDDING_DIMENSION)
+    if VECTOR_STORE != "pinecone":
+        raise ValueError(f"Unknown VECTOR_STORE {VECTOR_STORE!r}, expected 'pinecone' or 'faiss'")
+    return PineconeVectorStore(get_index())
+
+def get_model():
+    """The shared SentenceTransformer, on the EMBEDDING_BACKEND runtime."""
+    return _get_or_create("model", _create_model)
+
+def get_client():
+    """The shared Pinecone client."""
+    return _get_or_create("client", _create_client)
+
+def get_index():
+    """The shared handle to the Pinecone index, checked against EMBEDDING_DIMENSION."""
+    return _get_or_create("index", _create_index)
+
+def get_encoding_pool():
+    """The shared pool of ENCODE_PROCESSES encoding worker processes."""
+    from src.pipeline.encoding_scheduler import EncodingPool, ENCODE_PROCESSES
+
+    return _get_or_create("encoding_pool", lambda: EncodingPool(ENCODE_PROCESSES))
+
+def get_vector_store():
+    """The shared VectorStore selected by VECTOR_STORE."""
+    return _get_or_create("vector_store", _create_vector_store)
+
+def warm_up() -> dict:
+    """
+    Create every resource now instead of on the first request.
+
+    Returns startup_report().
+    """
+    start = time.perf_counter()
+    get_model()
+    get_vector_store()
+    report = startup_report()
+    print(f"🔥 Warm-up finished in {time.perf_counter() - start:.2f}s: " +
+          ", ".join(f"{name} {seconds:.2f}s" for name, seconds in report["seconds"].items()))
+    return report
+
+def startup_report() -> dict:
+    """Which resources are loaded and how long each took to create."""
+    return {
+        "loaded": sorted(_resources),
+        "seconds": {name: round(seconds, 3) for name, seconds in _timings.items()}
+    }
@@ -1,100 +1,113 @@
-import os
-from dotenv import load_dotenv
-from pinecone import Pinecone
-from sentence_transformers import SentenceTransformer
+from src.pipeline.chunk_store import chunk_store, CHUNK_STORE_ENABLED
+from src.pipeline.query_cache import query_cache, QUERY_CACHE_ENABLED
+from src.pipeline.resources import get_client, get_index, get_model, get_vector_store, embedding_model_key, INDEX_NAME
 
-# Load environment variables
-load_dotenv()
-pinecone_api_key = os.environ.get("PINECONE_API_KEY")
-pinecone_env = os.environ.get("PINECONE_ENV")
-index_name = "hackrx"
+# Same model and index handle as the embedder, created on first use
+index_name = INDEX_NAME
+_SHARED_RESOURCES = {"pc": get_client, "index": get_index, "model": get_model}
 
-if not pinecone_api_key or not pinecone_env:
-    raise ValueError("PINECONE_API_KEY or PINECONE_ENV not set in .env")
+def __getattr__(name):
+    if name in _SHARED_RESOURCES:
+        return _SHARED_RESOURCES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Initialize Pinecone
-pc = Pinecone(api_key=pinecone_api_key)
-index = pc.Index(index_name)
-
-# Load embedding model (must match embedder.py)
-model = SentenceTransformer("all-MiniLM-L6-v2")
+def hydrate_matches(matches: list) -> list:
+    """
+    Attach chunk texts to vector store matches, reading all of them from
+    the chunk store in one query. Vectors stored with the text in their
+    metadata (before the chunk store, or with it disabled) still work; with
+    CHUNK_STORE_ENABLED off the chunk store is not read at all, so rows left
+    by an earlier run cannot shadow the text in the metadata.
+    """
+    texts = chunk_store.get_many([match["id"] for match in matches]) if matches and CHUNK_STORE_ENABLED else {}
+    return [
+        {
+            "score": match["score"],
+            "text": texts.get(match["id"]) or match["metadata"].get("text", "N/A"),
+            "metadata": match["metadata"]
+        }
+        for match in matches
+    ]
 
-def retrieve_similar_chunks(query: str, top_k: int = 5):
+def retrieve_similar_chunks(query: str, top_k: int = 5, doc_id: str = None):
     """
-    Given a user query, retrieve top_k most relevant text chunks from Pinecone.
+    Given a user query, retrieve top_k most relevant text chunks from the vector store.
     Fixed: Removed namespace parameter and improved error handling
     Returns a list of dicts with 'text' and 'metadata'.
+    Pass doc_id to search only one document's chunks (see retrieve_batch).
+    Repeated queries are served from the query cache (see retrieve_batch).
     """
-    try:
-        # Embed query
-        query_embedding = model.encode(query).tolist()
-
-        # Query Pinecone index
-        result = index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True
-        )
-
-        # Process results
-        retrieved = []
-        for match in result["matches"]:
-            chunk_data = {
-                "score": match["score"],
-                "text": match["metadata"].get("text", "N/A"),
-                "metadata": match["metadata"]
-            }
-            retrieved.append(chunk_data)
-
-        return retrieved
-    
-    except Exception as e:
-        print(f"Error retrieving chunks: {e}")
-        return []
+    return retrieve_batch([query], top_k=top_k, doc_id=doc_id)[0]
 
-def retrieve_with_filter(query: str, source_filter: str = None, top_k: int = 5):
+def retrieve_with_filter(query: str, source_filter: str = None, top_k: int = 5, doc_id: str = None):
     """
-    Retrieve chunks with optional source filtering
+    Retrieve chunks with optional source and document filtering
     """
+    return retrieve_batch([query], top_k=top_k, source_filter=source_filter, doc_id=doc_id)[0]
+
+def scope_filter(source_filter: str = None, doc_id: str = None) -> dict:
+    """Metadata filter restricting a query to a source and/or a document scope (None for none)."""
+    conditions = {}
+    if source_filter:
+        conditions["source"] = {"$eq": source_filter}
+    if doc_id:
+        conditions["doc_id"] = {"$eq": doc_id}
+    return conditions or None
+
+def retrieve_batch(questions: list, top_k: int = 5, source_filter: str = None, model=None, store=None, cache=None, doc_id: str = None) -> list:
+    """
+    Retrieve chunks for several questions at once.
+
+    All questions are embedded in a single encode call, the vector queries
+    run concurrently (store.query_many, at most QUERY_WORKERS in flight)
+    and every match's text is read from the chunk store in one query.
+    Returns one list of chunks (as from retrieve_similar_chunks) per
+    question, in question order; a question whose query fails gets [].
+
+    cache is a QueryCache for embeddings and results. It defaults to the
+    shared query_cache with the shared model and vector store (unless
+    QUERY_CACHE_ENABLED is off) and to no cache with any other.
+
+    doc_id limits the search to the chunks of one ingested document (the
+    "doc_id" metadata process_file stamps on them), so results cannot come
+    from other documents and the query cost follows the document's size
+    rather than the whole index's.
+    """
+    if not questions:
+        return []
+    if cache is None and model is None and store is None and QUERY_CACHE_ENABLED:
+        cache = query_cache
+    filter_dict = scope_filter(source_filter, doc_id)
+
     try:
-        query_embedding = model.encode(query).tolist()
-        
-        # Build filter if provided
-        filter_dict = {}
-        if source_filter:
-            filter_dict = {"source": {"$eq": source_filter}}
-        
-        result = index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True,
-            filter=filter_dict if filter_dict else None
-        )
-        
-        retrieved = []
-        for match in result["matches"]:
-            chunk_data = {
-                "score": match["score"],
-                "text": match["metadata"].get("text", "N/A"),
-                "metadata": match["metadata"]
-            }
-            retrieved.append(chunk_data)
-            
-        return retrieved
-    
+        model = model if model is not None else get_model()
+        store = store if store is not None else get_vector_store()
+        if cache is not None:
+            embeddings = cache.encode(model, embedding_model_key(), list(questions))
+            keys = [cache.result_key(embedding, filter_dict, top_k) for embedding in embeddings]
+            results = [cache.get_results(key) for key in keys]
+        else:
+            embeddings = model.encode(list(questions), batch_size=len(questions), convert_to_numpy=True)
+            results = [None] * len(questions)
+
+        todo = [i for i, result in enumerate(results) if result is None]
+        if todo:
+            matches = store.query_many([embeddings[i].tolist() for i in todo], top_k=top_k, filter=filter_dict)
+            # Hydrate everything together, then split back per question
+            hydrated = iter(hydrate_matches([match for question_matches in matches for match in question_matches]))
+            for i, question_matches in zip(todo, matches):
+                results[i] = [next(hydrated) for _ in question_matches]
+                if cache is not None and results[i]:  # Empty may be a failed query; do not keep it
+                    cache.put_results(keys[i], results[i])
+        return results
     except Exception as e:
-        print(f"Error retrieving chunks with filter: {e}")
-        return []
+        print(f"Error retrieving chunks for {len(questions)} questions: {e}")
+        return [[] for _ in questions]
 
 def get_index_stats():
-    """Get statistics about the Pinecone index"""
+    """Get statistics about the vector index"""
     try:
-        stats = index.describe_index_stats()
-        return {
-            "total_vectors": stats.get("total_vector_count", 0),
-            "dimension": stats.get("dimension", 0),
-            "index_fullness": stats.get("index_fullness", 0)
-        }
+        return get_vector_store().stats()
     except Exception as e:
         print(f"Error getting index stats: {e}")
         return {"error": str(e)}
@@ -102,7 +115,12 @@ def get_index_stats():
 def delete_all_vectors():
     """Delete all vectors from the index (use with caution!)"""
     try:
-        index.delete(delete_all=True)
+        store = get_vector_store()
+        store.delete(delete_all=True)
+        store.flush()
+        if CHUNK_STORE_ENABLED:
+            chunk_store.clear()
+        query_cache.invalidate()
         print("✅ All vectors deleted from index")
         return True
     except Exception as e:
@@ -112,9 +130,31 @@ def delete_all_vectors():
 def delete_by_source(source_name: str):
     """Delete all vectors from a specific source"""
     try:
-        index.delete(filter={"source": {"$eq": source_name}})
+        store = get_vector_store()
+        store.delete(filter={"source": {"$eq": source_name}})
+        store.flush()
+        if CHUNK_STORE_ENABLED:
+            chunk_store.delete_source(source_name)
+        query_cache.invalidate(source_name)
         print(f"✅ All vectors from source '{source_name}' deleted")
         return True
     except Exception as e:
         print(f"Error deleting vectors from source {source_name}: {e}")
-        return False
\ No newline at end of file
+        return False
+
+def delete_by_document(doc_id: str):
+    """Delete all vectors of one document scope (see process_file)"""
+    try:
+        store = get_vector_store()
+        ids = list(store.list_ids(prefix=f"{doc_id}-"))  # Scoped chunk ids start with the doc_id
+        if ids:
+            store.delete(ids=ids)
+            store.flush()
+            if CHUNK_STORE_ENABLED:
+                chunk_store.delete_ids(ids)
+        query_cache.invalidate(doc_id=doc_id)
+        print(f"✅ All vectors of document '{doc_id}' deleted")
+        return True
+    except Exception as e:
+        print(f"Error deleting vectors of document {doc_id}: {e}")
+        return False
@@ -1,15 +1,74 @@
 import os
 from dotenv import load_dotenv
-from src.pipeline.document_loader import load_and_clean
-from src.pipeline.splitter import chunk_text, smart_chunk_text
-from src.pipeline.embedder import embed_and_store
-from src.pipeline.retriever import retrieve_similar_chunks
+from src.pipeline.document_loader import load_and_clean, iter_pages, EXTRACTOR_VERSION
+from src.pipeline.splitter import (
+    chunk_text, stream_smart_chunks, content_defined_chunk_table, ENCODER_NAME,
+    DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP, CDC_MIN_TOKENS, CDC_TARGET_TOKENS, CDC_MAX_TOKENS
+)
+from src.pipeline.embedder import embed_and_store, delete_stale_chunks, attach_duplicates
+from src.pipeline.deduplicator import ChunkDeduplicator, DEDUP_ENABLED, DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_BANDS
+from src.pipeline.resources import embedding_model_key
+from src.pipeline.retriever import retrieve_batch
 from src.pipeline.formatter import format_context_and_query
+import hashlib
 import re
+import time
 from collections import Counter
 
 load_dotenv()
 
+# "smart" packs paragraphs; "content" uses content-defined boundaries so a
+# re-uploaded, edited document only re-embeds the chunks that changed
+CHUNKING_MODE = os.environ.get("CHUNKING_MODE", "smart")
+# Give each uploaded document its own scope in the shared index (ids and a
+# "doc_id" metadata field keyed by the file's hash), and answer its
+# questions from that scope only
+DOCUMENT_SCOPING = os.environ.get("DOCUMENT_SCOPING", "1") != "0"
+
+def ingest_settings() -> str:
+    """
+    Everything besides a file's bytes that decides the chunks stored for
+    it: extractor version, chunking mode and sizes, dedup and the
+    embedding model.
+    """
+    if CHUNKING_MODE == "content":
+        chunking = f"content:{CDC_MIN_TOKENS}:{CDC_TARGET_TOKENS}:{CDC_MAX_TOKENS}"
+    else:
+        chunking = f"smart:{DEFAULT_CHUNK_SIZE}:{DEFAULT_CHUNK_OVERLAP}"
+    dedup = f"dedup:{DEDUP_THRESHOLD}:{DEDUP_NUM_PERM}:{DEDUP_BANDS}" if DEDUP_ENABLED else "no-dedup"
+    return "|".join([EXTRACTOR_VERSION, ENCODER_NAME, chunking, dedup, embedding_model_key()])
+
+def document_id(file_bytes: bytes, settings: str = None) -> str:
+    """
+    Scope key of a document: the first 16 hex digits of the SHA-256 of its
+    bytes and the ingest_settings().
+    
+    Stored chunks are skipped by id, and chunk ids are positional, so a
+    re-upload after a settings change must land in a new scope; otherwise
+    it would keep the old texts and vectors and orphan chunks past the new
+    count.
+    """
+    settings = ingest_settings() if settings is None else settings
+    digest = hashlib.sha256(file_bytes)
+    digest.update(b"\0" + settings.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def scope_chunks(chunks, doc_id: str):
+    """
+    Put chunks in the document's scope: their ids become doc_id plus the
+    chunk's position (or content hash) without the file name, and doc_id is
+    added to their metadata for filtered retrieval. Files with the same name
+    from different uploads do not overwrite each other, and the same bytes
+    uploaded under another name map to the same ids instead of being stored
+    twice in the scope.
+    """
+    for chunk in chunks:
+        prefix = f"{chunk['metadata']['source']}-"
+        local_id = chunk["id"][len(prefix):] if chunk["id"].startswith(prefix) else chunk["id"]
+        chunk["id"] = f"{doc_id}-{local_id}"
+        chunk["metadata"]["doc_id"] = doc_id
+        yield chunk
+
 def process_file(file_bytes: bytes, filename: str, questions: list = None):
     """
     Process a file and return answers to questions.
@@ -20,45 +79,32 @@ def process_file(file_bytes: bytes, filename: str, questions: list = None):
     
     try:
         print(f"📄 Processing file: {filename}")
+        doc_id = document_id(file_bytes) if DOCUMENT_SCOPING else None
         
-        # Step 1: Load and clean document
-        print("📖 Extracting text from document...")
-        document = load_and_clean(file_bytes, filename)
-        
-        if not document or not document.strip():
-            raise ValueError("No text could be extracted from the document")
-        
-        print(f"✅ Extracted {len(document)} characters")
-        
-        # Step 2: Chunk the document
-        print("🔪 Chunking document...")
-        # Use smart chunking for better results
-        chunks = smart_chunk_text(document, source_filename=filename)
+        # Steps 1-3: extract, chunk, embed and store in Pinecone
+        if CHUNKING_MODE == "content":
+            stats = _ingest_document(file_bytes, filename, doc_id)
+        else:
+            stats = _ingest_streaming(file_bytes, filename, doc_id)
         
-        if not chunks:
-            raise ValueError("No chunks generated from document. Document might be too short or empty.")
+        # Step 4: Retrieve chunks for all questions at once (one encode call, concurrent queries),
+        # searching only this document's vectors
+        retrieve_start = time.perf_counter()
+        all_results = retrieve_batch(questions, top_k=5, doc_id=doc_id)
+        print(f"🔎 Retrieved chunks for {len(questions)} questions in {time.perf_counter() - retrieve_start:.2f}s")
         
-        print(f"✅ Created {len(chunks)} chunks")
-        
-        # Step 3: Embed and store in Pinecone
-        print("🧠 Embedding and storing chunks...")
-        embed_and_store(chunks)
-        
-        # Step 4: Process each question
+        # Step 5: Answer each question
         answers = []
-        for i, question in enumerate(questions):
+        for i, (question, results) in enumerate(zip(questions, all_results)):
             print(f"❓ Processing question {i+1}/{len(questions)}: {question}")
             
-            # Retrieve relevant chunks
-            results = retrieve_similar_chunks(question, top_k=5)
-            
             if not results:
                 print(f"⚠️ No relevant chunks found for question: {question}")
                 answers.append("I couldn't find relevant information to answer this question.")
                 continue
             
             # Generate answer from context
-            answer = generate_improved_answer(results, question, document)
+            answer = generate_improved_answer(results, question)
             answers.append(answer)
             
             print(f"✅ Generated answer for question {i+1}")
@@ -68,9 +114,9 @@ def process_file(file_bytes: bytes, filename: str, questions: list = None):
             "answers": answers,
             "metadata": {
                 "filename": filename,
-                "chunks_created": len(chunks),
-                "questions_processed": len(questions),
-                "document_length": len(document)
+                "doc_id": doc_id,
+                **stats,
+                "questions_processed": len(questions)
             }
         }
 
@@ -82,6 +128,127 @@ def process_file(file_bytes: bytes, filename: str, questions: list = None):
             "answers": []
         }
 
+def _ingest_document(file_bytes: bytes, filename: str, doc_id: str = None) -> dict:
+    """
+    Extract the whole document, then chunk, deduplicate and embed it.
+    
+    Chunks are kept as a ChunkTable of offsets into the document; their
+    dicts are only built as embedding consumes them, one batch at a time.
+    
+    With a doc_id, an identical re-upload finds all its chunks stored and
+    embeds nothing; an edited one is a new scope, so earlier versions are
+    kept for their own uploads instead of being deleted as stale (unchanged
+    chunks still come from the embedding cache).
+    """
+    # Step 1: Load and clean document
+    print("📖 Extracting text from document...")
+    document = load_and_clean(file_bytes, filename)
+    
+    if not document or not document.strip():
+        raise ValueError("No text could be extracted from the document")
+    
+    print(f"✅ Extracted {len(document)} characters")
+    
+    # Step 2: Chunk the document
+    print("🔪 Chunking document...")
+    table = content_defined_chunk_table(document, source_filename=filename)
+    
+    if not len(table):
+        raise ValueError("No chunks generated from document. Document might be too short or empty.")
+    
+    print(f"✅ Created {len(table)} chunks ({table.nbytes()} bytes of offsets)")
+    
+    chunks = iter(table)
+    if doc_id:
+        chunks = scope_chunks(chunks, doc_id)
+    deduplicator = None
+    if DEDUP_ENABLED:
+        # Drop repeated headers, footers and disclaimers before paying to embed them
+        deduplicator = ChunkDeduplicator()
+        chunks = deduplicator.filter(chunks)
+    kept_ids = []
+    
+    def kept(chunks):
+        for chunk in chunks:
+            kept_ids.append(chunk["id"])
+            yield chunk
+    
+    # Step 3: Embed and store in Pinecone
+    print("🧠 Embedding and storing chunks...")
+    embed_start = time.perf_counter()
+    embed_and_store(kept(chunks), skip_existing=True)
+    if not doc_id:
+        delete_stale_chunks(filename, kept_ids)
+    stats = {"chunks_created": len(table), "chunks_embedded": len(kept_ids), "document_length": len(document)}
+    if deduplicator:
+        _record_dedup(deduplicator, stats, time.perf_counter() - embed_start)
+    
+    return stats
+
+def _ingest_streaming(file_bytes: bytes, filename: str, doc_id: str = None) -> dict:
+    """
+    Extract, chunk and embed page by page.
+    
+    iter_pages feeds stream_smart_chunks, whose chunks go straight into the
+    pipelined embed_and_store_stream, so embedding and upserts start while
+    later pages are still being extracted and memory does not grow with the
+    document. With a doc_id, chunks already stored are skipped a batch at a
+    time, so an identical re-upload embeds nothing and keeps the cached
+    query results of its scope.
+    """
+    print("📖 Streaming pages from document...")
+    stats = {"chunks_created": 0, "chunks_embedded": 0, "document_length": 0}
+    
+    def page_texts():
+        for record in iter_pages(file_bytes, filename):
+            stats["document_length"] = record["end_char"]
+            yield record["text"]
+    
+    def counted(chunks):
+        for chunk in chunks:
+            stats["chunks_created"] += 1
+            yield chunk
+    
+    chunks = counted(stream_smart_chunks(page_texts(), source_filename=filename))
+    if doc_id:
+        chunks = scope_chunks(chunks, doc_id)
+    deduplicator = None
+    if DEDUP_ENABLED:
+        # Drop repeated headers, footers and disclaimers before paying to embed them
+        deduplicator = ChunkDeduplicator()
+        chunks = deduplicator.filter(chunks)
+    
+    print("🧠 Embedding and storing chunks as pages arrive...")
+    # Scoped ids name this document's chunks, so a re-upload embeds (and invalidates) nothing
+    embed_stats = embed_and_store(chunks, skip_existing=bool(doc_id)) or {"chunks": 0, "encode_seconds": 0.0}
+    stats["chunks_embedded"] = embed_stats["chunks"]
+    
+    if not stats["chunks_created"]:
+        raise ValueError("No chunks generated from document. Document might be too short or empty.")
+    
+    print(f"✅ Extracted {stats['document_length']} characters into {stats['chunks_created']} chunks")
+    if deduplicator:
+        _record_dedup(deduplicator, stats, embed_stats["encode_seconds"])
+    
+    return stats
+
+def _record_dedup(deduplicator: ChunkDeduplicator, stats: dict, embed_seconds: float):
+    """
+    Keep the provenance of every dropped duplicate on the chunk it repeats
+    (metadata "occurrences" and "duplicates"), and report the savings.
+    """
+    dedup_report = deduplicator.report()
+    attach_duplicates(deduplicator.provenance())
+    stats["chunks_deduplicated"] = dedup_report["removed_chunks"]
+    print(f"🧹 Removed {dedup_report['removed_chunks']} near-duplicate chunks, {dedup_report['kept_chunks']} left ({dedup_report['seconds']:.2f}s)")
+    _print_dedup_savings(dedup_report, embed_seconds)
+
+def _print_dedup_savings(dedup_report, embed_seconds: float):
+    """Estimate the embedding time dedup saved from the measured per-chunk cost."""
+    if dedup_report and dedup_report["removed_chunks"] and dedup_report["kept_chunks"]:
+        saved = embed_seconds / dedup_report["kept_chunks"] * dedup_report["removed_chunks"]
+        print(f"⏱️  Dedup saved ~{saved:.1f}s of {embed_seconds + saved:.1f}s embedding time")
+
 def generate_improved_answer(retrieved_chunks, question, full_document=None):
     """
     Generate a comprehensive answer based on retrieved context and question analysis.
@@ -1,13 +1,149 @@
 import tiktoken
-from typing import List, Dict
+import regex
+from array import array
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List
 import hashlib
+import math
 
 ENCODER_NAME = "cl100k_base" 
 DEFAULT_CHUNK_SIZE = 400
 DEFAULT_CHUNK_OVERLAP = 50
 
+# Content-defined chunking: boundaries fall where a rolling hash of the last
+# ~64 tokens matches a mask, so they move with the content, not with offsets
+CDC_MIN_TOKENS = 200
+CDC_TARGET_TOKENS = 400
+CDC_MAX_TOKENS = 600
+CDC_HASH_HEX_CHARS = 16  # At most 16, so a hash fits a ChunkTable's 64-bit digest column
+
+PARAGRAPH_SEPARATOR = "\n\n"
+# Paragraphs handed to encode_batch at a time
+ENCODE_BATCH_SIZE = 256
+
+# Trailing run of characters that cl100k_base's pre-tokenizer glues to following newlines
+_TRAILING_PUNCTUATION = regex.compile(r"[^\s\p{L}\p{N}]+\Z")
+
+@lru_cache(maxsize=None)
+def get_encoder(model: str = ENCODER_NAME):
+    """Return the tiktoken encoder for model, created once per process."""
+    return tiktoken.get_encoding(model)
+
+class ChunkTable:
+    """
+    Compact, column-oriented list of chunks over a single source text.
+    
+    Instead of one dict (plus a nested metadata dict and a copy of the text)
+    per chunk, each chunk is a row of character and token offsets in typed
+    arrays, all pointing into one shared source string. Chunk text is only
+    sliced out when text() or one of the dict converters asks for it.
+    
+    Token offsets are positions in the token stream of the text the chunker
+    worked on; character offsets index into source.
+    
+    Tables built with content_ids (content_defined_chunk_table) also keep
+    each chunk's content hash and repeat number, and name chunks
+    "{source_filename}-{hash}" like content_defined_chunk_text. Iterating
+    a table yields chunk dicts one at a time, so it can be handed straight
+    to embed_and_store_stream.
+    """
+    
+    # How text(i) turns the source slice into the chunk text
+    EXACT = 0        # The slice is the chunk text
+    STRIP = 1        # Strip surrounding whitespace (token windows)
+    PARAGRAPHS = 2   # Re-join stripped paragraphs with PARAGRAPH_SEPARATOR
+    
+    __slots__ = ("source", "source_filename", "char_start", "char_end", "token_start", "token_end", "flags", "digests", "repeats")
+    
+    def __init__(self, source: str, source_filename: str = "unknown", content_ids: bool = False):
+        self.source = source
+        self.source_filename = source_filename
+        self.char_start = array("q")
+        self.char_end = array("q")
+        self.token_start = array("q")
+        self.token_end = array("q")
+        self.flags = array("B")
+        self.digests = array("Q") if content_ids else None
+        self.repeats = array("I") if content_ids else None
+    
+    def append(self, char_start: int, char_end: int, token_start: int, token_end: int, flag: int = EXACT, digest: int = 0, repeat: int = 0):
+        self.char_start.append(char_start)
+        self.char_end.append(char_end)
+        self.token_start.append(token_start)
+        self.token_end.append(token_end)
+        self.flags.append(flag)
+        if self.digests is not None:
+            self.digests.append(digest)
+            self.repeats.append(repeat)
+    
+    def __len__(self) -> int:
+        return len(self.flags)
+    
+    def text(self, i: int) -> str:
+        """Materialize the text of chunk i."""
+        text = self.source[self.char_start[i]:self.char_end[i]]
+        flag = self.flags[i]
+        if flag == ChunkTable.STRIP:
+            return text.strip()
+        if flag == ChunkTable.PARAGRAPHS:
+            paragraphs = (paragraph.strip() for paragraph in text.split(PARAGRAPH_SEPARATOR))
+            return PARAGRAPH_SEPARATOR.join(paragraph for paragraph in paragraphs if paragraph)
+        return text
+    
+    def token_count(self, i: int) -> int:
+        return self.token_end[i] - self.token_start[i]
+    
+    def content_hash(self, i: int) -> str:
+        """Hex content hash of chunk i (tables with content_ids only)."""
+        return f"{self.digests[i]:0{CDC_HASH_HEX_CHARS}x}"
+    
+    def chunk_id(self, i: int) -> str:
+        if self.digests is None:
+            return f"{self.source_filename}-chunk-{i}"
+        repeat = self.repeats[i]
+        suffix = f"-{repeat}" if repeat else ""
+        return f"{self.source_filename}-{self.content_hash(i)}{suffix}"
+    
+    def to_dict(self, i: int) -> Dict[str, any]:
+        """Chunk i in the dict format embed_and_store expects."""
+        chunk = {
+            "id": self.chunk_id(i),
+            "text": self.text(i),
+            "metadata": {
+                "source": self.source_filename,
+                "chunk_index": i,
+                "start_token": self.token_start[i],
+                "end_token": self.token_end[i],
+                "token_count": self.token_count(i),
+                "start_char": self.char_start[i],
+                "end_char": self.char_end[i]
+            }
+        }
+        if self.digests is not None:
+            chunk["metadata"]["content_hash"] = self.content_hash(i)
+        return chunk
+    
+    def iter_dicts(self, start: int = 0, stop: int = None):
+        """Yield chunk dicts one at a time, e.g. to feed embedding batches."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for i in range(start, stop):
+            yield self.to_dict(i)
+    
+    __iter__ = iter_dicts
+    
+    def to_dicts(self) -> List[Dict[str, any]]:
+        return list(self.iter_dicts())
+    
+    def nbytes(self) -> int:
+        """Memory used by the offset arrays (the source text is shared, not counted)."""
+        columns = [self.char_start, self.char_end, self.token_start, self.token_end, self.flags]
+        if self.digests is not None:
+            columns += [self.digests, self.repeats]
+        return sum(column.itemsize * len(column) for column in columns)
+
 def num_tokens(text: str, model: str = ENCODER_NAME) -> int:
-    encoding = tiktoken.get_encoding(model)
+    encoding = get_encoder(model)
     return len(encoding.encode(text))
 
 def chunk_text(
@@ -23,9 +159,18 @@ def chunk_text(
     if not text or not text.strip():
         return []
     
-    encoding = tiktoken.get_encoding(model)
+    encoding = get_encoder(model)
     tokens = encoding.encode(text)
-    
+    return _chunk_tokens(tokens, encoding, chunk_size, chunk_overlap, source_filename)
+
+def _chunk_tokens(
+    tokens: List[int],
+    encoding,
+    chunk_size: int,
+    chunk_overlap: int,
+    source_filename: str
+) -> List[Dict[str, any]]:
+    """Split an already encoded token list into fixed-size overlapping windows."""
     if len(tokens) == 0:
         return []
 
@@ -70,68 +215,362 @@ def smart_chunk_text(
 ) -> List[Dict[str, any]]:
     """
     Advanced chunking that tries to respect sentence boundaries
+    
+    Each paragraph is encoded exactly once (in batches) and chunk sizes are
+    tracked as running token counts, so the cost is linear in the document
+    length instead of re-encoding the growing chunk for every paragraph.
+    The chunks are identical to encoding every candidate chunk in full.
     """
     if not text or not text.strip():
         return []
     
-    # First, try to split by paragraphs
-    paragraphs = text.split('\n\n')
-    chunks = []
-    current_chunk = ""
+    return list(stream_smart_chunks([text], chunk_size, chunk_overlap, source_filename))
+
+def stream_smart_chunks(
+    segments: Iterable[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    source_filename: str = "unknown",
+    separator: str = PARAGRAPH_SEPARATOR
+) -> Iterator[Dict[str, any]]:
+    """
+    Streaming smart_chunk_text over an iterable of text segments.
+    
+    Segments (e.g. the 'text' of document_loader.iter_pages records) are
+    treated as one document joined by separator, and the chunks yielded are
+    exactly those smart_chunk_text would return for that joined text. A
+    paragraph cut by a segment boundary is carried over and completed by the
+    next segment (pass separator="" for raw blocks of a longer text), and
+    a chunk is yielded as soon as the next paragraph no longer fits into it.
+    Only the unfinished chunk and the current segment are held in memory.
+    """
+    encoding = get_encoder(ENCODER_NAME)
+    pending = deque()  # Paragraphs read but not yet emitted in a chunk
     chunk_index = 0
     
-    encoding = tiktoken.get_encoding(ENCODER_NAME)
+    def encoded():
+        for paragraphs in _stream_paragraphs(segments, separator):
+            pending.extend(paragraphs)
+            yield from _encode_paragraphs(paragraphs, encoding)
     
-    for paragraph in paragraphs:
-        paragraph = paragraph.strip()
-        if not paragraph:
+    for first, last, _, token_count, tokens in _pack_paragraphs(encoded(), chunk_size):
+        # The packer covers paragraphs in order, so pending starts at `first`
+        paragraphs = [pending.popleft() for _ in range(last - first + 1)]
+        if tokens is None:
+            yield {
+                "id": f"{source_filename}-chunk-{chunk_index}",
+                "text": PARAGRAPH_SEPARATOR.join(paragraphs),
+                "metadata": {
+                    "source": source_filename,
+                    "chunk_index": chunk_index,
+                    "token_count": token_count
+                }
+            }
+            chunk_index += 1
+        else:
+            # Paragraph is too long, split it using token-based chunking
+            para_chunks = _chunk_tokens(tokens, encoding, chunk_size, chunk_overlap, source_filename)
+            for para_chunk in para_chunks:
+                para_chunk["id"] = f"{source_filename}-chunk-{chunk_index}"
+                para_chunk["metadata"]["chunk_index"] = chunk_index
+                yield para_chunk
+                chunk_index += 1
+
+def _stream_paragraphs(segments: Iterable[str], separator: str):
+    """
+    Yield, per segment, the list of stripped non-empty paragraphs it completes.
+    
+    Text after the last PARAGRAPH_SEPARATOR of a segment may continue in the
+    next one, so it is carried over; the final carry is flushed at the end.
+    The carry is kept as a list of pieces and only joined once a segment
+    completes a paragraph, so a long run of segments without a break costs
+    linear rather than quadratic time.
+    """
+    carry = None            # Pieces of the unfinished paragraph
+    tail = ""               # Its last characters, for a separator cut by a boundary
+    tail_length = len(PARAGRAPH_SEPARATOR) - 1
+    for segment in segments:
+        piece = segment if carry is None else separator + segment
+        if carry is not None and PARAGRAPH_SEPARATOR not in tail + piece:
+            carry.append(piece)
+            tail = (tail + piece)[-tail_length:]
             continue
-            
+        
+        parts = "".join((carry or []) + [piece]).split(PARAGRAPH_SEPARATOR)
+        last = parts.pop()
+        carry = [last]
+        tail = last[-tail_length:]
+        paragraphs = [paragraph.strip() for paragraph in parts]
+        yield [paragraph for paragraph in paragraphs if paragraph]
+    
+    if carry is not None:
+        remainder = "".join(carry).strip()
+        if remainder:
+            yield [remainder]
+
+def _pack_paragraphs(encoded: Iterable, chunk_size: int):
+    """
+    Greedily pack paragraphs into chunks of at most chunk_size tokens.
+    
+    encoded is an iterable of _encode_paragraphs triples. Yields (first, last, token_start, token_count, tokens). Normally
+    paragraphs[first:last + 1] joined by PARAGRAPH_SEPARATOR form one chunk
+    of token_count tokens and tokens is None. When a single paragraph is
+    longer than chunk_size, first == last and tokens is that paragraph's
+    token list, to be split into windows. token_start is the chunk's offset
+    in the token stream of the whole PARAGRAPH_SEPARATOR-joined document.
+    """
+    first = None
+    chunk_start = 0
+    current_tokens = 0      # Tokens in the joined paragraphs[first:index]
+    separator_tokens = 0    # Extra tokens if a separator is appended to that
+    position = 0            # Token offset of the current paragraph
+    
+    for index, (_, tokens, paragraph_separator_tokens) in enumerate(encoded):
+        paragraph_tokens = len(tokens)
+        
         # Check if adding this paragraph would exceed chunk size
-        test_chunk = current_chunk + "\n\n" + paragraph if current_chunk else paragraph
-        test_tokens = len(encoding.encode(test_chunk))
+        if first is not None:
+            test_tokens = current_tokens + separator_tokens + paragraph_tokens
+        else:
+            test_tokens = paragraph_tokens
         
         if test_tokens <= chunk_size:
-            current_chunk = test_chunk
+            if first is None:
+                first, chunk_start = index, position
+            current_tokens = test_tokens
+            separator_tokens = paragraph_separator_tokens
         else:
             # Save current chunk if it exists
-            if current_chunk.strip():
-                chunk_id = f"{source_filename}-chunk-{chunk_index}"
-                chunks.append({
-                    "id": chunk_id,
-                    "text": current_chunk.strip(),
-                    "metadata": {
-                        "source": source_filename,
-                        "chunk_index": chunk_index,
-                        "token_count": len(encoding.encode(current_chunk))
-                    }
-                })
-                chunk_index += 1
+            if first is not None:
+                yield first, index - 1, chunk_start, current_tokens, None
             
             # Start new chunk with current paragraph
-            if len(encoding.encode(paragraph)) <= chunk_size:
-                current_chunk = paragraph
+            if paragraph_tokens <= chunk_size:
+                first, chunk_start = index, position
+                current_tokens = paragraph_tokens
+                separator_tokens = paragraph_separator_tokens
             else:
-                # Paragraph is too long, split it using token-based chunking
-                para_chunks = chunk_text(paragraph, chunk_size, chunk_overlap, ENCODER_NAME, source_filename)
-                for i, para_chunk in enumerate(para_chunks):
-                    para_chunk["id"] = f"{source_filename}-chunk-{chunk_index}"
-                    para_chunk["metadata"]["chunk_index"] = chunk_index
-                    chunks.append(para_chunk)
-                    chunk_index += 1
-                current_chunk = ""
+                yield index, index, position, paragraph_tokens, tokens
+                first = None
+        
+        position += paragraph_tokens + paragraph_separator_tokens
     
     # Don't forget the last chunk
-    if current_chunk.strip():
-        chunk_id = f"{source_filename}-chunk-{chunk_index}"
-        chunks.append({
-            "id": chunk_id,
-            "text": current_chunk.strip(),
-            "metadata": {
-                "source": source_filename,
-                "chunk_index": chunk_index,
-                "token_count": len(encoding.encode(current_chunk))
-            }
-        })
+    if first is not None:
+        yield first, index, chunk_start, current_tokens, None
+
+def _encode_paragraphs(paragraphs: List[str], encoding):
+    """
+    Yield (paragraph, tokens, separator_tokens) for each paragraph.
+    
+    Paragraphs go through encode_batch once. separator_tokens is how many
+    tokens appending PARAGRAPH_SEPARATOR adds to the paragraph, so that
+    len(encode(a + sep + b)) == len(encode(a)) + separator_tokens(a) + len(encode(b)).
+    """
+    plain_separator_tokens = len(encoding.encode(PARAGRAPH_SEPARATOR))
+    for start in range(0, len(paragraphs), ENCODE_BATCH_SIZE):
+        batch = paragraphs[start:start + ENCODE_BATCH_SIZE]
+        for paragraph, tokens in zip(batch, encoding.encode_batch(batch)):
+            yield paragraph, tokens, _separator_tokens(paragraph, encoding, plain_separator_tokens)
+
+def _separator_tokens(paragraph: str, encoding, plain_separator_tokens: int) -> int:
+    """
+    Tokens added by appending PARAGRAPH_SEPARATOR to a stripped paragraph.
+    
+    cl100k_base's pre-tokenizer never lets a pre-token cross from the
+    separator into the next (stripped) paragraph, and only merges the
+    separator backwards into a trailing punctuation pre-token such as
+    ".\n\n". So the separator either stands alone, or only that last
+    pre-token (the punctuation run plus an optional leading space) has to
+    be re-encoded.
+    """
+    match = _TRAILING_PUNCTUATION.search(paragraph)
+    if not match:
+        return plain_separator_tokens
+    
+    start = match.start()
+    if start > 0 and paragraph[start - 1] == " ":
+        start -= 1
+    tail = paragraph[start:]
+    return len(encoding.encode(tail + PARAGRAPH_SEPARATOR)) - len(encoding.encode(tail))
+
+def chunk_text_table(
+    text: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    model: str = ENCODER_NAME,
+    source_filename: str = "unknown"
+) -> ChunkTable:
+    """Same windows as chunk_text, returned as a ChunkTable."""
+    table = ChunkTable(text, source_filename)
+    if not text or not text.strip():
+        return table
+    
+    encoding = get_encoder(model)
+    _append_token_windows(table, encoding.encode(text), encoding, chunk_size, chunk_overlap, 0, len(text), 0)
+    return table
+
+def smart_chunk_table(
+    text: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    source_filename: str = "unknown"
+) -> ChunkTable:
+    """Same chunks as smart_chunk_text, returned as a ChunkTable."""
+    table = ChunkTable(text, source_filename)
+    if not text or not text.strip():
+        return table
+    
+    paragraphs, starts, ends = _paragraph_spans(text)
+    encoding = get_encoder(ENCODER_NAME)
+    
+    for first, last, token_start, token_count, tokens in _pack_paragraphs(_encode_paragraphs(paragraphs, encoding), chunk_size):
+        if tokens is None:
+            # Slice as-is unless some paragraphs were separated by more than one blank line
+            exact = all(starts[i + 1] == ends[i] + len(PARAGRAPH_SEPARATOR) for i in range(first, last))
+            flag = ChunkTable.EXACT if exact else ChunkTable.PARAGRAPHS
+            table.append(starts[first], ends[last], token_start, token_start + token_count, flag)
+        else:
+            _append_token_windows(table, tokens, encoding, chunk_size, chunk_overlap, starts[first], ends[first], token_start)
+    
+    return table
+
+def _paragraph_spans(text: str):
+    """Split text like smart_chunk_text does, also returning each paragraph's span in text."""
+    paragraphs = []
+    starts = array("q")
+    ends = array("q")
+    position = 0
+    for part in text.split(PARAGRAPH_SEPARATOR):
+        paragraph = part.strip()
+        if paragraph:
+            start = position + len(part) - len(part.lstrip())
+            paragraphs.append(paragraph)
+            starts.append(start)
+            ends.append(start + len(paragraph))
+        position += len(part) + len(PARAGRAPH_SEPARATOR)
+    return paragraphs, starts, ends
+
+def _append_token_windows(table: ChunkTable, tokens: List[int], encoding, chunk_size: int, chunk_overlap: int, char_base: int, char_limit: int, token_base: int):
+    """
+    Append the windows _chunk_tokens would produce for tokens to table.
+    
+    tokens encode table.source[char_base:char_limit]; decode_with_offsets
+    maps each window back to a character span in the source.
+    """
+    if len(tokens) == 0:
+        return
+    
+    _, offsets = encoding.decode_with_offsets(tokens)
+    source = table.source
+    start = 0
+    
+    while start < len(tokens):
+        end = min(start + chunk_size, len(tokens))
+        char_start = char_base + offsets[start]
+        char_end = char_base + offsets[end] if end < len(tokens) else char_limit
+        
+        # Skip empty chunks
+        if not source[char_start:char_end].isspace():
+            table.append(char_start, char_end, token_base + start, token_base + end, ChunkTable.STRIP)
+        
+        start += chunk_size - chunk_overlap
+
+def content_defined_chunk_text(
+    text: str,
+    min_tokens: int = CDC_MIN_TOKENS,
+    target_tokens: int = CDC_TARGET_TOKENS,
+    max_tokens: int = CDC_MAX_TOKENS,
+    model: str = ENCODER_NAME,
+    source_filename: str = "unknown"
+) -> List[Dict[str, any]]:
+    """
+    Split text at content-defined boundaries with content-hash chunk IDs.
+    
+    A gear hash rolls over the token stream and a boundary is placed after
+    the first token where it matches a mask once the chunk has min_tokens
+    tokens, or forcibly at max_tokens. The mask is sized so chunks average
+    around target_tokens. Because the hash only looks at the last 64 tokens,
+    an edit moves at most the boundaries right around it: every chunk before
+    and after keeps its exact text and therefore its ID, so re-ingesting an
+    edited document only has to embed the chunks that changed.
+    
+    Chunks do not overlap, since overlap would tie each chunk's text to the
+    end of its predecessor.
+    
+    Returns chunk dicts in the embed_and_store format. IDs are
+    "{source_filename}-{hash}", with "-{n}" appended to repeats of the same
+    text within the document.
+    """
+    return content_defined_chunk_table(text, min_tokens, target_tokens, max_tokens, model, source_filename).to_dicts()
+
+def content_defined_chunk_table(
+    text: str,
+    min_tokens: int = CDC_MIN_TOKENS,
+    target_tokens: int = CDC_TARGET_TOKENS,
+    max_tokens: int = CDC_MAX_TOKENS,
+    model: str = ENCODER_NAME,
+    source_filename: str = "unknown"
+) -> ChunkTable:
+    """Same chunks as content_defined_chunk_text, returned as a ChunkTable."""
+    table = ChunkTable(text, source_filename, content_ids=True)
+    if not text or not text.strip():
+        return table
+    if not 0 < min_tokens <= target_tokens <= max_tokens:
+        raise ValueError("Expected 0 < min_tokens <= target_tokens <= max_tokens")
+    
+    encoding = get_encoder(model)
+    tokens = encoding.encode(text)
+    _, offsets = encoding.decode_with_offsets(tokens)
+    
+    seen = {}
+    start = 0
+    for end in _content_defined_boundaries(tokens, min_tokens, target_tokens, max_tokens):
+        char_start = offsets[start]
+        char_end = offsets[end] if end < len(tokens) else len(text)
+        chunk = text[char_start:char_end].strip()
+        
+        # Skip empty chunks
+        if chunk:
+            digest = int(hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:CDC_HASH_HEX_CHARS], 16)
+            repeat = seen.get(digest, 0)
+            seen[digest] = repeat + 1
+            table.append(char_start, char_end, start, end, ChunkTable.STRIP, digest, repeat)
+        start = end
+    
+    return table
+
+_MASK64 = (1 << 64) - 1
+
+@lru_cache(maxsize=1 << 17)
+def _gear(token: int) -> int:
+    """Pseudo-random 64-bit value for a token id (splitmix64), stable across processes."""
+    z = (token + 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+def _content_defined_boundaries(tokens: List[int], min_tokens: int, target_tokens: int, max_tokens: int):
+    """
+    Yield the exclusive end index of each chunk; the last one is len(tokens).
+    
+    The hash is tested on its top bits, which depend on the last 64 tokens.
+    The mask keeps about log2(target_tokens - min_tokens + 1) bits, so a
+    boundary fires with p ~ 1 / (target_tokens - min_tokens) per token once
+    past min_tokens.
+    """
+    spread = target_tokens - min_tokens + 1
+    bits = round(math.log2(spread))
+    shift = 64 - bits
+    
+    start = 0
+    rolling = 0
+    for position, token in enumerate(tokens):
+        rolling = ((rolling << 1) + _gear(token)) & _MASK64
+        length = position + 1 - start
+        if length >= max_tokens or (length >= min_tokens and rolling >> shift == 0):
+            yield position + 1
+            start = position + 1
     
-    return chunks
\ No newline at end of file
+    if start < len(tokens):
+        yield len(tokens)
@@ -0,0 +1,126 @@
+"""
+Vector store interface used by the embedder and the retriever.
+
+VECTOR_STORE selects the backend: "pinecone" (default) talks to the hosted
+index, "faiss" keeps an in-process FAISS index with on-disk snapshots (see
+src.pipeline.faiss_store). Both speak the same small API, with Pinecone
+style vectors ({"id", "values", "metadata"}) and filters
+({"source": {"$eq": name}}).
+"""
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+VECTOR_STORE = os.environ.get("VECTOR_STORE", "pinecone")
+# Vector queries in flight at once for query_many
+QUERY_WORKERS = int(os.environ.get("QUERY_WORKERS", "8"))
+
+class VectorStore(ABC):
+    """Operations the pipeline needs from a vector database."""
+
+    # Whether upsert() takes numpy rows as "values" (lists otherwise)
+    accepts_arrays = False
+
+    @abstractmethod
+    def upsert(self, vectors: list):
+        """Insert or replace vectors given as {"id", "values", "metadata"} dicts."""
+
+    @abstractmethod
+    def query(self, vector, top_k: int = 5, filter: dict = None) -> list:
+        """Return up to top_k [{"id", "score", "metadata"}] by descending cosine similarity."""
+
+    def query_many(self, vectors, top_k: int = 5, filter: dict = None, workers: int = QUERY_WORKERS) -> list:
+        """
+        query() for each vector, with up to workers queries in flight.
+
+        Returns one match list per vector, in order. A failed query yields
+        an empty list instead of failing the others.
+        """
+        vectors = list(vectors)
+        if len(vectors) <= 1 or workers <= 1:
+            return [self._query_or_empty(vector, top_k, filter) for vector in vectors]
+        with ThreadPoolExecutor(max_workers=min(workers, len(vectors)), thread_name_prefix="query") as pool:
+            return list(pool.map(lambda vector: self._query_or_empty(vector, top_k, filter), vectors))
+
+    def _query_or_empty(self, vector, top_k: int, filter: dict) -> list:
+        try:
+            return self.query(vector, top_k=top_k, filter=filter)
+        except Exception as e:
+            print(f"Error querying vector store: {e}")
+            return []
+
+    @abstractmethod
+    def fetch_metadata(self, ids: list) -> dict:
+        """Return {id: metadata} for the ids that are stored."""
+
+    @abstractmethod
+    def list_ids(self, prefix: str = ""):
+        """Iterate over stored ids starting with prefix."""
+
+    @abstractmethod
+    def update_metadata(self, vector_id: str, fields: dict):
+        """Set metadata fields of a stored vector, keeping its other fields."""
+
+    @abstractmethod
+    def delete(self, ids: list = None, filter: dict = None, delete_all: bool = False):
+        """Delete the given ids, the vectors matching filter, or everything."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """At least total_vectors, dimension and index_fullness."""
+
+    def flush(self):
+        """Persist buffered writes; called after each ingestion."""
+
+class PineconeVectorStore(VectorStore):
+    """VectorStore over a pinecone Index handle."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def upsert(self, vectors: list):
+        self.index.upsert(vectors=vectors)
+
+    def query(self, vector, top_k: int = 5, filter: dict = None) -> list:
+        result = self.index.query(
+            vector=list(vector),
+            top_k=top_k,
+            include_metadata=True,
+            filter=filter or None
+        )
+        return [
+            {"id": match["id"], "score": match["score"], "metadata": match["metadata"] or {}}
+            for match in result["matches"]
+        ]
+
+    def fetch_metadata(self, ids: list) -> dict:
+        found = {}
+        for i in range(0, len(ids), 100):
+            response = self.index.fetch(ids=ids[i:i + 100])
+            found.update((vector_id, vector.metadata or {}) for vector_id, vector in response.vectors.items())
+        return found
+
+    def list_ids(self, prefix: str = ""):
+        # Index.list() pages through list_paginated() and yields each page as a list of ids
+        for ids in self.index.list(prefix=prefix or None):
+            yield from ids
+
+    def update_metadata(self, vector_id: str, fields: dict):
+        self.index.update(id=vector_id, set_metadata=fields)
+
+    def delete(self, ids: list = None, filter: dict = None, delete_all: bool = False):
+        if delete_all:
+            self.index.delete(delete_all=True)
+        elif filter:
+            self.index.delete(filter=filter)
+        elif ids:
+            for i in range(0, len(ids), 1000):
+                self.index.delete(ids=ids[i:i + 1000])
+
+    def stats(self) -> dict:
+        stats = self.index.describe_index_stats()
+        return {
+            "total_vectors": stats.get("total_vector_count", 0),
+            "dimension": stats.get("dimension", 0),
+            "index_fullness": stats.get("index_fullness", 0)
+        }
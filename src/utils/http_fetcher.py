@@ -0,0 +1,248 @@
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+FETCH_TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", "30"))
+FETCH_MAX_BYTES = int(os.environ.get("FETCH_MAX_MB", "100")) * 1024 * 1024
+FETCH_POOL_SIZE = int(os.environ.get("FETCH_POOL_SIZE", "10"))
+FETCH_CHUNK_BYTES = 64 * 1024
+# Bodies larger than this spill from memory to a temp file while downloading
+FETCH_SPOOL_BYTES = 8 * 1024 * 1024
+
+HTTP_CACHE_DIR = os.environ.get(
+    "HTTP_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "hackrx-http-cache")
+)
+HTTP_CACHE_MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_MB", "1024")) * 1024 * 1024
+HTTP_CACHE_ENABLED = os.environ.get("HTTP_CACHE_ENABLED", "1") != "0"
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Process-wide requests.Session with a pooled, retrying HTTP adapter."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504), allowed_methods=("GET",))
+                adapter = HTTPAdapter(pool_connections=FETCH_POOL_SIZE, pool_maxsize=FETCH_POOL_SIZE, max_retries=retry)
+                session = requests.Session()
+                session.headers.update(DEFAULT_HEADERS)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+class FetchResult:
+    """
+    A downloaded document.
+
+    The body is a file object positioned at the start: a spooled temp file
+    for fresh downloads, or the cached copy when the server answered 304.
+    Use as a context manager (or call close()) to release it.
+    """
+
+    def __init__(self, url: str, status: int, content_type: str, body, from_cache: bool = False):
+        self.url = url
+        self.status = status
+        self.content_type = content_type
+        self.body = body
+        self.from_cache = from_cache
+        self._mapping = None
+
+    def read(self) -> bytes:
+        return self.body.read()
+
+    def buffer(self):
+        """
+        The whole body as a bytes-like object, without loading a large one.
+
+        Bodies that fit the in-memory spool are read; bodies that spilled to
+        disk (and cached copies) are memory-mapped read-only, so the OS pages
+        them in on demand. The mapping is valid until close().
+        """
+        size = self.body.seek(0, os.SEEK_END)
+        self.body.seek(0)
+        if size <= FETCH_SPOOL_BYTES:
+            return self.body.read()
+        if self._mapping is None:
+            self._mapping = mmap.mmap(self.body.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mapping)
+
+    def close(self):
+        if self._mapping is not None:
+            try:
+                self._mapping.close()
+            except BufferError:
+                pass  # A view is still referenced; unmapped when it is collected
+            self._mapping = None
+        self.body.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ConditionalCache:
+    """
+    On-disk store of response bodies plus their ETag/Last-Modified validators.
+
+    Entries are keyed by SHA-256 of the URL and written atomically, so the
+    directory can be shared between workers. Least recently used bodies are
+    evicted once the directory exceeds max_bytes.
+    """
+
+    def __init__(self, directory: str = HTTP_CACHE_DIR, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + ".json", base + ".body"
+
+    def lookup(self, url: str):
+        """Return (metadata, body path) for url, or (None, None)."""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None, None
+        if not os.path.exists(body_path):
+            return None, None
+        return meta, body_path
+
+    def open_body(self, body_path: str):
+        try:
+            os.utime(body_path)  # Mark as recently used
+        except OSError:
+            pass
+        return open(body_path, "rb")
+
+    def store(self, url: str, meta: dict, body):
+        """Copy body (a file object) and meta into the cache."""
+        meta_path, body_path = self._paths(url)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            body.seek(0)
+            self._write_atomic(body_path, lambda f: shutil.copyfileobj(body, f, FETCH_CHUNK_BYTES))
+            self._write_atomic(meta_path, lambda f: f.write(json.dumps(meta).encode("utf-8")))
+            self.evict()
+        except OSError as e:
+            logger.warning(f"Could not cache response for {url}: {e}")
+        finally:
+            body.seek(0)
+
+    def _write_atomic(self, path: str, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def evict(self):
+        """Drop least recently used bodies until the cache fits in max_bytes."""
+        bodies = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".body"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            bodies.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in bodies)
+        for _, size, path in sorted(bodies):
+            if total <= self.max_bytes:
+                break
+            for stale in (path, path[:-len(".body")] + ".json"):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            total -= size
+
+conditional_cache = ConditionalCache()
+
+def fetch(url: str, max_bytes: int = FETCH_MAX_BYTES, timeout: float = FETCH_TIMEOUT, use_cache: bool = HTTP_CACHE_ENABLED) -> FetchResult:
+    """
+    GET url over the pooled session, streaming the body to a spooled temp file.
+
+    Revalidates previously fetched URLs with If-None-Match/If-Modified-Since
+    so an unchanged document comes back as a 304 and is served from the
+    local cache instead of being downloaded again.
+
+    Raises:
+        ValueError: if the body is larger than max_bytes
+        requests.HTTPError: for non-2xx responses other than a usable 304
+    """
+    headers = {}
+    cached_meta, cached_body = conditional_cache.lookup(url) if use_cache else (None, None)
+    if cached_meta:
+        if cached_meta.get("etag"):
+            headers["If-None-Match"] = cached_meta["etag"]
+        if cached_meta.get("last_modified"):
+            headers["If-Modified-Since"] = cached_meta["last_modified"]
+
+    with get_session().get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code == 304 and cached_meta:
+            logger.info(f"Not modified, serving cached copy of {url}")
+            return FetchResult(url, 304, cached_meta.get("content_type", ""), conditional_cache.open_body(cached_body), from_cache=True)
+
+        response.raise_for_status()
+
+        declared = response.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise ValueError(f"Response from {url} is {int(declared)} bytes, limit is {max_bytes}")
+
+        body = tempfile.SpooledTemporaryFile(max_size=FETCH_SPOOL_BYTES)
+        received = 0
+        try:
+            for block in response.iter_content(chunk_size=FETCH_CHUNK_BYTES):
+                received += len(block)
+                if received > max_bytes:
+                    raise ValueError(f"Response from {url} exceeds the {max_bytes} byte limit")
+                body.write(block)
+        except BaseException:
+            body.close()
+            raise
+        body.seek(0)
+
+        status = response.status_code
+        content_type = response.headers.get("content-type", "")
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+
+    logger.info(f"Fetched {received} bytes from {url}")
+    if use_cache and (etag or last_modified):
+        meta = {"url": url, "etag": etag, "last_modified": last_modified, "content_type": content_type}
+        conditional_cache.store(url, meta, body)
+
+    return FetchResult(url, status, content_type, body)
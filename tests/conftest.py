@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from src.pipeline.vector_store import VectorStore
+
+class FakeModel:
+    """
+    Deterministic stand-in for SentenceTransformer: a text embeds as
+    [len(text), len(text) + 1, ...] with `dimension` values. Records every
+    text it encoded and the size of every batch it was called with.
+    """
+
+    max_seq_length = 256
+
+    def __init__(self, dimension=4):
+        self.dimension = dimension
+        self.encoded = []
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, **kwargs):
+        self.encoded.extend(texts)
+        self.calls.append(len(texts))
+        return np.array([[len(text) + i for i in range(self.dimension)] for text in texts], dtype=np.float32)
+
+class RecordingIndex:
+    """Pinecone-style index that keeps every upserted vector by id."""
+
+    def __init__(self):
+        self.vectors = {}
+
+    def upsert(self, vectors):
+        for vector in vectors:
+            self.vectors[vector["id"]] = vector
+
+class MemoryStore(VectorStore):
+    """
+    Complete in-memory VectorStore: exact cosine search over a dict, with
+    "$eq" metadata filters. Counts the queries it answered.
+    """
+
+    def __init__(self):
+        self.vectors = {}
+        self.queries = 0
+
+    def upsert(self, vectors: list):
+        for vector in vectors:
+            self.vectors[vector["id"]] = (np.asarray(vector["values"], dtype=np.float32), dict(vector.get("metadata") or {}))
+
+    def query(self, vector, top_k: int = 5, filter: dict = None) -> list:
+        self.queries += 1
+        vector = np.asarray(vector, dtype=np.float32)
+        matches = [
+            {"id": vector_id, "score": float(values @ vector / (np.linalg.norm(values) * np.linalg.norm(vector))), "metadata": metadata}
+            for vector_id, (values, metadata) in self.vectors.items() if self._matches(metadata, filter)
+        ]
+        return sorted(matches, key=lambda match: -match["score"])[:top_k]
+
+    def fetch_metadata(self, ids: list) -> dict:
+        return {vector_id: self.vectors[vector_id][1] for vector_id in ids if vector_id in self.vectors}
+
+    def list_ids(self, prefix: str = ""):
+        return [vector_id for vector_id in self.vectors if vector_id.startswith(prefix)]
+
+    def update_metadata(self, vector_id: str, fields: dict):
+        self.vectors[vector_id][1].update(fields)
+
+    def delete(self, ids: list = None, filter: dict = None, delete_all: bool = False):
+        doomed = [vector_id for vector_id, (_, metadata) in self.vectors.items() if delete_all or (filter and self._matches(metadata, filter))]
+        for vector_id in doomed + list(ids or []):
+            self.vectors.pop(vector_id, None)
+
+    def stats(self) -> dict:
+        dimension = len(next(iter(self.vectors.values()))[0]) if self.vectors else 0
+        return {"total_vectors": len(self.vectors), "dimension": dimension, "index_fullness": 0.0}
+
+    @staticmethod
+    def _matches(metadata: dict, filter: dict) -> bool:
+        return all(metadata.get(field) == condition["$eq"] for field, condition in (filter or {}).items())
+
+@pytest.fixture
+def fake_model():
+    return FakeModel()
+
+@pytest.fixture
+def recording_index():
+    return RecordingIndex()
+
+@pytest.fixture
+def memory_store():
+    return MemoryStore()
@@ -0,0 +1,57 @@
+"""
+The pre-optimisation smart_chunk_text, kept as the reference the current
+chunker is tested against (tests/test_splitter.py) and timed against
+(benchmarks/bench_splitter.py). Do not change its output.
+"""
+from src.pipeline.splitter import (
+    DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_CHUNK_SIZE,
+    ENCODER_NAME,
+    chunk_text,
+    get_encoder,
+)
+
+WORDS = (
+    "the Company shall indemnify the Insured Person for Reasonable and Customary "
+    "Charges incurred towards Medically Necessary Treatment during the Policy Period "
+    "subject to the Sum Insured, waiting periods, exclusions and co-payment of 10%."
+).split()
+
+def legacy_smart_chunk_text(text, chunk_size=DEFAULT_CHUNK_SIZE, chunk_overlap=DEFAULT_CHUNK_OVERLAP, source_filename="unknown"):
+    """The pre-optimisation algorithm: encode every candidate chunk in full."""
+    paragraphs = text.split('\n\n')
+    chunks = []
+    current_chunk = ""
+    chunk_index = 0
+    encoding = get_encoder(ENCODER_NAME)
+
+    def emit(chunk):
+        chunks.append({
+            "id": f"{source_filename}-chunk-{chunk_index}",
+            "text": chunk.strip(),
+            "metadata": {"source": source_filename, "chunk_index": chunk_index, "token_count": len(encoding.encode(chunk))}
+        })
+
+    for paragraph in paragraphs:
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        test_chunk = current_chunk + "\n\n" + paragraph if current_chunk else paragraph
+        if len(encoding.encode(test_chunk)) <= chunk_size:
+            current_chunk = test_chunk
+        else:
+            if current_chunk.strip():
+                emit(current_chunk)
+                chunk_index += 1
+            if len(encoding.encode(paragraph)) <= chunk_size:
+                current_chunk = paragraph
+            else:
+                for para_chunk in chunk_text(paragraph, chunk_size, chunk_overlap, ENCODER_NAME, source_filename):
+                    para_chunk["id"] = f"{source_filename}-chunk-{chunk_index}"
+                    para_chunk["metadata"]["chunk_index"] = chunk_index
+                    chunks.append(para_chunk)
+                    chunk_index += 1
+                current_chunk = ""
+    if current_chunk.strip():
+        emit(current_chunk)
+    return chunks
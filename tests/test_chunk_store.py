@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.pipeline import embedder, retriever
+from src.pipeline.chunk_store import ChunkStore
+
+def make_chunk(i, source="a.pdf"):
+    return {"id": f"{source}-chunk-{i}", "text": f"text of {source} chunk {i}", "metadata": {"source": source, "chunk_index": i}}
+
+def test_put_get_and_delete(tmp_path):
+    store = ChunkStore(str(tmp_path / "chunks.sqlite3"))
+    store.put_many([make_chunk(i) for i in range(3)] + [make_chunk(0, "b.pdf")])
+
+    assert store.get_many(["a.pdf-chunk-1", "missing", "b.pdf-chunk-0"]) == {
+        "a.pdf-chunk-1": "text of a.pdf chunk 1",
+        "b.pdf-chunk-0": "text of b.pdf chunk 0"
+    }
+
+    assert store.delete_source("a.pdf") == 3
+    store.delete_ids(["b.pdf-chunk-0"])
+    assert store.stats()["chunks"] == 0
+
+def test_vectors_carry_compact_metadata_and_retrieval_hydrates_text(tmp_path, monkeypatch, fake_model, recording_index):
+    store = ChunkStore(str(tmp_path / "chunks.sqlite3"))
+    monkeypatch.setattr(retriever, "chunk_store", store)
+    monkeypatch.setattr(retriever, "CHUNK_STORE_ENABLED", True)
+
+    embedder.embed_and_store_stream([make_chunk(i) for i in range(5)], index=recording_index, model=fake_model, use_cache=False, texts=store)
+
+    assert recording_index.vectors["a.pdf-chunk-2"]["metadata"] == {"source": "a.pdf", "chunk_index": 2}
+    matches = [
+        {"id": "a.pdf-chunk-2", "score": 0.9, "metadata": recording_index.vectors["a.pdf-chunk-2"]["metadata"]},
+        {"id": "old-chunk", "score": 0.5, "metadata": {"text": "stored the old way"}}
+    ]
+    hydrated = retriever.hydrate_matches(matches)
+    assert [chunk["text"] for chunk in hydrated] == ["text of a.pdf chunk 2", "stored the old way"]
+
+@pytest.mark.parametrize("backend, enabled", [("pinecone", "False"), ("faiss", "True")])
+def test_chunk_store_is_only_on_by_default_for_faiss(backend, enabled):
+    env = {key: value for key, value in os.environ.items() if key != "CHUNK_STORE_ENABLED"}
+    env["VECTOR_STORE"] = backend
+    result = subprocess.run(
+        [sys.executable, "-c", "from src.pipeline.chunk_store import CHUNK_STORE_ENABLED; print(CHUNK_STORE_ENABLED)"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env, capture_output=True, text=True
+    )
+
+    assert result.stdout.strip() == enabled, result.stderr
+
+def test_disabled_chunk_store_is_never_read(tmp_path, monkeypatch):
+    store = ChunkStore(str(tmp_path / "chunks.sqlite3"))
+    store.put_many([make_chunk(0)])  # Left by an earlier run with the store enabled
+    monkeypatch.setattr(retriever, "chunk_store", store)
+    monkeypatch.setattr(retriever, "CHUNK_STORE_ENABLED", False)
+
+    hydrated = retriever.hydrate_matches([{"id": "a.pdf-chunk-0", "score": 0.9, "metadata": {"text": "new text of chunk 0"}}])
+
+    assert [chunk["text"] for chunk in hydrated] == ["new text of chunk 0"]
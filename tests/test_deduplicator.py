@@ -0,0 +1,48 @@
+from src.pipeline.deduplicator import DEDUP_BANDS, DEDUP_NUM_PERM, DEDUP_THRESHOLD, deduplicate_chunks
+
+FOOTER = (
+    "This policy is underwritten by Example General Insurance Co. Ltd. "
+    "IRDAI Registration No. 190. Trade logo displayed above belongs to Example Group "
+    "and is used under licence. For grievances write to care@example.com or call the toll free "
+    "number printed on your health card. Please read the policy wording, including the exclusions, "
+    "terms and conditions, carefully before concluding a sale. Page {page} of 40"
+)
+
+def make_chunk(index, text):
+    return {"id": f"policy.pdf-chunk-{index}", "text": text, "metadata": {"source": "policy.pdf", "chunk_index": index}}
+
+def test_repeated_footers_collapse_to_one_chunk_with_provenance():
+    chunks = []
+    for page in range(1, 11):
+        chunks.append(make_chunk(len(chunks), f"Section {page}: the waiting period for claim type {page * 7} is {page * 3} months "
+                                              f"unless the insured declares condition number {page * 11} at proposal stage."))
+        chunks.append(make_chunk(len(chunks), FOOTER.format(page=page)))
+
+    kept, report = deduplicate_chunks(chunks)
+
+    assert report["input_chunks"] == 20
+    assert report["kept_chunks"] == 11
+    assert report["removed_chunks"] == 9
+
+    footer_id = "policy.pdf-chunk-1"
+    assert [chunk["id"] for chunk in kept].count(footer_id) == 1
+    assert [occurrence["chunk_index"] for occurrence in report["occurrences"][footer_id]] == list(range(3, 20, 2))
+    footer_metadata = next(chunk for chunk in kept if chunk["id"] == footer_id)["metadata"]
+    assert footer_metadata["occurrences"] == 10
+    assert footer_metadata["duplicates"] == [f"policy.pdf-chunk-{index}" for index in range(3, 20, 2)]
+
+def test_distinct_chunks_are_kept_in_order():
+    chunks = [make_chunk(i, text) for i, text in enumerate([
+        "Room rent is capped at one percent of the sum insured per day.",
+        "Maternity expenses are covered after a waiting period of nine months.",
+        "Cataract surgery is limited to forty thousand rupees per eye.",
+    ])]
+
+    kept, report = deduplicate_chunks(chunks)
+
+    assert kept == chunks
+    assert report["occurrences"] == {}
+
+def test_bands_find_almost_every_pair_at_the_threshold():
+    rows = DEDUP_NUM_PERM // DEDUP_BANDS
+    assert 1 - (1 - DEDUP_THRESHOLD ** rows) ** DEDUP_BANDS > 0.999
@@ -0,0 +1,245 @@
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from src.pipeline import document_loader
+
+def make_pdf(page_texts):
+    doc = fitz.open()
+    for text in page_texts:
+        page = doc.new_page()
+        if text:
+            page.insert_text((72, 72), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+def test_parallel_pdf_extraction_keeps_page_order(monkeypatch):
+    monkeypatch.setattr(document_loader, "PDF_PARALLEL_MIN_PAGES", 2)
+    pdf = make_pdf([f"Page number {i}" for i in range(9)] + [""])
+
+    serial = document_loader.extract_text_from_pdf(pdf, workers=1)
+    parallel = document_loader.extract_text_from_pdf(pdf, workers=4)
+
+    assert parallel == serial
+    assert [line for line in parallel.splitlines() if line] == [f"Page number {i}" for i in range(9)]
+
+def test_iter_pages_offsets_index_into_the_joined_document(tmp_path, monkeypatch):
+    from src.pipeline.extraction_cache import ExtractionCache
+
+    cache = ExtractionCache(str(tmp_path))
+    monkeypatch.setattr(document_loader, "extraction_cache", cache)
+    pdf = make_pdf(["First page", "", "Third page", "Fourth page"])
+
+    records = list(document_loader.iter_pages(pdf, "policy.pdf"))
+    document = document_loader.PAGE_SEPARATOR.join(record["text"] for record in records)
+
+    assert [(record["index"], record["page"]) for record in records] == [(0, 1), (1, 3), (2, 4)]
+    for record in records:
+        assert document[record["start_char"]:record["end_char"]] == record["text"]
+    assert records[-1]["end_char"] == len(document)
+
+    # A re-upload replays the same records from the extraction cache
+    assert list(document_loader.iter_pages(pdf, "renamed.pdf")) == records
+    assert cache.hits == 1
+
+def test_hybrid_ocr_only_rasterizes_pages_without_a_text_layer(monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+
+    class FakeTesseract:
+        calls = 0
+
+        @classmethod
+        def image_to_string(cls, image):
+            cls.calls += 1
+            return f"scanned text {cls.calls}"
+
+    monkeypatch.setattr(document_loader, "_get_ocr", lambda: (FakeTesseract, Image))
+    pdf = make_pdf(["This page has a usable text layer", "", "So does this third page", ""])
+
+    text = document_loader.extract_text_from_pdf_with_ocr(pdf, dpi=36, workers=1)
+
+    assert FakeTesseract.calls == 2
+    assert [line for line in text.splitlines() if line] == [
+        "This page has a usable text layer", "scanned text 1", "So does this third page", "scanned text 2"
+    ]
+
+def test_url_pdf_is_extracted_from_the_download_without_reading_it(monkeypatch):
+    import tempfile
+
+    from src.utils import http_fetcher
+
+    pdf = make_pdf(["Downloaded policy"] * 3)
+    monkeypatch.setattr(http_fetcher, "FETCH_SPOOL_BYTES", 256)
+    results = []
+
+    def fake_fetch(url):
+        body = tempfile.SpooledTemporaryFile(max_size=http_fetcher.FETCH_SPOOL_BYTES)
+        body.write(pdf)
+        body.seek(0)
+        results.append(http_fetcher.FetchResult(url, 200, "application/PDF", body))
+        results[-1].read = lambda: pytest.fail("body read into memory")
+        return results[-1]
+
+    monkeypatch.setattr(http_fetcher, "fetch", fake_fetch)
+
+    text = document_loader.extract_text_from_url("https://example.com/policy.pdf")
+
+    assert [line for line in text.splitlines() if line] == ["Downloaded policy"] * 3
+    assert results[0].body.closed
+
+def make_docx():
+    docx = pytest.importorskip("docx")
+    from io import BytesIO
+
+    document = docx.Document()
+    document.add_paragraph("Policy schedule")
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "Benefit"
+    table.cell(0, 1).text = "Limit"
+    table.cell(1, 0).text = "Room rent"
+    table.cell(1, 1).text = "1% of sum insured"
+    document.add_paragraph("")
+    document.add_paragraph("Exclusions apply")
+    document.sections[0].header.paragraphs[0].text = "National Insurance"
+    document.sections[0].footer.paragraphs[0].text = "Page footer"
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def test_fast_docx_parser_matches_python_docx(monkeypatch):
+    data = make_docx()
+    expected = [
+        "Policy schedule",
+        "Benefit | Limit\nRoom rent | 1% of sum insured",
+        "Exclusions apply",
+        "[HEADER] National Insurance",
+        "[FOOTER] Page footer"
+    ]
+
+    assert list(document_loader._iter_docx_sections_fast(data)) == expected
+    assert list(document_loader._iter_docx_sections_python_docx(data)) == expected
+    assert document_loader.extract_text_from_docx(data) == "\n\n".join(expected)
+
+def test_fast_docx_parser_reads_merged_cells_once():
+    docx = pytest.importorskip("docx")
+    from io import BytesIO
+
+    document = docx.Document()
+    table = document.add_table(rows=1, cols=3)
+    merged = table.cell(0, 0).merge(table.cell(0, 1))
+    merged.text = "Spans two columns"
+    table.cell(0, 2).text = "Last"
+    buffer = BytesIO()
+    document.save(buffer)
+
+    assert list(document_loader._iter_docx_sections_fast(buffer.getvalue())) == ["Spans two columns | Last"]
+
+def test_email_extracts_supported_attachments_and_skips_binary_parts(monkeypatch):
+    from email.message import EmailMessage
+
+    ocr_calls = []
+    monkeypatch.setattr(document_loader, "extract_text_from_image", lambda payload: ocr_calls.append(payload) or "scanned claim form")
+
+    forwarded = EmailMessage()
+    forwarded["From"] = "insurer@example.com"
+    forwarded["Subject"] = "Original claim"
+    forwarded.set_content("Claim approved")
+
+    message = EmailMessage()
+    message["From"] = "alice@example.com"
+    message["To"] = "claims@example.com"
+    message["Subject"] = "Claim documents"
+    message.set_content("Please find the documents attached.")
+    message.add_alternative('<p>Please find the documents attached.</p><img src="cid:logo">', subtype="html")
+    message.get_payload()[1].add_related(b"\x89PNG\r\n\x1a\nlogo", "image", "png", cid="<logo>", disposition="inline", filename="logo.png")
+    message.add_attachment(make_pdf(["Policy wording"]), "application", "pdf", filename="policy.pdf")
+    message.add_attachment(b"\x89PNG\r\n\x1a\nscan", "image", "png", filename="claim.png")
+    message.add_attachment("Date,Amount\n2024-01-01,500\n", subtype="csv", filename="bills.csv")
+    message.add_attachment(b"PK\x03\x04binary archive", "application", "zip", filename="bills.zip")
+    message.add_attachment(b"0\x82\x05\x00signature", "application", "pkcs7-signature", filename="smime.p7s")
+    message.add_attachment(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1outlook", "application", "octet-stream", filename="old.msg")
+    message.add_attachment(forwarded)
+
+    sections = list(document_loader._iter_email_sections(message.as_bytes()))
+    attachments = [section.split("\n", 1)[0] for section in sections if section.startswith("[ATTACHMENT:")]
+
+    assert sections[0] == "Subject: Claim documents\nFrom: alice@example.com\nTo: claims@example.com"
+    assert attachments == [
+        "[ATTACHMENT: policy.pdf]", "[ATTACHMENT: claim.png]", "[ATTACHMENT: bills.csv]", "[ATTACHMENT: Original claim.eml]"
+    ]
+    assert "Policy wording" in sections[-4]
+    assert sections[-1].endswith("Claim approved")
+    assert len(ocr_calls) == 1  # The inline logo is not OCRed
+
+class FakePyPDF2:
+    """PyPDF2 stand-in whose reader finds "PyPDF2 page N" on each of `pages` pages."""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def PdfReader(self, stream):
+        from types import SimpleNamespace
+
+        return SimpleNamespace(pages=[SimpleNamespace(extract_text=lambda n=n: f"PyPDF2 page {n + 1}") for n in range(self.pages)])
+
+def test_streamed_pdf_falls_back_when_pymupdf_fails_or_finds_no_text(monkeypatch):
+    monkeypatch.setattr(document_loader, "_get_pypdf2", lambda: FakePyPDF2(3))
+    monkeypatch.setattr(document_loader, "_get_pdfplumber", lambda: None)
+    scanned = make_pdf(["", "", ""])
+    broken = b"%PDF-1.7\nnot really a pdf"
+
+    for pdf in (scanned, broken):
+        pages = [(page, text) for page, text in document_loader._iter_pdf_pages(pdf) if text]  # Empty pages are dropped later
+        assert pages == [(n, f"PyPDF2 page {n}") for n in (1, 2, 3)]
+
+def test_streamed_pdf_continues_from_the_page_pymupdf_failed_on(monkeypatch):
+    def failing_fitz_pages(file_bytes, start=0):
+        yield 0, "PyMuPDF page 1"
+        raise RuntimeError("corrupt xref")
+
+    monkeypatch.setattr(document_loader, "_iter_fitz_pages", failing_fitz_pages)
+    monkeypatch.setattr(document_loader, "_get_pypdf2", lambda: FakePyPDF2(3))
+    monkeypatch.setattr(document_loader, "_get_pdfplumber", lambda: None)
+
+    assert list(document_loader._iter_pdf_pages(make_pdf(["x"] * 3))) == [(1, "PyMuPDF page 1"), (2, "PyPDF2 page 2"), (3, "PyPDF2 page 3")]
+
+    monkeypatch.setattr(document_loader, "_get_pypdf2", lambda: None)
+    with pytest.raises(ValueError, match="after page 1"):
+        list(document_loader._iter_pdf_pages(make_pdf(["x"] * 3)))
+
+def test_text_file_is_extracted_and_cached_once(tmp_path, monkeypatch):
+    from src.pipeline.extraction_cache import ExtractionCache
+
+    cache = ExtractionCache(str(tmp_path))
+    monkeypatch.setattr(document_loader, "extraction_cache", cache)
+    puts = []
+    monkeypatch.setattr(cache, "put_text", lambda key, text: puts.append(key))
+
+    records = list(document_loader.iter_pages(b"Plain text policy\n\nSecond paragraph", "policy.txt"))
+
+    assert [record["text"] for record in records] == ["Plain text policy\n\nSecond paragraph"]
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert puts == []  # The page records are the only cache entry
+    assert list(document_loader.iter_pages(b"Plain text policy\n\nSecond paragraph", "policy.txt")) == records
+
+def test_streamed_docx_falls_back_to_python_docx_mid_document(monkeypatch, tmp_path):
+    from xml.etree.ElementTree import ParseError
+
+    from src.pipeline.extraction_cache import ExtractionCache
+
+    data = make_docx()
+    fast = document_loader._iter_docx_sections_fast
+
+    def failing_fast(file_bytes):
+        sections = fast(file_bytes)
+        yield next(sections)
+        raise ParseError("not well-formed")
+
+    monkeypatch.setattr(document_loader, "_iter_docx_sections_fast", failing_fast)
+    monkeypatch.setattr(document_loader, "extraction_cache", ExtractionCache(str(tmp_path)))
+
+    records = list(document_loader.iter_pages(data, "policy.docx"))
+
+    assert [record["text"] for record in records] == list(document_loader._iter_docx_sections_python_docx(data))
+    assert document_loader.extract_text_from_docx(data) == "\n\n".join(record["text"] for record in records)
@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from src.pipeline import embedder
+
+class FlakyIndex:
+    """Fails the first attempt of every other batch."""
+
+    def __init__(self):
+        self.vectors = {}
+        self.attempts = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors):
+        with self._lock:
+            self.attempts += 1
+            if self.attempts % 2 == 1:
+                raise ConnectionError("transient")
+            for vector in vectors:
+                self.vectors[vector["id"]] = vector
+
+class BrokenIndex:
+    def upsert(self, vectors):
+        raise ConnectionError("down")
+
+def make_docs(count):
+    return ({"id": f"doc-{i}", "text": "x" * (i + 1), "metadata": {"chunk_index": i}} for i in range(count))
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(embedder, "UPSERT_BACKOFF_SECONDS", 0)
+
+def test_stream_upserts_every_chunk_despite_transient_failures(fake_model):
+    index = FlakyIndex()
+
+    stats = embedder.embed_and_store_stream(make_docs(750), index=index, model=fake_model, use_cache=False)
+
+    assert stats["chunks"] == 750
+    assert stats["batches"] == 8
+    assert stats["retries"] > 0
+    assert len(index.vectors) == 750
+    assert index.vectors["doc-41"]["values"] == [42.0, 43.0, 44.0, 45.0]
+    assert index.vectors["doc-41"]["metadata"] == {"chunk_index": 41, "text": "x" * 42}
+
+def test_stream_raises_after_retries_are_exhausted(monkeypatch, fake_model):
+    monkeypatch.setattr(embedder, "UPSERT_RETRIES", 2)
+
+    with pytest.raises(ConnectionError):
+        embedder.embed_and_store_stream(make_docs(10), index=BrokenIndex(), model=fake_model, use_cache=False)
+
+def test_skip_existing_looks_ids_up_one_batch_at_a_time(monkeypatch):
+    lookups = []
+    monkeypatch.setattr(embedder, "CHUNK_STORE_ENABLED", False)
+    monkeypatch.setattr(embedder, "get_existing_ids", lambda ids: lookups.append(len(ids)) or {i for i in ids if i.endswith("0")})
+    counts = {"existing": 0}
+
+    docs = embedder._skip_existing(make_docs(250), counts)
+    assert next(docs)["id"] == "doc-1"
+    assert lookups == [100]
+
+    assert len(list(docs)) == 224
+    assert lookups == [100, 100, 50]
+    assert counts["existing"] == 25
@@ -0,0 +1,61 @@
+import threading
+
+import numpy as np
+
+from src.pipeline.embedding_cache import EmbeddingCache
+
+def test_only_misses_reach_the_model(tmp_path, fake_model):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    model = fake_model
+
+    first = cache.encode(model, "m", ["alpha", "beta"])
+    second = cache.encode(model, "m", ["beta", "gamma", "  alpha\n"])
+
+    assert model.encoded == ["alpha", "beta", "gamma"]
+    assert np.array_equal(second[0], first[1])
+    assert np.array_equal(second[2], first[0])  # Whitespace differences share an entry
+    assert cache.stats()["entries"] == 3
+
+def test_model_name_is_part_of_the_key(tmp_path, fake_model):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    model = fake_model
+
+    cache.encode(model, "model-a", ["alpha"])
+    cache.encode(model, "model-b", ["alpha"])
+
+    assert model.encoded == ["alpha", "alpha"]
+
+def test_eviction_drops_least_recently_used(tmp_path, fake_model):
+    vector_bytes = fake_model.dimension * 4
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_bytes=2 * vector_bytes)
+    model = fake_model
+
+    cache.encode(model, "m", ["old"])
+    cache.encode(model, "m", ["recent"])
+    cache.encode(model, "m", ["old"])  # Hit refreshes "old"
+    cache.encode(model, "m", ["newest"])
+    cache.evict()
+
+    model.encoded.clear()
+    cache.encode(model, "m", ["old", "newest", "recent"])
+    assert model.encoded == ["recent"]
+
+def test_concurrent_writers_share_one_file(tmp_path, fake_model):
+    path = str(tmp_path / "cache.sqlite3")
+    errors = []
+
+    def worker(offset):
+        try:
+            cache = EmbeddingCache(path)
+            cache.encode(fake_model, "m", [f"text {offset + i}" for i in range(200)])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n * 100,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert EmbeddingCache(path).stats()["entries"] == 500
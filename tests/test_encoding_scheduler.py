@@ -0,0 +1,42 @@
+import numpy as np
+
+from src.pipeline import encoding_scheduler
+from src.pipeline.encoding_scheduler import EncodingPool, EncodingScheduler, plan_batches
+
+def _init_model_worker(model_class):
+    encoding_scheduler._worker_model = model_class()
+
+def make_texts():
+    # Short headers interleaved with long paragraphs
+    return ["h" * (5 + i % 7) if i % 3 else "p" * (900 + i) for i in range(200)]
+
+def test_batches_group_similar_lengths_within_budget():
+    lengths = [3, 250, 4, 250, 5, 120, 6, 120]
+
+    batches = plan_batches(lengths, token_budget=500, max_batch_size=3)
+
+    assert sorted(position for batch in batches for position in batch) == list(range(8))
+    assert batches[0] == [0, 2, 4]  # Shortest first, capped by max_batch_size
+    for batch in batches:
+        assert len(batch) * max(lengths[i] for i in batch) <= 500
+
+def test_scheduler_restores_original_order_with_adaptive_batches(fake_model):
+    texts = make_texts()
+    expected = fake_model.encode(texts)
+    fake_model.calls.clear()
+
+    embeddings = EncodingScheduler(fake_model, token_budget=2048, max_batch_size=256).encode(texts)
+
+    assert np.array_equal(embeddings, expected)
+    assert max(fake_model.calls) > 100  # Short texts share large batches
+    assert max(fake_model.calls[1:]) == 2048 // 256  # Long texts (capped at max_seq_length) get small ones
+
+def test_pool_spreads_batches_across_processes(fake_model):
+    texts = make_texts()
+    pool = EncodingPool(2, initializer=_init_model_worker, initargs=(type(fake_model),))
+    try:
+        embeddings = EncodingScheduler(fake_model, pool=pool, token_budget=2048).encode(texts)
+    finally:
+        pool.close()
+
+    assert np.array_equal(embeddings, fake_model.encode(texts))
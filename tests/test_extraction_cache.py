@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from src.pipeline import extraction_cache as extraction_cache_module
+from src.pipeline.extraction_cache import ExtractionCache
+
+def test_key_depends_on_content_extension_and_version():
+    key = ExtractionCache.make_key(b"policy", "Policy.PDF", "4")
+
+    assert key == ExtractionCache.make_key(b"policy", "renamed.pdf", "4")
+    assert key != ExtractionCache.make_key(b"policy", "policy.docx", "4")
+    assert key != ExtractionCache.make_key(b"policy", "policy.pdf", "5")
+    assert key != ExtractionCache.make_key(b"policy v2", "policy.pdf", "4")
+
+def test_text_round_trip_and_version_bump_misses(tmp_path):
+    cache = ExtractionCache(str(tmp_path))
+    cache.put_text(ExtractionCache.make_key(b"doc", "a.pdf", "1"), "extracted text")
+
+    assert cache.get_text(ExtractionCache.make_key(b"doc", "b.pdf", "1")) == "extracted text"
+    assert cache.get_text(ExtractionCache.make_key(b"doc", "a.pdf", "2")) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_unfinished_page_stream_is_never_committed(tmp_path):
+    cache = ExtractionCache(str(tmp_path))
+    key = ExtractionCache.make_key(b"doc", "a.pdf", "1")
+
+    def failing_pages():
+        yield {"index": 0, "text": "first page"}
+        raise RuntimeError("extractor crashed")
+
+    with pytest.raises(RuntimeError):
+        list(cache.write_pages(key, failing_pages()))
+    partial = cache.write_pages(key, iter([{"index": 0}, {"index": 1}]))
+    next(partial)
+    partial.close()
+
+    assert cache.iter_pages(key) is None
+    assert [name for _, _, files in os.walk(tmp_path) for name in files] == []
+
+    assert list(cache.write_pages(key, iter([{"index": 0}, {"index": 1}]))) == [{"index": 0}, {"index": 1}]
+    assert list(cache.iter_pages(key)) == [{"index": 0}, {"index": 1}]
+
+def test_eviction_drops_least_recently_used_entries(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_bytes=350)
+    keys = [ExtractionCache.make_key(bytes([i]), "a.txt", "1") for i in range(4)]
+    for age, key in enumerate(keys[:3]):
+        cache.put_text(key, "x" * 100)
+        os.utime(cache._path(key, ".txt"), (1000 + age, 1000 + age))
+    assert cache.get_text(keys[0]) is not None  # Now the most recently used
+
+    cache.put_text(keys[3], "x" * 100)
+
+    assert [cache.get_text(key) is not None for key in keys] == [True, False, True, True]
+    assert cache.stats()["bytes"] <= 350
+
+def test_writes_only_rescan_the_directory_when_over_budget_or_every_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction_cache_module, "EVICT_SCAN_INTERVAL", 10)
+    cache = ExtractionCache(str(tmp_path), max_bytes=10_000)
+    scans = []
+    entries = cache._entries
+    monkeypatch.setattr(cache, "_entries", lambda: scans.append(1) or entries())
+
+    for i in range(25):
+        cache.put_text(ExtractionCache.make_key(bytes([i]), "a.txt", "1"), "x" * 10)
+    assert len(scans) == 3  # First write, then every 10th
+
+    cache.put_text(ExtractionCache.make_key(b"big", "a.txt", "1"), "x" * 20_000)
+    assert len(scans) == 4
+    assert cache.stats()["bytes"] <= 10_000
@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from src.pipeline import faiss_store
+from src.pipeline.faiss_store import FaissVectorStore
+
+DIMENSION = 16
+
+def make_vectors(count, source, seed=0, start=0):
+    rng = np.random.RandomState(seed)
+    return [
+        {"id": f"{source}-chunk-{start + i}", "values": rng.randn(DIMENSION).tolist(),
+         "metadata": {"source": source, "chunk_index": start + i, "text": f"{source} {start + i}"}}
+        for i in range(count)
+    ]
+
+@pytest.fixture(autouse=True)
+def small_ivf(monkeypatch):
+    # Small enough that the ivf tests actually train an IVF index
+    monkeypatch.setattr(faiss_store, "FAISS_IVF_NLIST", 4)
+    monkeypatch.setattr(faiss_store, "FAISS_IVF_NPROBE", 4)
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw"])
+def test_query_finds_nearest_vector_and_filters_by_source(tmp_path, index_type):
+    store = FaissVectorStore(str(tmp_path), dimension=DIMENSION, index_type=index_type)
+    a, b = make_vectors(150, "a.pdf", seed=1), make_vectors(150, "b.pdf", seed=2)
+    store.upsert(a + b)
+
+    assert store.stats()["total_vectors"] == 300
+    assert store.stats()["index_type"] == index_type
+
+    matches = store.query(a[7]["values"], top_k=3)
+    assert matches[0]["id"] == "a.pdf-chunk-7"
+    assert matches[0]["score"] == pytest.approx(1.0, abs=1e-4)
+    assert matches[0]["metadata"]["text"] == "a.pdf 7"
+
+    filtered = store.query(a[7]["values"], top_k=5, filter={"source": {"$eq": "b.pdf"}})
+    assert len(filtered) == 5
+    assert all(match["metadata"]["source"] == "b.pdf" for match in filtered)
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw"])
+def test_upsert_replaces_and_delete_removes(tmp_path, index_type):
+    store = FaissVectorStore(str(tmp_path), dimension=DIMENSION, index_type=index_type)
+    vectors = make_vectors(200, "a.pdf")
+    store.upsert(vectors)
+
+    replacement = dict(vectors[3], values=vectors[50]["values"], metadata={"source": "a.pdf", "text": "new"})
+    store.upsert([replacement])
+    store.delete(ids=["a.pdf-chunk-50"])
+
+    matches = store.query(vectors[50]["values"], top_k=1)
+    assert matches[0]["id"] == "a.pdf-chunk-3"
+    assert matches[0]["metadata"]["text"] == "new"
+    assert store.query(vectors[3]["values"], top_k=1)[0]["id"] != "a.pdf-chunk-3"
+    assert store.stats()["total_vectors"] == 199
+
+    store.delete(filter={"source": {"$eq": "a.pdf"}})
+    assert store.stats()["total_vectors"] == 0
+    assert store.query(vectors[0]["values"], top_k=3) == []
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw"])
+def test_snapshot_is_reloaded_and_still_writable(tmp_path, index_type):
+    store = FaissVectorStore(str(tmp_path), dimension=DIMENSION, index_type=index_type)
+    vectors = make_vectors(200, "a.pdf")
+    store.upsert(vectors)
+    store.flush()
+
+    restarted = FaissVectorStore(str(tmp_path), dimension=DIMENSION, index_type=index_type)
+    assert restarted.stats()["total_vectors"] == 200
+    assert restarted.query(vectors[9]["values"], top_k=1)[0]["id"] == "a.pdf-chunk-9"
+    assert sorted(restarted.list_ids(prefix="a.pdf-chunk-19")) == ["a.pdf-chunk-19"] + [f"a.pdf-chunk-{i}" for i in range(190, 200)]
+
+    extra = make_vectors(1, "b.pdf", seed=5)
+    restarted.upsert(extra)
+    restarted.flush()
+    assert restarted.query(extra[0]["values"], top_k=1)[0]["id"] == "b.pdf-chunk-0"
+    assert restarted.fetch_metadata(["a.pdf-chunk-0", "missing"]) == {"a.pdf-chunk-0": vectors[0]["metadata"]}
+
+def test_concurrent_writers_do_not_lose_documents(tmp_path):
+    first = FaissVectorStore(str(tmp_path), dimension=DIMENSION, index_type="flat")
+    second = FaissVectorStore(str(tmp_path), dimension=DIMENSION, index_type="flat")
+
+    first.upsert(make_vectors(20, "a.pdf", seed=1))
+    second.upsert(make_vectors(30, "b.pdf", seed=2))
+    first.flush()
+    second.flush()
+
+    # first picks up second's snapshot on its next query
+    first.query(np.ones(DIMENSION), top_k=1)
+    assert first.stats()["total_vectors"] == 50
+    assert FaissVectorStore(str(tmp_path), dimension=DIMENSION).stats()["total_vectors"] == 50
+
+@pytest.mark.parametrize("index_type,quantization", [
+    ("flat", "fp16"), ("flat", "int8"), ("flat", "binary"), ("ivf", "int8"), ("hnsw", "int8")
+])
+def test_quantized_search_rescores_with_full_precision(tmp_path, index_type, quantization):
+    store = FaissVectorStore(str(tmp_path), dimension=DIMENSION, index_type=index_type, quantization=quantization)
+    vectors = make_vectors(300, "a.pdf", seed=3)
+    store.upsert(vectors[:1])  # A tiny first batch must not spoil int8 training
+    store.upsert(vectors[1:])
+    store.flush()
+
+    restarted = FaissVectorStore(str(tmp_path), dimension=DIMENSION, index_type=index_type, quantization=quantization)
+    stats = restarted.stats()
+    assert stats["quantization"] == quantization
+    assert stats["code_bytes_per_vector"] < 4 * DIMENSION
+
+    for i in (0, 42, 299):
+        matches = restarted.query(vectors[i]["values"], top_k=3)
+        assert matches[0]["id"] == f"a.pdf-chunk-{i}"
+        assert matches[0]["score"] == pytest.approx(1.0, abs=1e-5)  # Re-scored, not the code's estimate
+
+    restarted.upsert(make_vectors(1, "b.pdf", seed=9))
+    assert restarted.query(make_vectors(1, "b.pdf", seed=9)[0]["values"], top_k=1)[0]["id"] == "b.pdf-chunk-0"
+
+def test_changing_quantization_converts_snapshot_on_next_write(tmp_path):
+    store = FaissVectorStore(str(tmp_path), dimension=DIMENSION)
+    vectors = make_vectors(50, "a.pdf")
+    store.upsert(vectors)
+    store.flush()
+
+    quantized = FaissVectorStore(str(tmp_path), dimension=DIMENSION, quantization="int8")
+    assert quantized.stats()["quantization"] == "none"
+    quantized.delete(ids=["a.pdf-chunk-0"])
+    assert quantized.stats()["quantization"] == "int8"
+    assert quantized.query(vectors[7]["values"], top_k=1)[0]["id"] == "a.pdf-chunk-7"
+
+def test_query_many_matches_single_queries(tmp_path):
+    store = FaissVectorStore(str(tmp_path), dimension=DIMENSION, quantization="int8")
+    vectors = make_vectors(100, "a.pdf")
+    store.upsert(vectors)
+    queries = [vectors[i]["values"] for i in (3, 50, 99)]
+
+    batched = store.query_many(queries, top_k=4)
+    assert batched == [store.query(query, top_k=4) for query in queries]
+    assert [matches[0]["id"] for matches in batched] == ["a.pdf-chunk-3", "a.pdf-chunk-50", "a.pdf-chunk-99"]
+    assert store.query_many(queries, top_k=2, filter={"source": "b.pdf"}) == [[], [], []]
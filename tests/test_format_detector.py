@@ -0,0 +1,38 @@
+from src.pipeline.format_detector import detect_format
+
+def test_pdf_magic_at_the_start_wins_over_the_extension():
+    assert detect_format(b"%PDF-1.7\n1 0 obj", "mislabelled.docx") == "pdf"
+    assert detect_format(b"\r\n junk from a generator %PDF-1.4\n", "policy.pdf") == "pdf"
+    assert detect_format(b"\r\n junk from a generator %PDF-1.4\n", "download") == "pdf"
+
+def test_text_mentioning_a_pdf_header_is_not_a_pdf():
+    text = b"Notes on the format: every file starts with %PDF-1.4 or similar.\n"
+    assert detect_format(text, "notes.txt") == "text"
+
+    message = (
+        b"From: alice@example.com\r\n"
+        b"To: bob@example.com\r\n"
+        b"Subject: broken upload\r\n\r\n"
+        b"The server says the file has no %PDF-1.7 header.\r\n"
+    )
+    assert detect_format(message, "forwarded.eml") == "email"
+    assert detect_format(message, "forwarded.txt") == "email"
+
+def test_email_with_header_block_longer_than_the_sample():
+    received = b"".join(
+        b"Received: from relay%d.example.com (relay%d.example.com [10.0.0.%d])\r\n"
+        b"\tby mx.example.com with ESMTPS id abcdef%d; Mon, 1 Jan 2024 00:00:00 +0000\r\n" % (i, i, i, i)
+        for i in range(12)
+    )
+    dkim = b"DKIM-Signature: v=1; a=rsa-sha256; d=example.com; s=sel;\r\n\tb=" + b"A" * 600 + b"\r\n"
+    message = received + dkim + b"From: alice@example.com\r\nSubject: claim\r\n\r\nBody\r\n"
+
+    assert len(received) > 1024
+    assert detect_format(message, "upload") == "email"
+
+def test_header_cut_by_the_sample_boundary_is_ignored():
+    start = b"From: alice@example.com\r\nTo: bob@example.com\r\nX-Pad: "
+    message = start + b"y" * (1024 - len(start) - 8) + b"\r\nX-Mailer-Version: 2\r\n\r\nBody"
+
+    assert message[:1024].endswith(b"X-Mail")  # Cut inside a header name
+    assert detect_format(message, "upload") == "email"
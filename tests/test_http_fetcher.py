@@ -0,0 +1,85 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from src.utils import http_fetcher
+from src.utils.http_fetcher import ConditionalCache, fetch
+
+BODY = b"%PDF-1.4 stand-in document body " * 100
+ETAG = '"v1"'
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves BODY with an ETag and honours If-None-Match."""
+
+    requests_seen = []
+
+    def do_GET(self):
+        StandInHandler.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/doc.pdf" and self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(BODY)))
+        if self.path == "/doc.pdf":
+            self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    StandInHandler.requests_seen = []
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_fetcher, "conditional_cache", ConditionalCache(str(tmp_path)))
+
+def test_refetch_of_unchanged_document_is_a_304(server):
+    with fetch(server + "/doc.pdf") as first:
+        assert first.status == 200
+        assert not first.from_cache
+        assert first.read() == BODY
+
+    with fetch(server + "/doc.pdf") as second:
+        assert second.status == 304
+        assert second.from_cache
+        assert second.content_type == "application/pdf"
+        assert second.read() == BODY
+
+    assert StandInHandler.requests_seen == [("/doc.pdf", None), ("/doc.pdf", ETAG)]
+
+def test_responses_without_validators_are_not_cached(server):
+    for _ in range(2):
+        with fetch(server + "/plain.pdf") as result:
+            assert result.status == 200
+            assert result.read() == BODY
+
+    assert StandInHandler.requests_seen == [("/plain.pdf", None), ("/plain.pdf", None)]
+
+def test_body_over_size_limit_is_rejected(server):
+    with pytest.raises(ValueError):
+        fetch(server + "/doc.pdf", max_bytes=len(BODY) - 1)
+
+def test_spilled_and_cached_bodies_are_memory_mapped(server, monkeypatch):
+    monkeypatch.setattr(http_fetcher, "FETCH_SPOOL_BYTES", 1024)
+
+    for expected_status in (200, 304):
+        with fetch(server + "/doc.pdf") as result:
+            assert result.status == expected_status
+            view = result.buffer()
+            assert isinstance(view, memoryview)
+            assert view == BODY
+            del view
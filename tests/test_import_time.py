@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Extraction backends that must only be imported on first use
+HEAVY_MODULES = {
+    "fitz", "pymupdf", "PyPDF2", "pdfplumber", "pytesseract", "PIL",
+    "docx", "bs4", "requests", "chardet"
+}
+
+# Created on first use by src.pipeline.resources, never at import
+MODEL_MODULES = {"sentence_transformers", "torch", "pinecone"}
+
+# Generous budget for slow CI machines; the eager version took ~250 ms
+DOCUMENT_LOADER_BUDGET_US = 150_000
+
+def import_profile(module: str):
+    """Import module in a fresh interpreter under -X importtime.
+
+    Returns (returncode, {module name: cumulative microseconds}).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = int(cumulative)
+    return result.returncode, timings
+
+def test_document_loader_imports_no_backends():
+    returncode, timings = import_profile("src.pipeline.document_loader")
+    assert returncode == 0
+    assert HEAVY_MODULES.isdisjoint(timings), sorted(HEAVY_MODULES & set(timings))
+
+def test_document_loader_import_time():
+    returncode, timings = import_profile("src.pipeline.document_loader")
+    assert returncode == 0
+    assert timings["src.pipeline.document_loader"] < DOCUMENT_LOADER_BUDGET_US
+
+def test_app_main_imports_no_extraction_backends():
+    returncode, timings = import_profile("app.main")
+    if returncode != 0:
+        pytest.skip("app.main cannot be imported in this environment")
+    assert HEAVY_MODULES.isdisjoint(timings), sorted(HEAVY_MODULES & set(timings))
+
+def test_app_main_loads_no_model_or_index_client():
+    returncode, timings = import_profile("app.main")
+    if returncode != 0:
+        pytest.skip("app.main cannot be imported in this environment")
+    assert MODEL_MODULES.isdisjoint(timings), sorted(MODEL_MODULES & set(timings))
@@ -1,2 +1,89 @@
+import pytest
+
+pytest.importorskip("faiss")
+
+from src.pipeline import embedder, retriever, run_pipeline
+from src.pipeline.chunk_store import ChunkStore
+from src.pipeline.embedding_cache import EmbeddingCache
+from src.pipeline.faiss_store import FaissVectorStore
+from src.pipeline.query_cache import QueryCache
+
 def test_dummy():
     assert 1 == 1
+
+FOOTER = "Underwritten by Example General Insurance Co. Ltd. IRDAI Registration No. 190. Read the policy wording carefully."
+
+def paragraph_chunks(segments, source_filename="unknown"):
+    """One chunk per paragraph, standing in for stream_smart_chunks."""
+    paragraphs = (paragraph for segment in segments for paragraph in segment.split("\n\n"))
+    for index, paragraph in enumerate(paragraphs):
+        yield {"id": f"{source_filename}-chunk-{index}", "text": paragraph, "metadata": {"source": source_filename, "chunk_index": index}}
+
+@pytest.fixture
+def store(tmp_path, monkeypatch, fake_model):
+    store = FaissVectorStore(str(tmp_path / "faiss"), dimension=fake_model.dimension, index_type="flat")
+    monkeypatch.setattr(embedder, "get_vector_store", lambda: store)
+    monkeypatch.setattr(embedder, "get_model", lambda: fake_model)
+    monkeypatch.setattr(embedder, "chunk_store", ChunkStore(str(tmp_path / "chunks.sqlite3")))
+    monkeypatch.setattr(embedder, "embedding_cache", EmbeddingCache(str(tmp_path / "embeddings.sqlite3")))
+    monkeypatch.setattr(embedder, "query_cache", QueryCache())
+    monkeypatch.setattr(run_pipeline, "stream_smart_chunks", paragraph_chunks)
+    return store
+
+def test_dropped_duplicates_are_recorded_on_the_stored_chunk(store, monkeypatch):
+    pages = [f"Section {page}: waiting period of {page * 3} months for condition {page * 11}.\n\n{FOOTER}" for page in range(3)]
+    monkeypatch.setattr(run_pipeline, "iter_pages", lambda file_bytes, filename: (
+        {"text": text, "end_char": 0} for text in pages
+    ))
+
+    stats = run_pipeline._ingest_streaming(b"policy", "policy.pdf", doc_id="d0c")
+
+    assert stats["chunks_created"] == 6
+    assert stats["chunks_deduplicated"] == 2
+    assert store.stats()["total_vectors"] == 4
+    footer = store.fetch_metadata(["d0c-chunk-1"])["d0c-chunk-1"]
+    assert footer["occurrences"] == 3
+    assert footer["duplicates"] == ["d0c-chunk-3", "d0c-chunk-5"]
+
+    # Survives a snapshot reload
+    reloaded = FaissVectorStore(store.directory, dimension=store.dimension, index_type="flat")
+    assert reloaded.fetch_metadata(["d0c-chunk-1"])["d0c-chunk-1"]["duplicates"] == footer["duplicates"]
+
+def test_reuploading_a_document_keeps_its_cached_results(store, monkeypatch, fake_model):
+    pages = ["Grace period of thirty days.\n\nRoom rent is capped at 1% of the sum insured.", "Cataract is covered after two years."]
+    monkeypatch.setattr(run_pipeline, "iter_pages", lambda file_bytes, filename: ({"text": text, "end_char": 0} for text in pages))
+    cache = embedder.query_cache
+
+    def ask():
+        return retriever.retrieve_batch(["Grace period?"], model=fake_model, store=store, cache=cache, doc_id="d0c")
+
+    assert run_pipeline._ingest_streaming(b"policy", "policy.pdf", doc_id="d0c")["chunks_embedded"] == 3
+    first = ask()
+    encoded = len(fake_model.encoded)
+
+    again = run_pipeline._ingest_streaming(b"policy", "policy.pdf", doc_id="d0c")
+
+    assert again["chunks_embedded"] == 0
+    assert len(fake_model.encoded) == encoded  # Nothing re-embedded
+    assert ask() == first
+    assert cache.stats()["result_hits"] == 1
+
+def test_same_bytes_under_another_name_are_stored_once(store, monkeypatch, fake_model):
+    pages = ["Grace period of thirty days.\n\nRoom rent is capped at 1% of the sum insured.", "Cataract is covered after two years."]
+    monkeypatch.setattr(run_pipeline, "iter_pages", lambda file_bytes, filename: ({"text": text, "end_char": 0} for text in pages))
+    doc_id = run_pipeline.document_id(b"policy")
+
+    for filename in ("policy.pdf", "policy (1).pdf"):
+        run_pipeline._ingest_streaming(b"policy", filename, doc_id=doc_id)
+    results, = retriever.retrieve_batch(["Grace period?"], top_k=5, model=fake_model, store=store, doc_id=doc_id)
+
+    assert store.stats()["total_vectors"] == 3
+    assert sorted(chunk["text"] for chunk in results) == sorted(["Grace period of thirty days.", "Room rent is capped at 1% of the sum insured.", "Cataract is covered after two years."])
+
+@pytest.mark.parametrize("setting, value", [("EXTRACTOR_VERSION", "999"), ("CHUNKING_MODE", "content"), ("DEFAULT_CHUNK_SIZE", 123), ("DEDUP_ENABLED", False)])
+def test_changing_ingest_settings_moves_a_document_to_a_new_scope(monkeypatch, setting, value):
+    before = run_pipeline.document_id(b"policy")
+    monkeypatch.setattr(run_pipeline, setting, value)
+
+    assert run_pipeline.document_id(b"policy") != before
+    assert run_pipeline.document_id(b"policy") == run_pipeline.document_id(b"policy")
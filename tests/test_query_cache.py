@@ -0,0 +1,92 @@
+import pytest
+
+from src.pipeline import embedder, retriever
+from src.pipeline.query_cache import QueryCache
+
+@pytest.fixture
+def store(memory_store):
+    """One chunk for each source and document the tests query."""
+    memory_store.upsert([
+        {"id": f"{source}-chunk-0-{doc_id}", "values": [1.0, 2.0, 3.0, 4.0], "metadata": {"source": source, "doc_id": doc_id, "text": "chunk"}}
+        for source in ("a.pdf", "b.pdf") for doc_id in ("doc-1", "doc-2")
+    ])
+    return memory_store
+
+def retrieve(questions, model, store, cache, source=None):
+    return retriever.retrieve_batch(questions, source_filter=source, model=model, store=store, cache=cache)
+
+def test_repeated_questions_are_embedded_and_queried_once(fake_model, store):
+    model, cache = fake_model, QueryCache()
+
+    first = retrieve(["What is this document about?", "Grace period?"], model, store, cache)
+    second = retrieve(["What  is this document about?\n", "Waiting period?"], model, store, cache)
+
+    assert model.encoded == ["What is this document about?", "Grace period?", "Waiting period?"]
+    assert store.queries == 3
+    assert second[0] == first[0]
+    assert cache.stats()["result_hits"] == 1
+
+def test_invalidating_a_source_only_drops_results_that_may_include_it(fake_model, store):
+    model, cache = fake_model, QueryCache()
+    for source in ("a.pdf", "b.pdf", None):
+        retrieve(["Coverage?"], model, store, cache, source)
+    assert store.queries == 3
+
+    cache.invalidate("a.pdf")
+    for source in ("a.pdf", "b.pdf", None):
+        retrieve(["Coverage?"], model, store, cache, source)
+
+    assert store.queries == 5  # a.pdf and unfiltered were re-queried, b.pdf was cached
+
+def test_results_expire_and_are_bounded(fake_model, store):
+    model = fake_model
+    expired = QueryCache(ttl=-1)
+    retrieve(["Coverage?"], model, store, expired)
+    retrieve(["Coverage?"], model, store, expired)
+    assert store.queries == 2
+
+    small = QueryCache(result_size=2, embedding_size=2)
+    retrieve(["one", "two", "three"], model, store, small)
+    assert small.stats()["results"] == 2
+    assert small.stats()["embeddings"] == 2
+
+def test_embedding_a_document_invalidates_its_source(monkeypatch, fake_model, recording_index, store):
+    cache = QueryCache()
+    monkeypatch.setattr(embedder, "query_cache", cache)
+    model = fake_model
+    retrieve(["Coverage?"], model, store, cache, "a.pdf")
+    retrieve(["Coverage?"], model, store, cache, "b.pdf")
+
+    docs = [{"id": "a.pdf-chunk-0", "text": "new text", "metadata": {"source": "a.pdf"}}]
+    embedder.embed_and_store_stream(docs, index=recording_index, model=model, use_cache=False)
+
+    retrieve(["Coverage?"], model, store, cache, "a.pdf")
+    retrieve(["Coverage?"], model, store, cache, "b.pdf")
+    assert store.queries == 3
+
+def test_invalidating_a_document_scope_keeps_other_scopes(fake_model, store):
+    model, cache = fake_model, QueryCache()
+    for doc_id in ("doc-1", "doc-2"):
+        retriever.retrieve_batch(["Coverage?"], model=model, store=store, cache=cache, doc_id=doc_id)
+    assert store.queries == 2
+
+    cache.invalidate("a.pdf", doc_id="doc-1")
+    for doc_id in ("doc-1", "doc-2"):
+        retriever.retrieve_batch(["Coverage?"], model=model, store=store, cache=cache, doc_id=doc_id)
+
+    assert store.queries == 3  # doc-1 was re-queried, doc-2 was cached
+
+def test_scope_counters_are_bounded_without_serving_stale_results(fake_model, store):
+    model, cache = fake_model, QueryCache(max_scopes=3)
+    retriever.retrieve_batch(["Coverage?"], model=model, store=store, cache=cache, doc_id="doc-1")
+    cache.invalidate("a.pdf", doc_id="doc-1")  # doc-1 is now at generation 1
+    retriever.retrieve_batch(["Coverage?"], model=model, store=store, cache=cache, doc_id="doc-1")
+    assert store.queries == 2
+
+    for n in range(10):
+        cache.invalidate(f"upload-{n}.pdf", doc_id=f"upload-{n}")
+        assert len(cache._scope_generations) <= 3
+
+    # doc-1's counter restarted at 0, but the bumped epoch keeps its old keys from matching
+    retriever.retrieve_batch(["Coverage?"], model=model, store=store, cache=cache, doc_id="doc-1")
+    assert store.queries == 3
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from src.pipeline import resources
+
+def test_resource_is_created_once_and_shared(monkeypatch):
+    monkeypatch.setattr(resources, "_resources", {})
+    monkeypatch.setattr(resources, "_timings", {})
+    calls = []
+
+    def slow_factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(resources._get_or_create("model", slow_factory)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert resources.startup_report()["loaded"] == ["model"]
+    assert resources.startup_report()["seconds"]["model"] >= 0.05
+
+def test_reset_forces_recreation(monkeypatch):
+    monkeypatch.setattr(resources, "_resources", {})
+    monkeypatch.setattr(resources, "_timings", {})
+
+    first = resources._get_or_create("index", object)
+    resources.reset("index")
+
+    assert resources._get_or_create("index", object) is not first
+
+def test_onnx_file_matches_cpu():
+    assert resources._default_onnx_file("aarch64") == "onnx/model_qint8_arm64.onnx"
+    assert resources._default_onnx_file("x86_64", "fpu sse avx2 avx512f avx512_vnni") == "onnx/model_qint8_avx512_vnni.onnx"
+    assert resources._default_onnx_file("x86_64", "fpu sse avx2 avx512f") == "onnx/model_qint8_avx512.onnx"
+    assert resources._default_onnx_file("x86_64", "fpu sse avx2") == "onnx/model_quint8_avx2.onnx"
+
+def test_embedding_agreement_reports_cosine():
+    import numpy as np
+
+    class Model:
+        def __init__(self, noise):
+            self.noise = noise
+
+        def encode(self, texts, convert_to_numpy=True):
+            return np.array([[len(text), 1.0, self.noise] for text in texts])
+
+    agreement = resources.embedding_agreement(Model(0.0), Model(0.0), ["a", "bb"])
+    assert agreement["min_cosine"] == agreement["mean_cosine"] == 1.0
+    assert resources.embedding_agreement(Model(5.0), Model(0.0), ["a", "bb"])["min_cosine"] < 0.9
+
+def test_cache_key_separates_backends(monkeypatch):
+    monkeypatch.setattr(resources, "EMBEDDING_BACKEND", "torch")
+    assert resources.embedding_model_key() == resources.EMBEDDING_MODEL_NAME
+
+    monkeypatch.setattr(resources, "EMBEDDING_BACKEND", "onnx")
+    monkeypatch.setattr(resources, "EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+    assert resources.embedding_model_key() == "all-MiniLM-L6-v2:onnx:onnx/model_quint8_avx2.onnx"
+
+def test_reset_closes_the_encoding_pool(monkeypatch):
+    monkeypatch.setattr(resources, "_resources", {})
+    monkeypatch.setattr(resources, "_timings", {})
+
+    class Pool:
+        closed = 0
+
+        def close(self):
+            self.closed += 1
+
+    for name in ("encoding_pool", None):
+        pool = resources._get_or_create("encoding_pool", Pool)
+        resources.reset(name)
+        assert pool.closed == 1
+        assert resources._get_or_create("encoding_pool", Pool) is not pool
@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pytest
+
+from src.pipeline import retriever
+from src.pipeline.chunk_store import ChunkStore
+
+@pytest.fixture
+def slow_store(memory_store):
+    """Answers each query after a delay with the query value as id; fails for value 13."""
+    memory_store.delay = 0.05
+    memory_store.in_flight = 0
+    memory_store.max_in_flight = 0
+    lock = threading.Lock()
+
+    def query(vector, top_k=5, filter=None):
+        with lock:
+            memory_store.in_flight += 1
+            memory_store.max_in_flight = max(memory_store.max_in_flight, memory_store.in_flight)
+        time.sleep(memory_store.delay)
+        with lock:
+            memory_store.in_flight -= 1
+        if vector[0] == 13:
+            raise ConnectionError("timeout")
+        return [{"id": f"chunk-{int(vector[0])}", "score": 0.9, "metadata": {"source": "a.pdf"}}]
+
+    memory_store.query = query
+    return memory_store
+
+def test_batch_encodes_once_queries_concurrently_and_keeps_order(tmp_path, monkeypatch, fake_model, slow_store):
+    store = ChunkStore(str(tmp_path / "chunks.sqlite3"))
+    store.put_many([{"id": f"chunk-{i}", "text": f"text {i}", "metadata": {}} for i in range(30)])
+    monkeypatch.setattr(retriever, "chunk_store", store)
+    monkeypatch.setattr(retriever, "CHUNK_STORE_ENABLED", True)
+    questions = ["q" * i for i in range(1, 21)]
+    model, vectors = fake_model, slow_store
+
+    start = time.perf_counter()
+    results = retriever.retrieve_batch(questions, model=model, store=vectors)
+    elapsed = time.perf_counter() - start
+
+    assert len(model.calls) == 1
+    assert 1 < vectors.max_in_flight <= 8
+    assert elapsed < 20 * vectors.delay / 2
+    assert [result[0]["text"] if result else None for result in results] == [
+        None if i == 13 else f"text {i}" for i in range(1, 21)
+    ]
+
+def test_document_scope_only_searches_that_documents_chunks(tmp_path, monkeypatch, fake_model):
+    from src.pipeline.faiss_store import FaissVectorStore
+    from src.pipeline.run_pipeline import document_id, scope_chunks
+
+    monkeypatch.setattr(retriever, "chunk_store", ChunkStore(str(tmp_path / "chunks.sqlite3")))
+    store = FaissVectorStore(str(tmp_path / "faiss"), fake_model.dimension, index_type="flat")
+    scopes = {}
+    for name, content, value in (("policy.pdf", b"customer one", 1.0), ("policy.pdf", b"customer two", 2.0)):
+        doc_id = scopes[content] = document_id(content)
+        chunks = list(scope_chunks([{"id": f"{name}-chunk-0", "text": "x", "metadata": {"source": name}}], doc_id))
+        store.upsert([{"id": chunk["id"], "values": [value] * fake_model.dimension, "metadata": chunk["metadata"]} for chunk in chunks])
+
+    assert store.stats()["total_vectors"] == 2  # Same file name, no overwrite
+    for content, doc_id in scopes.items():
+        results = retriever.retrieve_batch(["q", "qq"], top_k=5, model=fake_model, store=store, doc_id=doc_id)
+        assert [[chunk["metadata"]["doc_id"] for chunk in result] for result in results] == [[doc_id], [doc_id]]
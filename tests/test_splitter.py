@@ -0,0 +1,124 @@
+import random
+from collections import Counter
+
+import pytest
+import regex
+import tiktoken
+
+from src.pipeline import splitter
+from tests import legacy_splitter
+
+# cl100k_base's pre-tokenizer; its vocabulary cannot be downloaded offline, so a
+# small BPE is trained over it instead (the chunker only relies on the pattern)
+CL100K_PATTERN = r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|\s*[\r\n]|\s+(?!\S)|\s"""
+
+WORDS = legacy_splitter.WORDS + ["(see", "Section", "4.2)", "“Insured”", "—", "Rs.", "50,000", "e.g.", "don't", "10%"]
+ENDINGS = [".", ":", ";", "", "?!", ".)", "...", " -", "”."]
+
+def train_bpe(corpus: str, merges: int = 300) -> dict:
+    """Byte-level BPE ranks learned from corpus, split with the cl100k pattern."""
+    pieces = Counter(regex.findall(CL100K_PATTERN, corpus))
+    ranks = {bytes([byte]): byte for byte in range(256)}
+    words = {piece: [bytes([byte]) for byte in piece.encode("utf-8")] for piece in pieces}
+    for _ in range(merges):
+        pairs = Counter()
+        for piece, count in pieces.items():
+            parts = words[piece]
+            for pair in zip(parts, parts[1:]):
+                pairs[pair] += count
+        if not pairs:
+            break
+        (left, right), _ = pairs.most_common(1)[0]
+        ranks.setdefault(left + right, len(ranks))
+        for piece, parts in words.items():
+            merged, i = [], 0
+            while i < len(parts):
+                if i + 1 < len(parts) and parts[i] == left and parts[i + 1] == right:
+                    merged.append(left + right)
+                    i += 2
+                else:
+                    merged.append(parts[i])
+                    i += 1
+            words[piece] = merged
+    return ranks
+
+def build_document(seed: int, paragraphs: int = 120) -> str:
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(paragraphs):
+        # Mostly short clauses, some longer than a chunk, some with line breaks inside
+        length = rng.choice([150, 300]) if rng.random() < 0.08 else rng.randint(1, 40)
+        words = [rng.choice(WORDS) for _ in range(length)]
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words) + 1), "\n")
+        parts.append(" ".join(words) + rng.choice(ENDINGS) + rng.choice(["", "", " ", "\t"]))
+        parts.append(rng.choice(["\n\n", "\n\n", "\n\n\n", "\n\n \n\n"]))
+    return "".join(parts)
+
+@pytest.fixture
+def encoder(monkeypatch):
+    corpus = "".join(build_document(seed) for seed in range(100, 103))
+    encoding = tiktoken.Encoding(name="cl100k_test", pat_str=CL100K_PATTERN, mergeable_ranks=train_bpe(corpus), special_tokens={})
+    for module in (splitter, legacy_splitter):
+        monkeypatch.setattr(module, "get_encoder", lambda model=splitter.ENCODER_NAME: encoding)
+    return encoding
+
+@pytest.mark.parametrize("seed", range(8))
+def test_smart_chunk_text_matches_the_legacy_chunker(encoder, seed):
+    text = build_document(seed)
+
+    chunks = splitter.smart_chunk_text(text, chunk_size=64, chunk_overlap=8, source_filename="policy.pdf")
+
+    assert chunks == legacy_splitter.legacy_smart_chunk_text(text, chunk_size=64, chunk_overlap=8, source_filename="policy.pdf")
+    assert any(chunk["metadata"]["token_count"] == 64 for chunk in chunks)  # Some paragraphs were windowed
+
+def test_separator_after_trailing_punctuation_is_counted_exactly(encoder):
+    for ending in ENDINGS + ["!!!", "?)", "\"", " ."]:
+        paragraph = f"the Sum Insured{ending}"
+        expected = len(encoder.encode(paragraph + "\n\nnext")) - len(encoder.encode(paragraph)) - len(encoder.encode("next"))
+        assert splitter._separator_tokens(paragraph, encoder, len(encoder.encode("\n\n"))) == expected
+
+def test_content_defined_table_holds_offsets_and_hashes_of_the_chunks(encoder):
+    repeated = "The same disclaimer paragraph repeated on every page of the policy. " * 6
+    text = "\n\n".join([build_document(11, paragraphs=30), repeated, build_document(12, paragraphs=30), repeated])
+
+    table = splitter.content_defined_chunk_table(text, min_tokens=20, target_tokens=40, max_tokens=80, source_filename="policy.pdf")
+    chunks = splitter.content_defined_chunk_text(text, min_tokens=20, target_tokens=40, max_tokens=80, source_filename="policy.pdf")
+
+    assert list(table) == chunks
+    assert len({chunk["id"] for chunk in chunks}) == len(chunks)
+    for chunk in chunks:
+        metadata = chunk["metadata"]
+        assert chunk["text"] == text[metadata["start_char"]:metadata["end_char"]].strip()
+        assert chunk["id"].startswith(f"policy.pdf-{metadata['content_hash']}")
+    assert table.nbytes() == 45 * len(table)  # Four int64 offsets, a flag, a 64-bit hash and a repeat count
+
+def test_streamed_pages_chunk_like_the_whole_document(encoder, tmp_path, monkeypatch):
+    fitz = pytest.importorskip("fitz")
+    from src.pipeline import document_loader
+    from src.pipeline.extraction_cache import ExtractionCache
+
+    monkeypatch.setattr(document_loader, "extraction_cache", ExtractionCache(str(tmp_path)))
+    rng = random.Random(5)
+    pdf = fitz.open()
+    for page_number in range(12):
+        # Lines without blank lines, so each page is one or more plain-text paragraphs
+        lines = [" ".join(rng.choice(WORDS) for _ in range(8)) for _ in range(rng.randint(3, 12))]
+        pdf.new_page().insert_text((36, 36), "\n".join(lines), fontsize=8)
+    data = pdf.tobytes()
+    pdf.close()
+
+    pages = [record["text"] for record in document_loader.iter_pages(data, "policy.pdf")]
+    streamed = list(splitter.stream_smart_chunks(pages, chunk_size=64, chunk_overlap=8, source_filename="policy.pdf", separator=document_loader.PAGE_SEPARATOR))
+
+    assert len(pages) == 12
+    assert streamed == splitter.smart_chunk_text(document_loader.PAGE_SEPARATOR.join(pages), chunk_size=64, chunk_overlap=8, source_filename="policy.pdf")
+
+@pytest.mark.parametrize("block_size", [1, 2, 7, 500])
+def test_raw_blocks_chunk_like_the_whole_text(encoder, block_size):
+    text = build_document(3, paragraphs=40)
+    blocks = (text[i:i + block_size] for i in range(0, len(text), block_size))
+
+    streamed = list(splitter.stream_smart_chunks(blocks, chunk_size=64, chunk_overlap=8, separator=""))
+
+    assert streamed == splitter.smart_chunk_text(text, chunk_size=64, chunk_overlap=8)
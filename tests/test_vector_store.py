@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.pipeline import embedder, retriever
+from src.pipeline.chunk_store import ChunkStore
+from src.pipeline.query_cache import QueryCache
+from src.pipeline.vector_store import PineconeVectorStore, VectorStore
+
+class FakePineconeIndex:
+    """The parts of pinecone.Index the pipeline uses; list() yields pages of plain ids."""
+
+    def __init__(self, metadata: dict, page_size: int = 2):
+        self.metadata = metadata
+        self.page_size = page_size
+        self.deleted = []
+
+    def list(self, prefix=None):
+        ids = sorted(vector_id for vector_id in self.metadata if vector_id.startswith(prefix or ""))
+        for start in range(0, len(ids), self.page_size):
+            yield ids[start:start + self.page_size]
+
+    def fetch(self, ids):
+        return SimpleNamespace(vectors={
+            vector_id: SimpleNamespace(metadata=self.metadata[vector_id]) for vector_id in ids if vector_id in self.metadata
+        })
+
+    def delete(self, ids=None, filter=None, delete_all=False):
+        self.deleted.extend(ids or ())
+        for vector_id in ids or ():
+            self.metadata.pop(vector_id, None)
+
+def test_list_ids_flattens_pages_of_ids():
+    index = FakePineconeIndex({f"a.pdf-{i}": {"source": "a.pdf"} for i in range(5)} | {"b.pdf-0": {"source": "b.pdf"}})
+
+    assert list(PineconeVectorStore(index).list_ids(prefix="a.pdf-")) == [f"a.pdf-{i}" for i in range(5)]
+    assert len(list(PineconeVectorStore(index).list_ids())) == 6
+
+def test_delete_stale_chunks_on_pinecone(tmp_path, monkeypatch):
+    index = FakePineconeIndex({
+        "a.pdf-keep": {"source": "a.pdf"},
+        "a.pdf-old1": {"source": "a.pdf"},
+        "a.pdf-old2": {"source": "a.pdf"},
+        "a.pdf-v2.pdf-0": {"source": "a.pdf-v2.pdf"}  # Shares the id prefix
+    })
+    monkeypatch.setattr(embedder, "get_vector_store", lambda: PineconeVectorStore(index))
+    monkeypatch.setattr(embedder, "chunk_store", ChunkStore(str(tmp_path / "chunks.sqlite3")))
+
+    assert embedder.delete_stale_chunks("a.pdf", ["a.pdf-keep"]) == 2
+    assert sorted(index.metadata) == ["a.pdf-keep", "a.pdf-v2.pdf-0"]
+
+def test_delete_by_document_on_pinecone(tmp_path, monkeypatch):
+    index = FakePineconeIndex({
+        **{f"d0c-policy.pdf-chunk-{i}": {"source": "policy.pdf", "doc_id": "d0c"} for i in range(5)},
+        "d0c2-policy.pdf-chunk-0": {"source": "policy.pdf", "doc_id": "d0c2"}
+    })
+    chunks = ChunkStore(str(tmp_path / "chunks.sqlite3"))
+    chunks.put_many([{"id": vector_id, "text": vector_id, "metadata": metadata} for vector_id, metadata in index.metadata.items()])
+    cache = QueryCache()
+    monkeypatch.setattr(retriever, "get_vector_store", lambda: PineconeVectorStore(index))
+    monkeypatch.setattr(retriever, "chunk_store", chunks)
+    monkeypatch.setattr(retriever, "CHUNK_STORE_ENABLED", True)
+    monkeypatch.setattr(retriever, "query_cache", cache)
+    generation = cache._generation({"doc_id": {"$eq": "d0c"}})
+
+    assert retriever.delete_by_document("d0c")
+
+    assert sorted(index.deleted) == [f"d0c-policy.pdf-chunk-{i}" for i in range(5)]
+    assert list(index.metadata) == ["d0c2-policy.pdf-chunk-0"]
+    assert chunks.stats()["chunks"] == 1
+    assert cache._generation({"doc_id": {"$eq": "d0c"}}) != generation
+
+def test_backends_must_implement_every_operation():
+    class QueryOnlyStore(VectorStore):
+        def query(self, vector, top_k=5, filter=None):
+            return []
+
+    with pytest.raises(TypeError, match="fetch_metadata"):
+        QueryOnlyStore()